@@ -0,0 +1,57 @@
+"""
+The batch loop and command line shared by the rebuild commands of sketches.py,
+terms.py, dedup.py and chan_text.py.
+
+A rebuild recomputes what the crawlers derive from each row at ingest, for rows that
+were crawled before that stage existed. fold_rows streams a query's rows from a
+server-side cursor and hands them to the module's fold function batch by batch, all
+in one transaction, so an interrupted rebuild leaves the tables as they were. What is
+read, cleared and written differs per module; see its rebuild.
+"""
+import argparse
+import os
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+
+def fold_rows(query, fold, clear=None, batch_size=10000):
+    """Run fold(cursor, rows) on query's rows, batch_size at a time, in one transaction.
+
+    clear is an optional (sql, params) pair run first in the same transaction, to drop
+    what the rebuild recomputes.
+    """
+    conn = psycopg2.connect(dsn=DATABASE_URL)
+    try:
+        with conn:
+            write = conn.cursor()
+            if clear is not None:
+                write.execute(*clear)
+            # Named cursor, so rows are streamed from the server batch_size at a time
+            read = conn.cursor(name="rebuild")
+            read.itersize = batch_size
+            read.execute(query)
+            while True:
+                rows = read.fetchmany(batch_size)
+                if not rows:
+                    break
+                fold(write, rows)
+            read.close()
+    finally:
+        conn.close()
+
+
+def rebuild_command(doc, rebuild, sources=None):
+    """Parse `rebuild [source]` from the command line and call rebuild(source), or rebuild() without sources."""
+    parser = argparse.ArgumentParser(description=doc, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["rebuild"])
+    if sources is not None:
+        parser.add_argument("source", choices=sorted(sources))
+    args = parser.parse_args()
+    if sources is None:
+        rebuild()
+    else:
+        rebuild(args.source)
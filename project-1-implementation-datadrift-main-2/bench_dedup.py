@@ -0,0 +1,152 @@
+"""
+Benchmark near-duplicate clustering at ingest (dedup.assign_cluster) on a synthetic corpus.
+
+Most posts are random sentences over a Zipf-distributed vocabulary; a share of them
+are copies of a few copypasta templates with words dropped, swapped or appended,
+as reposts are. Every post goes through assign_cluster as the crawlers call it, one
+post at a time with its queries against text_clusters/text_cluster_bands, committing
+every --batch posts as a crawler commits a thread. The tables live in the scratch
+`bench` schema. Reports throughput, per-post latency, the size the cluster tables
+grow to, and how well clusters recover the templates (a pair of posts counts as a
+true duplicate when both come from the same template).
+
+Usage: python3 bench_dedup.py --posts 100000 --batch 50
+"""
+import argparse
+import time
+import numpy as np
+import psycopg2
+from batches import DATABASE_URL
+from dedup import assign_cluster
+
+VOCABULARY = 20000
+SCHEMA = "bench"
+
+# The cluster tables of the text_clusters migration, in the scratch schema
+DDL = f"""
+    DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+    CREATE SCHEMA {SCHEMA};
+    SET search_path TO {SCHEMA}, public;
+
+    CREATE TABLE text_clusters (
+        id BIGSERIAL PRIMARY KEY,
+        signature BYTEA NOT NULL,
+        members BIGINT NOT NULL DEFAULT 1,
+        first_source TEXT NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+    CREATE TABLE text_cluster_bands (
+        band SMALLINT NOT NULL,
+        band_hash BIGINT NOT NULL,
+        cluster_id BIGINT NOT NULL REFERENCES text_clusters (id) ON DELETE CASCADE,
+        PRIMARY KEY (band, band_hash, cluster_id)
+    );
+"""
+
+
+def synthetic_corpus(posts, copies, templates, seed=0):
+    """Return (texts, template of each text or -1 for unique posts)."""
+    rng = np.random.default_rng(seed)
+    words = np.array([f"w{i}" for i in range(VOCABULARY)])
+    # Zipf-like word frequencies, as in real text
+    probabilities = 1 / np.arange(1, VOCABULARY + 1)
+    probabilities /= probabilities.sum()
+    # Draw words from one large pool, as per-sentence weighted draws dominate the run time
+    pool = words[rng.choice(VOCABULARY, posts * 40 + 100000, p=probabilities)]
+    used = 0
+
+    def sentence(length):
+        nonlocal used
+        if used + length > len(pool):
+            used = 0
+        used += length
+        return pool[used - length:used]
+
+    bases = [sentence(rng.integers(20, 80)) for _ in range(templates)]
+    template = np.where(rng.random(posts) < copies, rng.integers(0, templates, posts), -1)
+    texts = []
+    for t in template:
+        if t < 0:
+            texts.append(" ".join(sentence(rng.integers(5, 60))))
+            continue
+        # A repost: drop ~5% of the words, change ~5%, maybe add a short reply
+        tokens = bases[t][rng.random(len(bases[t])) > 0.05].copy()
+        changed = rng.random(len(tokens)) < 0.05
+        tokens[changed] = sentence(changed.sum())
+        if rng.random() < 0.3:
+            tokens = np.concatenate([sentence(rng.integers(1, 8)), tokens])
+        texts.append(" ".join(tokens))
+    return texts, template
+
+
+def pair_scores(clusters, template):
+    """Pairwise precision and recall of clusters against the true templates."""
+    def pairs(labels):
+        _, counts = np.unique(labels, return_counts=True)
+        return int((counts * (counts - 1) // 2).sum())
+
+    copies = template >= 0
+    # Unique posts are their own template; shift so their labels can't collide with real ones
+    truth = np.where(copies, template, -1 - np.arange(len(template)))
+    truth = truth - truth.min()
+    both = pairs(clusters.astype(np.int64) * (truth.max() + 1) + truth)
+    found, true = pairs(clusters), pairs(truth)
+    return both / max(found, 1), both / max(true, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=100000)
+    parser.add_argument("--copies", type=float, default=0.1, help="share of posts that repost a template (default: 0.1)")
+    parser.add_argument("--templates", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=50, help="posts per transaction, like a crawled thread (default: 50)")
+    parser.add_argument("--keep", action="store_true", help=f"keep the {SCHEMA} schema afterwards")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    texts, template = synthetic_corpus(args.posts, args.copies, args.templates)
+    print(f"generated {args.posts} posts ({(template >= 0).sum()} reposts of {args.templates} templates) "
+          f"in {time.perf_counter() - start:.1f} s")
+
+    conn = psycopg2.connect(dsn=DATABASE_URL)
+    try:
+        cur = conn.cursor()
+        cur.execute(DDL)
+        conn.commit()
+
+        clusters = np.empty(args.posts, dtype=np.int64)
+        latency = np.empty(args.posts)
+        started = time.perf_counter()
+        for i, text in enumerate(texts):
+            start = time.perf_counter()
+            clusters[i] = assign_cluster(cur, "chan_posts", text)
+            latency[i] = time.perf_counter() - start
+            if (i + 1) % args.batch == 0:
+                conn.commit()
+        conn.commit()
+        elapsed = time.perf_counter() - started
+        print(f"assign_cluster {elapsed:7.1f} s  {args.posts / elapsed:8,.0f} posts/s  "
+              f"latency p50 {np.percentile(latency, 50) * 1000:.2f} ms, p99 {np.percentile(latency, 99) * 1000:.2f} ms")
+        # The last tenth shows the steady state, once the band index holds most clusters
+        tail = latency[-max(1, args.posts // 10):]
+        print(f"last 10%      latency p50 {np.percentile(tail, 50) * 1000:.2f} ms, p99 {np.percentile(tail, 99) * 1000:.2f} ms")
+
+        cur.execute(
+            "SELECT (SELECT count(*) FROM text_clusters), (SELECT count(*) FROM text_cluster_bands), "
+            "pg_total_relation_size('text_clusters'), pg_total_relation_size('text_cluster_bands')"
+        )
+        count, bands, clusters_size, bands_size = cur.fetchone()
+        print(f"{count} clusters ({clusters_size / 2 ** 20:.1f} MB), {bands} band rows ({bands_size / 2 ** 20:.1f} MB)")
+
+        if not args.keep:
+            cur.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+            conn.commit()
+    finally:
+        conn.close()
+
+    precision, recall = pair_scores(clusters, template)
+    print(f"duplicate pairs: precision {precision:.3f}, recall {recall:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,10 @@ from psycopg2.extensions import register_adapter
 import os
 import datetime
 from dotenv import load_dotenv
+from sketches import chan_author, store_sketches, toxicity
+from terms import store_terms
+from dedup import assign_cluster
+from chan_text import clean_comment, store_quote_links
 
 # Load environment variables from .env file
 load_dotenv()
@@ -44,18 +48,39 @@ def crawl_thread(board, thread_number):
     if thread_data:
         conn = psycopg2.connect(dsn=DATABASE_URL)
         cur = conn.cursor()
+        sketch_rows = []
+        texts = []
 
         # Insert thread data into DB
         for post in thread_data.get("posts", []):
             post_number = post["no"]
             cur.execute(
-                "INSERT INTO posts (board, thread_number, post_number, data) VALUES (%s, %s, %s, %s) RETURNING id",
-                (board, thread_number, post_number, post)
+                "INSERT INTO posts (board, thread_number, post_number, created_at, data) "
+                "VALUES (%s, %s, %s, to_timestamp(%s), %s) RETURNING id",
+                (board, thread_number, post_number, post["time"], post)
             )
-            conn.commit()
             db_id = cur.fetchone()[0]
+
+            # Narrow copy of the fields the analyses read, so they never have to detoast data,
+            # with the comment cleaned of its HTML once here, plus its near-duplicate cluster
+            cleaned = clean_comment(post.get("com"), board)
+            cluster_id = assign_cluster(cur, "chan_posts", cleaned.text)
+            cur.execute(
+                "INSERT INTO chan_posts (board, thread_number, post_number, created_at, com, text, greentext, name, poster_id, country, replies, images, resto, cluster_id) "
+                "VALUES (%s, %s, %s, to_timestamp(%s), %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING created_at",
+                (board, thread_number, post_number, post["time"], post.get("com"), cleaned.text, cleaned.greentext,
+                 post.get("name"), post.get("id"), post.get("country"), post.get("replies"), post.get("images"), post.get("resto", 0), cluster_id)
+            )
+            store_quote_links(cur, board, thread_number, post_number, cur.fetchone()[0], cleaned.quote_links)
+            sketch_rows.append((board, post["time"], toxicity(cleaned.text), chan_author(thread_number, post.get("id"))))
+            texts.append((board, post["time"], cleaned.text))
             logging.info(f"Inserted DB id: {db_id}")
 
+        # Fold the whole thread into its board/day sketches and term counts once, and commit it with them:
+        # one sketch row update per thread instead of per post
+        store_sketches(cur, "chan_posts", sketch_rows)
+        store_terms(cur, "chan_posts", texts)
+        conn.commit()
         cur.close()
         conn.close()
     else:
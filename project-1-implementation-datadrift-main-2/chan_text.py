@@ -0,0 +1,90 @@
+"""
+Cleaning of 4chan comment HTML, done once at ingest.
+
+The API returns com as HTML: <br> line breaks, <wbr> break hints inside long words,
+<span class="quote"> around greentext and <a class="quotelink"> around >>123 replies,
+with entities such as &gt; and &#039;. crawl_thread stores the plain text in
+chan_posts.text, whether the post has greentext in chan_posts.greentext, and every
+quote link as a reply edge in chan_quote_links, so toxicity, term counts, clustering
+and the analyses read plain text and never parse the HTML again.
+
+Usage: python3 chan_text.py rebuild   (fill text, greentext and quote links of chan_posts rows without text)
+"""
+import collections
+import html
+import re
+from psycopg2.extras import execute_values
+from batches import fold_rows, rebuild_command
+
+# href is "#p123" within the thread, "/fit/thread/120#p123" for another thread or board,
+# or a board/catalog link without a post (">>>/g/"), which is not an edge
+QUOTE_LINK = re.compile(r'<a href="([^"]*)" class="quotelink">.*?</a>')
+LINK_TARGET = re.compile(r'(?:/(\w+)/thread/\d+)?#p(\d+)$')
+LINE_BREAK = re.compile(r"<br\s*/?>")
+TAG = re.compile(r"<[^>]*>")
+GREENTEXT = '<span class="quote">'
+
+# Sources whose stored text has been cleaned here, which later stages use as it is
+CLEANED_SOURCES = frozenset({"chan_posts"})
+
+CleanComment = collections.namedtuple("CleanComment", ["text", "quote_links", "greentext"])
+
+
+def clean_comment(com, board):
+    """Plain text, quote links [(board, post number)] and greentext flag of a comment's HTML.
+
+    Quote links are removed from the text (they become edges); line breaks are kept,
+    blank lines and surrounding whitespace dropped. Greentext lines keep their ">".
+    """
+    if not com:
+        return CleanComment("", [], False)
+    if "<" not in com and "&" not in com:
+        return CleanComment(com.strip(), [], False)
+
+    links = []
+    for href in QUOTE_LINK.findall(com):
+        target = LINK_TARGET.search(href)
+        if target:
+            links.append((target.group(1) or board, int(target.group(2))))
+    text = html.unescape(TAG.sub("", LINE_BREAK.sub("\n", QUOTE_LINK.sub("", com))))
+    lines = (line.strip() for line in text.split("\n"))
+    return CleanComment("\n".join(line for line in lines if line), links, GREENTEXT in com)
+
+
+def store_quote_links(cur, board, thread_number, post_number, created_at, links):
+    """Insert a post's quote links as reply edges in chan_quote_links, in the caller's transaction."""
+    if links:
+        execute_values(
+            cur,
+            "INSERT INTO chan_quote_links (board, thread_number, post_number, created_at, quoted_board, quoted_post_number) "
+            "VALUES %s ON CONFLICT DO NOTHING",
+            [(board, thread_number, post_number, created_at, quoted_board, quoted) for quoted_board, quoted in links]
+        )
+
+
+def rebuild(batch_size=10000):
+    """Clean every chan_posts row without text (for posts crawled before the cleaning stage).
+
+    Only chan_posts has HTML to clean, so this takes no source. Rows that already have
+    text are skipped, so an interrupted rebuild picks up where it stopped.
+    """
+    def fold(cur, rows):
+        updates = []
+        for row_id, created_at, board, thread_number, post_number, com in rows:
+            cleaned = clean_comment(com, board)
+            updates.append((row_id, created_at, cleaned.text, cleaned.greentext))
+            store_quote_links(cur, board, thread_number, post_number, created_at, cleaned.quote_links)
+        execute_values(
+            cur,
+            "UPDATE chan_posts AS t SET text = v.text, greentext = v.greentext "
+            "FROM (VALUES %s) AS v (id, created_at, text, greentext) "
+            "WHERE t.id = v.id AND t.created_at = v.created_at",
+            updates
+        )
+
+    fold_rows("SELECT id, created_at, board, thread_number, post_number, com FROM chan_posts WHERE text IS NULL",
+              fold, batch_size=batch_size)
+
+
+if __name__ == "__main__":
+    rebuild_command(__doc__, rebuild)
@@ -0,0 +1,162 @@
+"""
+Near-duplicate (copypasta and cross-post) clustering with MinHash and LSH.
+
+Each text is normalized (case and punctuation removed, and for Reddit text also HTML
+entities and tags; 4chan text was cleaned at ingest, see chan_text.py), cut into
+overlapping 5-character shingles and summarized by a 64 value MinHash signature; the
+fraction of equal values estimates the Jaccard similarity of two texts' shingles. The
+signature is split into 16 bands of 4 values, and two texts that agree on a whole
+band are candidates (likely for similarity above ~0.5, unlikely below ~0.3).
+
+At ingest, assign_cluster looks the new text's bands up in text_cluster_bands, which
+only holds the bands of each cluster's first text, and joins the most similar cluster
+at THRESHOLD or above, or starts a new one. The crawlers store the id in the
+cluster_id column of the content tables, so reposts share one id: analyses can count
+or score each cluster once, and the dashboard lists a post's near-duplicates.
+
+Usage: python3 dedup.py rebuild chan_posts   (cluster a source's rows that have no cluster_id yet)
+"""
+import html
+import re
+import numpy as np
+from psycopg2.extras import execute_values
+from batches import fold_rows, rebuild_command
+from chan_text import CLEANED_SOURCES
+from sketches import SOURCES
+
+SHINGLE = 5
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# Estimated Jaccard similarity at which a text joins a cluster
+THRESHOLD = 0.5
+
+# Fixed hash parameters, so signatures stay comparable across processes and runs
+_rng = np.random.default_rng(20241127)
+PERM_A = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)  # odd multipliers
+PERM_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+BAND_A = _rng.integers(1, 2 ** 63, ROWS, dtype=np.uint64) | np.uint64(1)
+
+TAG = re.compile(r"<[^>]+>")
+QUOTE_LINK = re.compile(r">>\d+")
+NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text, markup=True):
+    """Lowercase words of a text without punctuation, single-space separated.
+
+    With markup, tags, HTML entities and quote links are removed first; pass False for
+    text that chan_text.py has already cleaned, so it is not unescaped a second time.
+    """
+    if not text:
+        return ""
+    if markup:
+        text = QUOTE_LINK.sub(" ", html.unescape(TAG.sub(" ", text)))
+    return NON_WORD.sub(" ", text.lower()).strip()
+
+
+def signatures(texts, markup=True):
+    """MinHash signatures of texts as a (len(texts), NUM_PERM) uint32 array.
+
+    Works on a whole batch at once: the texts are joined with SHINGLE - 1 padding bytes
+    so no shingle spans two texts, every 5-byte window is packed into one integer, and
+    each permutation is a multiply-shift hash whose minimum per text is taken with
+    np.minimum.reduceat. Texts that normalize to nothing get an all-max signature.
+    markup is passed on to normalize.
+    """
+    encoded = [normalize(text, markup).encode() for text in texts]
+    lengths = np.array([len(e) for e in encoded])
+    result = np.full((len(texts), NUM_PERM), np.iinfo(np.uint32).max, dtype=np.uint32)
+    nonempty = lengths > 0
+    if not nonempty.any():
+        return result
+
+    pad = b"\0" * (SHINGLE - 1)
+    data = np.frombuffer(pad.join(e for e in encoded if e) + pad, dtype=np.uint8).astype(np.uint64)
+    windows = np.zeros(len(data) - SHINGLE + 1, dtype=np.uint64)
+    for offset in range(SHINGLE):
+        windows |= data[offset:len(data) - SHINGLE + 1 + offset] << np.uint64(8 * offset)
+
+    # Keep the windows starting inside a text: text i starts at starts[i] and has lengths[i] windows
+    kept = lengths[nonempty]
+    starts = np.concatenate(([0], np.cumsum(kept + SHINGLE - 1)[:-1]))
+    inside = np.repeat(starts - np.concatenate(([0], np.cumsum(kept)[:-1])), kept) + np.arange(kept.sum())
+    shingles = windows[inside]
+    segments = np.concatenate(([0], np.cumsum(kept)[:-1]))
+
+    rows = np.empty((len(kept), NUM_PERM), dtype=np.uint32)
+    for p in range(NUM_PERM):
+        hashed = (shingles * PERM_A[p] + PERM_B[p]) >> np.uint64(32)
+        rows[:, p] = np.minimum.reduceat(hashed, segments)
+    result[nonempty] = rows
+    return result
+
+
+def band_hashes(signatures):
+    """One signed 64-bit hash per band of each signature, shape (n, BANDS)."""
+    bands = signatures.reshape(len(signatures), BANDS, ROWS).astype(np.uint64)
+    return (bands * BAND_A).sum(axis=2, dtype=np.uint64).view(np.int64)
+
+
+def similarity(signature, others):
+    """Estimated Jaccard similarity of one signature to each row of others."""
+    return (others == signature).mean(axis=1)
+
+
+def assign_cluster(cur, source, text):
+    """Cluster id for a new text (None if it has no words), in the caller's transaction.
+
+    Joins the most similar cluster sharing a band with the text if its first text is at
+    least THRESHOLD similar, otherwise creates a cluster with this text as its first.
+    """
+    words = normalize(text, markup=source not in CLEANED_SOURCES)
+    if not words:
+        return None
+    signature = signatures([words], markup=False)[0]
+    bands = band_hashes(signature[None])[0]
+    cur.execute(
+        "SELECT id, signature FROM text_clusters WHERE id IN ("
+        "SELECT cluster_id FROM text_cluster_bands WHERE (band, band_hash) IN %s)",
+        (tuple((band, int(value)) for band, value in enumerate(bands)),)
+    )
+    candidates = cur.fetchall()
+    if candidates:
+        scores = similarity(signature, np.stack([np.frombuffer(bytes(s), dtype=np.uint32) for _, s in candidates]))
+        best = int(scores.argmax())
+        if scores[best] >= THRESHOLD:
+            cluster_id = candidates[best][0]
+            cur.execute("UPDATE text_clusters SET members = members + 1 WHERE id = %s", (cluster_id,))
+            return cluster_id
+
+    cur.execute(
+        "INSERT INTO text_clusters (signature, first_source) VALUES (%s, %s) RETURNING id",
+        (signature.tobytes(), source)
+    )
+    cluster_id = cur.fetchone()[0]
+    execute_values(cur, "INSERT INTO text_cluster_bands (band, band_hash, cluster_id) VALUES %s ON CONFLICT DO NOTHING",
+                   [(band, int(value), cluster_id) for band, value in enumerate(bands)])
+    return cluster_id
+
+
+def rebuild(source, batch_size=20000):
+    """Cluster every row of a source that has no cluster yet, in id order, and store the ids.
+
+    Nothing is cleared: rows join the stored clusters where they match, so sources can be
+    rebuilt one after another, and an interrupted rebuild picks up where it stopped.
+    """
+    _, created, text, _ = SOURCES[source]
+
+    def fold(cur, rows):
+        assigned = [(assign_cluster(cur, source, body), row_id, row_created) for row_id, row_created, body in rows]
+        execute_values(
+            cur,
+            f"UPDATE {source} AS t SET cluster_id = v.cluster_id FROM (VALUES %s) AS v (cluster_id, id, created) "
+            f"WHERE t.id = v.id AND t.{created} = v.created",
+            [row for row in assigned if row[0] is not None]
+        )
+
+    fold_rows(f"SELECT id, {created}, {text} FROM {source} WHERE cluster_id IS NULL ORDER BY id", fold, batch_size=batch_size)
+
+
+if __name__ == "__main__":
+    rebuild_command(__doc__, rebuild, SOURCES)
@@ -0,0 +1,2 @@
+-- Hypertables cannot be turned back into plain tables in place.
+-- To revert, dump the data, drop the tables and re-run the earlier migrations.
@@ -0,0 +1,39 @@
+-- Convert the content tables into TimescaleDB hypertables partitioned on their creation timestamp
+CREATE EXTENSION IF NOT EXISTS timescaledb;
+
+-- 4chan posts only carry their creation time inside the JSON blob, so lift it into a real column first
+ALTER TABLE posts ADD COLUMN created_at TIMESTAMPTZ;
+UPDATE posts SET created_at = to_timestamp((data->>'time')::bigint);
+ALTER TABLE posts ALTER COLUMN created_at SET NOT NULL;
+
+-- Unique indexes on a hypertable have to include the partitioning column
+ALTER TABLE posts DROP CONSTRAINT posts_pkey;
+ALTER TABLE posts ADD PRIMARY KEY (id, created_at);
+DROP INDEX posts_board_thread_number_post_number_idx1;
+CREATE UNIQUE INDEX ON posts (board, thread_number, post_number, created_at);
+SELECT create_hypertable('posts', 'created_at', chunk_time_interval => INTERVAL '1 day', migrate_data => true);
+
+ALTER TABLE reddit_posts DROP CONSTRAINT reddit_posts_pkey;
+ALTER TABLE reddit_posts ADD PRIMARY KEY (id, created_utc);
+DROP INDEX reddit_posts_subreddit_post_id_idx;
+CREATE UNIQUE INDEX ON reddit_posts (subreddit, post_id, created_utc);
+SELECT create_hypertable('reddit_posts', 'created_utc', chunk_time_interval => INTERVAL '1 day', migrate_data => true);
+
+ALTER TABLE reddit_politics_posts DROP CONSTRAINT IF EXISTS reddit_politics_posts_pkey;
+ALTER TABLE reddit_politics_posts ADD PRIMARY KEY (id, created_utc);
+SELECT create_hypertable('reddit_politics_posts', 'created_utc', chunk_time_interval => INTERVAL '1 day', migrate_data => true);
+
+-- The crawler used to insert comments without created_utc; take it from the JSON document.
+-- Rows that have none are "more" stubs (links to unloaded replies), not comments, so drop them
+UPDATE reddit_comments SET created_utc = to_timestamp((data->>'created_utc')::float) WHERE created_utc IS NULL;
+DELETE FROM reddit_comments WHERE created_utc IS NULL;
+UPDATE reddit_politics_comments SET created_utc = to_timestamp((data->>'created_utc')::float) WHERE created_utc IS NULL;
+DELETE FROM reddit_politics_comments WHERE created_utc IS NULL;
+
+ALTER TABLE reddit_comments DROP CONSTRAINT IF EXISTS reddit_comments_pkey;
+ALTER TABLE reddit_comments ADD PRIMARY KEY (id, created_utc);
+SELECT create_hypertable('reddit_comments', 'created_utc', chunk_time_interval => INTERVAL '1 day', migrate_data => true);
+
+ALTER TABLE reddit_politics_comments DROP CONSTRAINT IF EXISTS reddit_politics_comments_pkey;
+ALTER TABLE reddit_politics_comments ADD PRIMARY KEY (id, created_utc);
+SELECT create_hypertable('reddit_politics_comments', 'created_utc', chunk_time_interval => INTERVAL '1 day', migrate_data => true);
@@ -0,0 +1,11 @@
+-- Drop the continuous aggregates (their refresh policies go with them)
+DROP MATERIALIZED VIEW IF EXISTS posts_hourly;
+DROP MATERIALIZED VIEW IF EXISTS posts_daily;
+DROP MATERIALIZED VIEW IF EXISTS reddit_posts_hourly;
+DROP MATERIALIZED VIEW IF EXISTS reddit_posts_daily;
+DROP MATERIALIZED VIEW IF EXISTS reddit_politics_posts_hourly;
+DROP MATERIALIZED VIEW IF EXISTS reddit_politics_posts_daily;
+DROP MATERIALIZED VIEW IF EXISTS reddit_comments_hourly;
+DROP MATERIALIZED VIEW IF EXISTS reddit_comments_daily;
+DROP MATERIALIZED VIEW IF EXISTS reddit_politics_comments_hourly;
+DROP MATERIALIZED VIEW IF EXISTS reddit_politics_comments_daily;
@@ -0,0 +1,116 @@
+-- Hourly and daily rollups of post counts and mean toxicity per board/subreddit.
+-- Toxicity uses the same length based score as the analysis scripts (characters / 100).
+-- After running this on an existing database, backfill history once with
+-- CALL refresh_continuous_aggregate('<view>', NULL, NULL);
+
+CREATE MATERIALIZED VIEW posts_hourly
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 hour', created_at) AS bucket,
+       board,
+       count(*) AS post_count,
+       avg(char_length(data->>'com') / 100.0) AS mean_toxicity
+FROM posts
+GROUP BY bucket, board
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW posts_daily
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 day', created_at) AS bucket,
+       board,
+       count(*) AS post_count,
+       avg(char_length(data->>'com') / 100.0) AS mean_toxicity
+FROM posts
+GROUP BY bucket, board
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW reddit_posts_hourly
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 hour', created_utc) AS bucket,
+       subreddit,
+       count(*) AS post_count,
+       avg(char_length(title) / 100.0) AS mean_toxicity
+FROM reddit_posts
+GROUP BY bucket, subreddit
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW reddit_posts_daily
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 day', created_utc) AS bucket,
+       subreddit,
+       count(*) AS post_count,
+       avg(char_length(title) / 100.0) AS mean_toxicity
+FROM reddit_posts
+GROUP BY bucket, subreddit
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW reddit_politics_posts_hourly
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 hour', created_utc) AS bucket,
+       subreddit,
+       count(*) AS post_count,
+       avg(char_length(title) / 100.0) AS mean_toxicity
+FROM reddit_politics_posts
+GROUP BY bucket, subreddit
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW reddit_politics_posts_daily
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 day', created_utc) AS bucket,
+       subreddit,
+       count(*) AS post_count,
+       avg(char_length(title) / 100.0) AS mean_toxicity
+FROM reddit_politics_posts
+GROUP BY bucket, subreddit
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW reddit_comments_hourly
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 hour', created_utc) AS bucket,
+       subreddit,
+       count(*) AS comment_count,
+       avg(char_length(content) / 100.0) AS mean_toxicity
+FROM reddit_comments
+GROUP BY bucket, subreddit
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW reddit_comments_daily
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 day', created_utc) AS bucket,
+       subreddit,
+       count(*) AS comment_count,
+       avg(char_length(content) / 100.0) AS mean_toxicity
+FROM reddit_comments
+GROUP BY bucket, subreddit
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW reddit_politics_comments_hourly
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 hour', created_utc) AS bucket,
+       subreddit,
+       count(*) AS comment_count,
+       avg(char_length(content) / 100.0) AS mean_toxicity
+FROM reddit_politics_comments
+GROUP BY bucket, subreddit
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW reddit_politics_comments_daily
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 day', created_utc) AS bucket,
+       subreddit,
+       count(*) AS comment_count,
+       avg(char_length(content) / 100.0) AS mean_toxicity
+FROM reddit_politics_comments
+GROUP BY bucket, subreddit
+WITH NO DATA;
+
+-- Keep the recent buckets materialized; older ones are refreshed once during backfill
+SELECT add_continuous_aggregate_policy('posts_hourly', start_offset => INTERVAL '3 days', end_offset => INTERVAL '1 hour', schedule_interval => INTERVAL '30 minutes');
+SELECT add_continuous_aggregate_policy('posts_daily', start_offset => INTERVAL '7 days', end_offset => INTERVAL '1 hour', schedule_interval => INTERVAL '1 hour');
+SELECT add_continuous_aggregate_policy('reddit_posts_hourly', start_offset => INTERVAL '3 days', end_offset => INTERVAL '1 hour', schedule_interval => INTERVAL '30 minutes');
+SELECT add_continuous_aggregate_policy('reddit_posts_daily', start_offset => INTERVAL '7 days', end_offset => INTERVAL '1 hour', schedule_interval => INTERVAL '1 hour');
+SELECT add_continuous_aggregate_policy('reddit_politics_posts_hourly', start_offset => INTERVAL '3 days', end_offset => INTERVAL '1 hour', schedule_interval => INTERVAL '30 minutes');
+SELECT add_continuous_aggregate_policy('reddit_politics_posts_daily', start_offset => INTERVAL '7 days', end_offset => INTERVAL '1 hour', schedule_interval => INTERVAL '1 hour');
+SELECT add_continuous_aggregate_policy('reddit_comments_hourly', start_offset => INTERVAL '3 days', end_offset => INTERVAL '1 hour', schedule_interval => INTERVAL '30 minutes');
+SELECT add_continuous_aggregate_policy('reddit_comments_daily', start_offset => INTERVAL '7 days', end_offset => INTERVAL '1 hour', schedule_interval => INTERVAL '1 hour');
+SELECT add_continuous_aggregate_policy('reddit_politics_comments_hourly', start_offset => INTERVAL '3 days', end_offset => INTERVAL '1 hour', schedule_interval => INTERVAL '30 minutes');
+SELECT add_continuous_aggregate_policy('reddit_politics_comments_daily', start_offset => INTERVAL '7 days', end_offset => INTERVAL '1 hour', schedule_interval => INTERVAL '1 hour');
@@ -0,0 +1,2 @@
+-- Drop the board/created_at index
+DROP INDEX IF EXISTS posts_board_created_at_idx;
@@ -0,0 +1,2 @@
+-- Range scans by board over the typed creation time (replaces filtering on data->>'now' strings)
+CREATE INDEX ON posts (board, created_at DESC);
@@ -0,0 +1,3 @@
+-- Drop the covering indexes for the analysis reads
+DROP INDEX IF EXISTS reddit_posts_created_utc_covering_idx;
+DROP INDEX IF EXISTS reddit_politics_posts_created_utc_covering_idx;
@@ -0,0 +1,7 @@
+-- The analysis scripts read a window of a few narrow columns (title, num_comments) by
+-- created_utc. Covering indexes let those reads be index-only scans instead of visiting
+-- heap rows that also hold the self-text and, later, the search vector. Titles are at
+-- most 300 characters, so they fit in a B-tree entry; comment and 4chan text can be
+-- too long for one and stays in the heap.
+CREATE INDEX reddit_posts_created_utc_covering_idx ON reddit_posts (created_utc) INCLUDE (title, num_comments);
+CREATE INDEX reddit_politics_posts_created_utc_covering_idx ON reddit_politics_posts (created_utc) INCLUDE (title);
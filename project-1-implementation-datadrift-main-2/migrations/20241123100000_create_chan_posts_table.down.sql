@@ -0,0 +1,2 @@
+-- Drop the chan_posts projection (posts.data still has everything)
+DROP TABLE IF EXISTS chan_posts;
@@ -0,0 +1,28 @@
+-- Narrow projection of the 4chan post fields the analyses use, so scans don't have to
+-- read and detoast the whole API object in posts.data (which stays as the raw record)
+CREATE TABLE chan_posts (
+    id BIGSERIAL,
+    board TEXT NOT NULL,
+    thread_number BIGINT NOT NULL,
+    post_number BIGINT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL,  -- from the post's epoch time field
+    com TEXT,  -- comment HTML as returned by the API
+    name TEXT,
+    country TEXT,
+    replies INTEGER,  -- only set on thread openers
+    images INTEGER,  -- only set on thread openers
+    resto BIGINT NOT NULL,  -- 0 for the thread opener, otherwise the thread number
+    PRIMARY KEY (id, created_at)
+);
+CREATE UNIQUE INDEX ON chan_posts (board, thread_number, post_number, created_at);
+CREATE INDEX ON chan_posts (board, created_at DESC);
+SELECT create_hypertable('chan_posts', 'created_at', chunk_time_interval => INTERVAL '1 day');
+
+-- Not compressed: compressed chunks drop the row-level B-tree and GIN indexes that the
+-- dashboard's search and near-duplicate lookups on this table rely on at any age
+
+INSERT INTO chan_posts (board, thread_number, post_number, created_at, com, name, country, replies, images, resto)
+SELECT board, thread_number, post_number, created_at,
+       data->>'com', data->>'name', data->>'country',
+       (data->>'replies')::integer, (data->>'images')::integer, (data->>'resto')::bigint
+FROM posts;
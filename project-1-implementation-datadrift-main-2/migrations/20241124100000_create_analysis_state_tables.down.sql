@@ -0,0 +1,5 @@
+-- Drop the incremental analysis state (the next run rebuilds it from scratch)
+DROP TABLE IF EXISTS analysis_samples;
+DROP TABLE IF EXISTS analysis_toxicity_counts;
+DROP TABLE IF EXISTS analysis_hourly;
+DROP TABLE IF EXISTS analysis_state;
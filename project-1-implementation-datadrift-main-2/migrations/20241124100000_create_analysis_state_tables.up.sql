@@ -0,0 +1,39 @@
+-- Running aggregates for the incremental analysis (Analysis.py --source incremental).
+-- Each run refolds the days whose row counts changed since they were folded into
+-- per-hour and per-day aggregates, so figures for any window are rendered without
+-- rescanning raw rows.
+CREATE TABLE analysis_state (
+    source TEXT PRIMARY KEY,
+    watermark_time TIMESTAMP,  -- newest created time folded in (UTC), bounds the next scan
+    rows_folded BIGINT NOT NULL DEFAULT 0,  -- rows held in the aggregates
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Row count, scored row count and toxicity sum per source and hour (UTC)
+CREATE TABLE analysis_hourly (
+    source TEXT NOT NULL,
+    bucket TIMESTAMP NOT NULL,
+    rows BIGINT NOT NULL,
+    scored BIGINT NOT NULL,
+    toxicity_sum DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (source, bucket)
+);
+
+-- Rows per distinct toxicity score and day, for exact histograms of any window
+CREATE TABLE analysis_toxicity_counts (
+    source TEXT NOT NULL,
+    day DATE NOT NULL,
+    toxicity DOUBLE PRECISION NOT NULL,
+    count BIGINT NOT NULL,
+    PRIMARY KEY (source, day, toxicity)
+);
+
+-- Per-day bottom-k sample (smallest random keys) for the engagement scatter
+CREATE TABLE analysis_samples (
+    source TEXT NOT NULL,
+    day DATE NOT NULL,
+    sample_key DOUBLE PRECISION NOT NULL,
+    toxicity DOUBLE PRECISION,
+    num_comments INTEGER,
+    PRIMARY KEY (source, day, sample_key)
+);
@@ -0,0 +1,2 @@
+-- Drop the ingest sketches (python3 sketches.py rebuild <source> recreates them from the tables)
+DROP TABLE IF EXISTS post_sketches;
@@ -0,0 +1,15 @@
+-- Mergeable per-day sketches written by the crawlers at insert time (see sketches.py):
+-- a KLL quantile sketch of toxicity and a HyperLogLog of authors per source,
+-- board/subreddit and UTC day. Sketches of any range of days merge into one, so
+-- median/p95 toxicity and distinct authors never need a scan of the rows.
+CREATE TABLE post_sketches (
+    source TEXT NOT NULL,  -- table the rows were inserted into, e.g. chan_posts, reddit_posts
+    community TEXT NOT NULL,  -- board or subreddit
+    bucket DATE NOT NULL,  -- UTC day of the rows' created time
+    rows BIGINT NOT NULL,
+    toxicity JSONB NOT NULL,  -- KLL sketch: {"k", "n", "levels"}, items of levels[h] weigh 2^h
+    authors BYTEA NOT NULL,  -- HyperLogLog registers, one byte each
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (source, community, bucket)
+);
+CREATE INDEX ON post_sketches (source, bucket);
@@ -0,0 +1,2 @@
+-- Drop the term index (python3 terms.py rebuild <source> recreates it from the tables)
+DROP TABLE IF EXISTS term_counts;
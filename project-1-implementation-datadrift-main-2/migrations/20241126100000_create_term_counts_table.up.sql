@@ -0,0 +1,13 @@
+-- Term frequencies per source, board/subreddit and UTC day, added by the crawlers as
+-- they insert each post or comment (see terms.py). Top terms for a date range are a
+-- sum over these rows instead of a pass over the text.
+CREATE TABLE term_counts (
+    source TEXT NOT NULL,  -- table the text was inserted into, e.g. chan_posts, reddit_posts
+    community TEXT NOT NULL,  -- board or subreddit
+    day DATE NOT NULL,
+    term TEXT NOT NULL,
+    count BIGINT NOT NULL,
+    PRIMARY KEY (source, community, day, term)
+);
+-- Covers the top terms query (source and day range), so it runs as an index-only scan
+CREATE INDEX ON term_counts (source, day) INCLUDE (community, term, count);
@@ -0,0 +1,8 @@
+-- Drop the near-duplicate clusters and the cluster_id columns (indexes go with the columns)
+ALTER TABLE chan_posts DROP COLUMN IF EXISTS cluster_id;
+ALTER TABLE reddit_posts DROP COLUMN IF EXISTS cluster_id;
+ALTER TABLE reddit_politics_posts DROP COLUMN IF EXISTS cluster_id;
+ALTER TABLE reddit_comments DROP COLUMN IF EXISTS cluster_id;
+ALTER TABLE reddit_politics_comments DROP COLUMN IF EXISTS cluster_id;
+DROP TABLE IF EXISTS text_cluster_bands;
+DROP TABLE IF EXISTS text_clusters;
@@ -0,0 +1,30 @@
+-- Near-duplicate clusters of post and comment text, assigned by the crawlers at insert
+-- time (see dedup.py). A cluster keeps the MinHash signature of its first text, and
+-- text_cluster_bands indexes that signature's LSH band hashes, so a new text finds
+-- candidate clusters with one index lookup per band.
+CREATE TABLE text_clusters (
+    id BIGSERIAL PRIMARY KEY,
+    signature BYTEA NOT NULL,  -- 64 little-endian uint32 MinHash values of the first text
+    members BIGINT NOT NULL DEFAULT 1,
+    first_source TEXT NOT NULL,  -- table the first text was inserted into
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE TABLE text_cluster_bands (
+    band SMALLINT NOT NULL,  -- 0..15
+    band_hash BIGINT NOT NULL,
+    cluster_id BIGINT NOT NULL REFERENCES text_clusters (id) ON DELETE CASCADE,
+    PRIMARY KEY (band, band_hash, cluster_id)
+);
+
+-- Cluster of each row's text (NULL for rows without words, or crawled before clustering;
+-- python3 dedup.py rebuild <source> fills those in)
+ALTER TABLE chan_posts ADD COLUMN cluster_id BIGINT;
+ALTER TABLE reddit_posts ADD COLUMN cluster_id BIGINT;
+ALTER TABLE reddit_politics_posts ADD COLUMN cluster_id BIGINT;
+ALTER TABLE reddit_comments ADD COLUMN cluster_id BIGINT;
+ALTER TABLE reddit_politics_comments ADD COLUMN cluster_id BIGINT;
+CREATE INDEX ON chan_posts (cluster_id, created_at DESC) WHERE cluster_id IS NOT NULL;
+CREATE INDEX ON reddit_posts (cluster_id, created_utc DESC) WHERE cluster_id IS NOT NULL;
+CREATE INDEX ON reddit_politics_posts (cluster_id, created_utc DESC) WHERE cluster_id IS NOT NULL;
+CREATE INDEX ON reddit_comments (cluster_id, created_utc DESC) WHERE cluster_id IS NOT NULL;
+CREATE INDEX ON reddit_politics_comments (cluster_id, created_utc DESC) WHERE cluster_id IS NOT NULL;
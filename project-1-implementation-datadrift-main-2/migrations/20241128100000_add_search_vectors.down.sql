@@ -0,0 +1,9 @@
+-- Drop the search columns (their GIN indexes go with them)
+DROP TRIGGER IF EXISTS chan_posts_search ON chan_posts;
+DROP FUNCTION IF EXISTS chan_posts_search();
+ALTER TABLE chan_posts DROP COLUMN IF EXISTS search;
+ALTER TABLE reddit_posts DROP COLUMN IF EXISTS search;
+ALTER TABLE reddit_politics_posts DROP COLUMN IF EXISTS search;
+ALTER TABLE reddit_comments DROP COLUMN IF EXISTS search;
+ALTER TABLE reddit_politics_comments DROP COLUMN IF EXISTS search;
+DROP FUNCTION IF EXISTS chan_html_to_text(TEXT);
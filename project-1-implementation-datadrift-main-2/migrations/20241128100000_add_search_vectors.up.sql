@@ -0,0 +1,47 @@
+-- Full-text search over the collected text: a tsvector column per content table, kept
+-- in sync by Postgres on insert, and a GIN index on it, so keyword searches are index
+-- lookups instead of LIKE '%...%' scans over text and JSONB.
+
+-- 4chan comments are HTML: drop tags (line breaks, quote links, <wbr>) and decode the
+-- entities the API emits before tokenizing.
+CREATE FUNCTION chan_html_to_text(html TEXT) RETURNS TEXT
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE RETURNS NULL ON NULL INPUT
+AS $$
+    SELECT replace(replace(replace(replace(replace(replace(
+        regexp_replace(html, '<[^>]*>', ' ', 'g'),
+        '&gt;', '>'), '&lt;', '<'), '&quot;', '"'), '&#039;', ''''), '&#39;', ''''), '&amp;', '&')
+$$;
+
+-- chan_posts gets a plain column that a trigger fills, rather than a generated one, so a
+-- later migration can point it at the cleaned text by replacing the function
+ALTER TABLE chan_posts ADD COLUMN search tsvector;
+
+CREATE FUNCTION chan_posts_search() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.search := to_tsvector('english', coalesce(chan_html_to_text(NEW.com), ''));
+    RETURN NEW;
+END
+$$;
+CREATE TRIGGER chan_posts_search BEFORE INSERT OR UPDATE OF com ON chan_posts
+    FOR EACH ROW EXECUTE FUNCTION chan_posts_search();
+UPDATE chan_posts SET search = to_tsvector('english', coalesce(chan_html_to_text(com), ''));
+
+-- Titles rank above self-text
+ALTER TABLE reddit_posts ADD COLUMN search tsvector
+    GENERATED ALWAYS AS (setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+                         setweight(to_tsvector('english', coalesce(content, '')), 'B')) STORED;
+ALTER TABLE reddit_politics_posts ADD COLUMN search tsvector
+    GENERATED ALWAYS AS (setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+                         setweight(to_tsvector('english', coalesce(content, '')), 'B')) STORED;
+ALTER TABLE reddit_comments ADD COLUMN search tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce(data->>'body', ''))) STORED;
+ALTER TABLE reddit_politics_comments ADD COLUMN search tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce(data->>'body', ''))) STORED;
+
+CREATE INDEX ON chan_posts USING GIN (search);
+CREATE INDEX ON reddit_posts USING GIN (search);
+CREATE INDEX ON reddit_politics_posts USING GIN (search);
+CREATE INDEX ON reddit_comments USING GIN (search);
+CREATE INDEX ON reddit_politics_comments USING GIN (search);
@@ -0,0 +1,43 @@
+-- Back to scoring and searching the comment HTML
+DROP MATERIALIZED VIEW IF EXISTS posts_hourly;
+DROP MATERIALIZED VIEW IF EXISTS posts_daily;
+
+CREATE MATERIALIZED VIEW posts_hourly
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 hour', created_at) AS bucket,
+       board,
+       count(*) AS post_count,
+       avg(char_length(data->>'com') / 100.0) AS mean_toxicity
+FROM posts
+GROUP BY bucket, board
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW posts_daily
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 day', created_at) AS bucket,
+       board,
+       count(*) AS post_count,
+       avg(char_length(data->>'com') / 100.0) AS mean_toxicity
+FROM posts
+GROUP BY bucket, board
+WITH NO DATA;
+
+SELECT add_continuous_aggregate_policy('posts_hourly', start_offset => INTERVAL '3 days', end_offset => INTERVAL '1 hour', schedule_interval => INTERVAL '30 minutes');
+SELECT add_continuous_aggregate_policy('posts_daily', start_offset => INTERVAL '7 days', end_offset => INTERVAL '1 hour', schedule_interval => INTERVAL '1 hour');
+
+CREATE OR REPLACE FUNCTION chan_posts_search() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.search := to_tsvector('english', coalesce(chan_html_to_text(NEW.com), ''));
+    RETURN NEW;
+END
+$$;
+DROP TRIGGER chan_posts_search ON chan_posts;
+CREATE TRIGGER chan_posts_search BEFORE INSERT OR UPDATE OF com ON chan_posts
+    FOR EACH ROW EXECUTE FUNCTION chan_posts_search();
+UPDATE chan_posts SET search = to_tsvector('english', coalesce(chan_html_to_text(com), '')) WHERE text IS NOT NULL;
+
+DROP TABLE IF EXISTS chan_quote_links;
+ALTER TABLE chan_posts DROP COLUMN IF EXISTS greentext;
+ALTER TABLE chan_posts DROP COLUMN IF EXISTS text;
@@ -0,0 +1,60 @@
+-- Plain text of 4chan comments, cleaned once at ingest (see chan_text.py): chan_posts.text
+-- holds the comment without HTML, entities or quote links, chan_posts.greentext flags
+-- posts with greentext, and chan_quote_links holds the >>123 quote links as reply edges.
+-- python3 chan_text.py rebuild fills these in for rows crawled before this migration.
+ALTER TABLE chan_posts ADD COLUMN text TEXT;
+ALTER TABLE chan_posts ADD COLUMN greentext BOOLEAN;
+
+CREATE TABLE chan_quote_links (
+    board TEXT NOT NULL,
+    thread_number BIGINT NOT NULL,
+    post_number BIGINT NOT NULL,  -- the replying post
+    created_at TIMESTAMPTZ NOT NULL,  -- of the replying post
+    quoted_board TEXT NOT NULL,  -- same as board unless the link points to another board
+    quoted_post_number BIGINT NOT NULL,
+    PRIMARY KEY (board, post_number, quoted_board, quoted_post_number)
+);
+-- Replies to a post
+CREATE INDEX ON chan_quote_links (quoted_board, quoted_post_number);
+
+-- Search the cleaned text instead of stripping the HTML again. Existing rows keep their
+-- HTML-derived vector until chan_text.py rebuild sets their text, which refills it.
+CREATE OR REPLACE FUNCTION chan_posts_search() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.search := to_tsvector('english', coalesce(NEW.text, ''));
+    RETURN NEW;
+END
+$$;
+DROP TRIGGER chan_posts_search ON chan_posts;
+CREATE TRIGGER chan_posts_search BEFORE INSERT OR UPDATE OF text ON chan_posts
+    FOR EACH ROW EXECUTE FUNCTION chan_posts_search();
+
+-- The 4chan rollups score the cleaned text of chan_posts instead of the HTML in posts.data.
+-- Refresh them once after the rebuild: CALL refresh_continuous_aggregate('posts_daily', NULL, NULL);
+DROP MATERIALIZED VIEW IF EXISTS posts_hourly;
+DROP MATERIALIZED VIEW IF EXISTS posts_daily;
+
+CREATE MATERIALIZED VIEW posts_hourly
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 hour', created_at) AS bucket,
+       board,
+       count(*) AS post_count,
+       avg(char_length(text) / 100.0) AS mean_toxicity
+FROM chan_posts
+GROUP BY bucket, board
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW posts_daily
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 day', created_at) AS bucket,
+       board,
+       count(*) AS post_count,
+       avg(char_length(text) / 100.0) AS mean_toxicity
+FROM chan_posts
+GROUP BY bucket, board
+WITH NO DATA;
+
+SELECT add_continuous_aggregate_policy('posts_hourly', start_offset => INTERVAL '3 days', end_offset => INTERVAL '1 hour', schedule_interval => INTERVAL '30 minutes');
+SELECT add_continuous_aggregate_policy('posts_daily', start_offset => INTERVAL '7 days', end_offset => INTERVAL '1 hour', schedule_interval => INTERVAL '1 hour');
@@ -0,0 +1,2 @@
+-- Drop the scatter counts of the incremental analysis
+DROP TABLE IF EXISTS analysis_scatter_counts;
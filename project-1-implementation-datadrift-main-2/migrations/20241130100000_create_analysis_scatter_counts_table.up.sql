@@ -0,0 +1,10 @@
+-- Rows per day, toxicity score and engagement value (num_comments) for the incremental
+-- analysis, so the binned engagement scatter counts every row of a window, not the sample
+CREATE TABLE analysis_scatter_counts (
+    source TEXT NOT NULL,
+    day DATE NOT NULL,
+    toxicity DOUBLE PRECISION NOT NULL,
+    value DOUBLE PRECISION NOT NULL,
+    count BIGINT NOT NULL,
+    PRIMARY KEY (source, day, toxicity, value)
+);
@@ -0,0 +1,2 @@
+-- Drop the poster IDs (the sketches keep their author counts until rebuilt)
+ALTER TABLE chan_posts DROP COLUMN IF EXISTS poster_id;
@@ -0,0 +1,10 @@
+-- Per-thread poster ID of 4chan posts, on boards that show one (/pol/, /biz/, ...).
+-- Names are almost always "Anonymous", so this is what the post_sketches author counts
+-- use; on boards without IDs (such as /fit/) it is NULL and authors are not counted.
+-- Rebuild the chan_posts sketches afterwards: python3 sketches.py rebuild chan_posts
+ALTER TABLE chan_posts ADD COLUMN poster_id TEXT;
+
+UPDATE chan_posts AS c SET poster_id = p.data->>'id'
+FROM posts AS p
+WHERE p.board = c.board AND p.thread_number = c.thread_number AND p.post_number = c.post_number
+  AND p.created_at = c.created_at AND p.data ? 'id';
@@ -6,6 +6,9 @@ from pyfaktory import Client, Job, Producer
 import logging
 import time
 from reddit_client import RedditClient
+from sketches import store_sketches, toxicity
+from terms import store_terms
+from dedup import assign_cluster
 
 # Load environment variables
 load_dotenv()
@@ -35,12 +38,19 @@ last_processed_post_id = {}
 
 def store_reddit_comments(post_id, comments, category):
     """Store Reddit post comments into the correct table based on category"""
+    conn = cur = None
     try:
         conn = psycopg2.connect(dsn=DATABASE_URL)
         cur = conn.cursor()
+        table = 'reddit_comments' if category == 'fitness' else 'reddit_politics_comments'
+        sketch_rows = []
+        texts = []
 
         for comment in comments:
             comment_data = comment.get('data', {})
+            # Skip "more" stubs (links to unloaded replies) and anything else without a creation time
+            if comment.get('kind') != 't1' or not comment_data.get('created_utc'):
+                continue
             comment_id = comment_data.get('id')
             subreddit = comment_data.get('subreddit', '')  # Ensure subreddit is present
 
@@ -50,21 +60,34 @@ def store_reddit_comments(post_id, comments, category):
                 logger.info(f"Comment {comment_id} already exists. Skipping insert.")
                 continue  # Skip if comment already exists
 
+            # The comment tables are hypertables on created_utc, so it has to be set on insert
+            created_utc = float(comment_data['created_utc'])
+
+            cluster_id = assign_cluster(cur, table, comment_data.get('body'))
             if category == 'fitness':
                 cur.execute(
-                    "INSERT INTO reddit_comments (post_id, subreddit, comment_id, data) VALUES (%s, %s, %s, %s) RETURNING comment_id",
-                    (post_id, subreddit, comment_id, Json(comment_data))
+                    "INSERT INTO reddit_comments (post_id, subreddit, comment_id, created_utc, data, cluster_id) "
+                    "VALUES (%s, %s, %s, to_timestamp(%s), %s, %s) RETURNING comment_id",
+                    (post_id, subreddit, comment_id, created_utc, Json(comment_data), cluster_id)
                 )
             elif category == 'politics':
                 cur.execute(
-                    "INSERT INTO reddit_politics_comments (post_id, subreddit, comment_id, data) VALUES (%s, %s, %s, %s) RETURNING comment_id",
-                    (post_id, subreddit, comment_id, Json(comment_data))
+                    "INSERT INTO reddit_politics_comments (post_id, subreddit, comment_id, created_utc, data, cluster_id) "
+                    "VALUES (%s, %s, %s, to_timestamp(%s), %s, %s) RETURNING comment_id",
+                    (post_id, subreddit, comment_id, created_utc, Json(comment_data), cluster_id)
                 )
+            sketch_rows.append((subreddit, created_utc, toxicity(comment_data.get('body')), comment_data.get('author')))
+            texts.append((subreddit, created_utc, comment_data.get('body')))
 
+        # Fold the inserted comments into their subreddit/day sketches and term counts before committing them
+        store_sketches(cur, table, sketch_rows)
+        store_terms(cur, table, texts)
         conn.commit()
         logger.info(f"Inserted comments for post {post_id}")
     except Exception as e:
         logger.error(f"Error storing Reddit comments: {str(e)}")
+        if conn:
+            conn.rollback()
     finally:
         if cur:
             cur.close()
@@ -73,6 +96,7 @@ def store_reddit_comments(post_id, comments, category):
 
 def store_reddit_data(post_data, category):
     """Store Reddit post data into the PostgreSQL database"""
+    conn = cur = None
     try:
         post_id = post_data['id']
         subreddit = post_data.get('subreddit')
@@ -96,28 +120,34 @@ def store_reddit_data(post_data, category):
         if created_utc:
             created_utc = float(created_utc)  
 
+        table = 'reddit_posts' if category == 'fitness' else 'reddit_politics_posts'
+        cluster_id = assign_cluster(cur, table, post_data.get('title'))
         if category == 'fitness':
             cur.execute(
-                "INSERT INTO reddit_posts (post_id, subreddit, title, content, created_utc, author, url, num_comments, score, data) "
-                "VALUES (%s, %s, %s, %s, to_timestamp(%s), %s, %s, %s, %s, %s) RETURNING post_id",
+                "INSERT INTO reddit_posts (post_id, subreddit, title, content, created_utc, author, url, num_comments, score, data, cluster_id) "
+                "VALUES (%s, %s, %s, %s, to_timestamp(%s), %s, %s, %s, %s, %s, %s) RETURNING post_id",
                 (post_id, subreddit, post_data.get('title'), post_data.get('content'),
                  created_utc, post_data.get('author'), post_data.get('url'),
-                 post_data.get('num_comments'), post_data.get('score'), Json(post_data))
+                 post_data.get('num_comments'), post_data.get('score'), Json(post_data), cluster_id)
             )
         elif category == 'politics':
             cur.execute(
-                "INSERT INTO reddit_politics_posts (post_id, subreddit, title, content, created_utc, author, url, num_comments, score, data) "
-                "VALUES (%s, %s, %s, %s, to_timestamp(%s), %s, %s, %s, %s, %s) RETURNING post_id",
+                "INSERT INTO reddit_politics_posts (post_id, subreddit, title, content, created_utc, author, url, num_comments, score, data, cluster_id) "
+                "VALUES (%s, %s, %s, %s, to_timestamp(%s), %s, %s, %s, %s, %s, %s) RETURNING post_id",
                 (post_id, subreddit, post_data.get('title'), post_data.get('content'),
                  created_utc, post_data.get('author'), post_data.get('url'),
-                 post_data.get('num_comments'), post_data.get('score'), Json(post_data))
+                 post_data.get('num_comments'), post_data.get('score'), Json(post_data), cluster_id)
             )
 
-        conn.commit()
         db_id = cur.fetchone()[0]  # Return the post_id after insert
+        store_sketches(cur, table, [(subreddit, created_utc, toxicity(post_data.get('title')), post_data.get('author'))])
+        store_terms(cur, table, [(subreddit, created_utc, post_data.get('title'))])
+        conn.commit()
         logger.info(f"Inserted Reddit post with DB post_id: {db_id}")
     except Exception as e:
         logger.error(f"Error storing Reddit post data: {str(e)}")
+        if conn:
+            conn.rollback()
     finally:
         if cur:
             cur.close()
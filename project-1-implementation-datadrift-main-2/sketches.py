@@ -0,0 +1,233 @@
+"""
+Mergeable sketches of toxicity quantiles and distinct authors, kept per day in post_sketches.
+
+The crawlers fold every row they insert into the sketch of its (source, board/subreddit,
+UTC day) bucket, in the same transaction as the insert. A KLL sketch answers toxicity
+quantiles (median, p95) within about 1% rank error and a HyperLogLog counts distinct
+authors within about 1.6%. Both merge losslessly, so any range of days is answered by
+merging that many small sketches instead of scanning the rows (the dashboard does this
+in /api/sketches).
+
+Toxicity is the same length based score as everywhere else (characters / 100). 4chan
+authors are per-thread poster IDs (chan_author); boards without IDs count no authors.
+
+Usage: python3 sketches.py rebuild chan_posts   (drop a source's sketches and re-add all of its rows)
+"""
+import datetime
+import hashlib
+import math
+import random
+from psycopg2.extras import Json
+from batches import fold_rows, rebuild_command
+
+# KLL accuracy parameter: about 1.65 / k normalized rank error
+KLL_K = 200
+
+# HyperLogLog precision: 2 ** 12 one-byte registers, about 1.04 / sqrt(4096) relative error
+HLL_PRECISION = 12
+
+
+class KllSketch:
+    """KLL quantile sketch (Karnin, Lang, Liberty 2016).
+
+    levels[h] holds items of weight 2 ** h. A full level is sorted and every other item
+    (from a random offset) is promoted to the next level, so the sketch keeps
+    O(k) items however many values are added.
+    """
+
+    def __init__(self, k=KLL_K, n=0, levels=None):
+        self.k = k
+        self.n = n
+        self.levels = levels if levels is not None else [[]]
+
+    def capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, math.ceil(self.k * (2 / 3) ** depth))
+
+    def update(self, value):
+        self.levels[0].append(value)
+        self.n += 1
+        self._compress()
+
+    def merge(self, other):
+        """Add the values summarized by another sketch into this one."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.n += other.n
+        self._compress()
+
+    def _compress(self):
+        while sum(len(items) for items in self.levels) >= sum(self.capacity(h) for h in range(len(self.levels))):
+            for level, items in enumerate(self.levels):
+                if len(items) >= self.capacity(level):
+                    if level + 1 == len(self.levels):
+                        self.levels.append([])
+                    items.sort()
+                    # An odd item out stays at this level
+                    kept = [items.pop()] if len(items) % 2 else []
+                    self.levels[level + 1].extend(items[random.randint(0, 1)::2])
+                    self.levels[level] = kept
+                    break
+
+    def quantile(self, q):
+        """Approximate q-quantile of the values added (None if there are none)."""
+        return weighted_quantile(self.levels, q)
+
+    def to_json(self):
+        return {"k": self.k, "n": self.n, "levels": self.levels}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data["k"], data["n"], [list(items) for items in data["levels"]])
+
+
+def weighted_quantile(levels, q):
+    """q-quantile of KLL levels (items of level h weigh 2 ** h), None if they are empty."""
+    weighted = sorted((value, 1 << level) for level, items in enumerate(levels) for value in items)
+    if not weighted:
+        return None
+    target = q * sum(weight for _, weight in weighted)
+    seen = 0
+    for value, weight in weighted:
+        seen += weight
+        if seen >= target:
+            return value
+    return weighted[-1][0]
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter (Flajolet et al. 2007) over 64-bit BLAKE2b hashes."""
+
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        self.precision = precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(1 << precision)
+
+    def add(self, value):
+        hashed = int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "big")
+        index = hashed >> (64 - self.precision)
+        rest = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = 64 - self.precision - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self):
+        return hll_estimate(self.registers)
+
+
+def hll_estimate(registers):
+    """Distinct count estimate from HyperLogLog registers, with linear counting for small counts."""
+    m = len(registers)
+    estimate = 0.7213 / (1 + 1.079 / m) * m * m / sum(2.0 ** -r for r in registers)
+    zeros = registers.count(0)
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * math.log(m / zeros)
+    return round(estimate)
+
+
+def toxicity(text):
+    """Length based toxicity score of a post's text (None without text)."""
+    return len(text) / 100 if text else None
+
+
+def chan_author(thread_number, poster_id):
+    """Author key of a 4chan post: its per-thread poster ID, None on boards without IDs.
+
+    Names are almost always "Anonymous", so they can't tell posters apart. An ID only
+    holds within its thread, so a poster counts once per thread they post in.
+    """
+    return f"{thread_number}/{poster_id}" if poster_id else None
+
+
+class BucketSketch:
+    """Rows, toxicity quantile sketch and author counter of one post_sketches bucket."""
+
+    def __init__(self, rows=0, quantiles=None, authors=None):
+        self.rows = rows
+        self.quantiles = quantiles or KllSketch()
+        self.authors = authors or HyperLogLog()
+
+    def add(self, score, author):
+        self.rows += 1
+        if score is not None:
+            self.quantiles.update(score)
+        if author:
+            self.authors.add(author)
+
+    def merge(self, other):
+        self.rows += other.rows
+        self.quantiles.merge(other.quantiles)
+        self.authors.merge(other.authors)
+
+
+def store_sketches(cur, source, rows):
+    """Fold rows of (community, created time, toxicity, author) into post_sketches.
+
+    Runs in the caller's transaction, so the sketches commit (or roll back) with the rows
+    they describe. Each touched bucket is locked, merged and written back once; buckets
+    are visited in sorted order so concurrent crawlers always lock them in the same order.
+    """
+    buckets = {}
+    for community, created, score, author in rows:
+        if created is None:
+            continue
+        if not isinstance(created, datetime.datetime):
+            created = datetime.datetime.fromtimestamp(float(created), datetime.timezone.utc)
+        day = created.astimezone(datetime.timezone.utc).date()
+        buckets.setdefault((community, day), BucketSketch()).add(score, author)
+
+    for (community, day), sketch in sorted(buckets.items(), key=lambda item: item[0]):
+        key = (source, community, day)
+        empty = BucketSketch()
+        cur.execute(
+            "INSERT INTO post_sketches (source, community, bucket, rows, toxicity, authors) "
+            "VALUES (%s, %s, %s, 0, %s, %s) ON CONFLICT DO NOTHING",
+            key + (Json(empty.quantiles.to_json()), bytes(empty.authors.registers))
+        )
+        cur.execute(
+            "SELECT rows, toxicity, authors FROM post_sketches "
+            "WHERE source = %s AND community = %s AND bucket = %s FOR UPDATE",
+            key
+        )
+        stored_rows, quantiles, authors = cur.fetchone()
+        stored = BucketSketch(stored_rows, KllSketch.from_json(quantiles), HyperLogLog(registers=authors))
+        stored.merge(sketch)
+        cur.execute(
+            "UPDATE post_sketches SET rows = %s, toxicity = %s, authors = %s, updated_at = now() "
+            "WHERE source = %s AND community = %s AND bucket = %s",
+            (stored.rows, Json(stored.quantiles.to_json()), bytes(stored.authors.registers)) + key
+        )
+
+
+# Per source: (community column, created column, text expression, author expression),
+# matching what the crawlers pass to store_sketches (chan_author for 4chan)
+SOURCES = {
+    "chan_posts": ("board", "created_at", "text", "thread_number || '/' || poster_id"),
+    "reddit_posts": ("subreddit", "created_utc", "title", "author"),
+    "reddit_politics_posts": ("subreddit", "created_utc", "title", "author"),
+    "reddit_comments": ("subreddit", "created_utc", "data->>'body'", "data->>'author'"),
+    "reddit_politics_comments": ("subreddit", "created_utc", "data->>'body'", "data->>'author'"),
+}
+
+
+def rebuild(source, batch_size=10000):
+    """Recompute every sketch of a source from its table (for data crawled before the sketches existed).
+
+    The source's sketches are deleted first, since re-adding rows to a KLL or HyperLogLog
+    sketch that already holds them would count them twice.
+    """
+    community, created, text, author = SOURCES[source]
+    fold_rows(
+        f"SELECT {community}, {created}, {text}, {author} FROM {source}",
+        lambda cur, rows: store_sketches(cur, source, [(c, t, toxicity(body), a) for c, t, body, a in rows]),
+        clear=("DELETE FROM post_sketches WHERE source = %s", (source,)),
+        batch_size=batch_size,
+    )
+
+
+if __name__ == "__main__":
+    rebuild_command(__doc__, rebuild, SOURCES)
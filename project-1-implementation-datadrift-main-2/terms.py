@@ -0,0 +1,93 @@
+"""
+Term-frequency index over ingested text, kept per source, board/subreddit and day in term_counts.
+
+The crawlers tokenize each post or comment once, when they insert it, and add its term
+counts to the day's rows in the same transaction. Top terms for any date range are
+then a sum over a few rows per day (the dashboard serves them at /api/terms and
+background.py draws the word cloud from them) instead of a pass over all the text.
+
+Usage: python3 terms.py rebuild chan_posts   (drop a source's term counts and recount all of its rows)
+"""
+import collections
+import datetime
+import html
+import re
+from psycopg2.extras import execute_values
+from batches import fold_rows, rebuild_command
+from chan_text import CLEANED_SOURCES
+from sketches import SOURCES
+
+# Tags (in Reddit text; 4chan text is cleaned at ingest), links, and words of 3 to 30 characters
+TAG = re.compile(r"<[^>]+>")
+URL = re.compile(r"https?://\S+|www\.\S+")
+TOKEN = re.compile(r"[a-z][a-z0-9']{2,29}")
+
+# Common English words that would otherwise top every list
+STOPWORDS = frozenset("""
+about above after again against all also and any are aren't because been before being below between both but
+can can't cannot could couldn't did didn't does doesn't doing don't down during each few for from further get
+got had hadn't has hasn't have haven't having her here hers herself him himself his how i'd i'll i'm i've
+into isn't it's its itself just let's like more most much mustn't myself nor not now off once only other ought
+our ours ourselves out over own really same she she'd she'll she's should shouldn't some such than that that's
+the their theirs them themselves then there there's these they they'd they'll they're they've this those
+through too under until very was wasn't we'd we'll we're we've were weren't what what's when when's where
+where's which while who who's whom why why's will with won't would wouldn't you you'd you'll you're you've
+your yours yourself yourselves one even still going want know think make people
+""".split())
+
+
+def tokenize(text, markup=True):
+    """Lowercase terms of a post's text, with links and stopwords removed.
+
+    With markup, tags are removed and HTML entities decoded first; pass False for text
+    that chan_text.py has already cleaned.
+    """
+    if not text:
+        return []
+    if markup:
+        text = html.unescape(TAG.sub(" ", text))
+    text = URL.sub(" ", text.lower())
+    return [term for term in (token.rstrip("'") for token in TOKEN.findall(text)) if term not in STOPWORDS]
+
+
+def store_terms(cur, source, rows):
+    """Add the term counts of rows of (community, created time, text) to term_counts.
+
+    Runs in the caller's transaction. Rows are upserted in sorted key order so
+    concurrent crawlers touching the same terms always lock them in the same order.
+    """
+    markup = source not in CLEANED_SOURCES
+    counts = collections.Counter()
+    for community, created, text in rows:
+        if created is None:
+            continue
+        if not isinstance(created, datetime.datetime):
+            created = datetime.datetime.fromtimestamp(float(created), datetime.timezone.utc)
+        day = created.astimezone(datetime.timezone.utc).date()
+        for term in tokenize(text, markup):
+            counts[(community, day, term)] += 1
+    if counts:
+        execute_values(
+            cur,
+            "INSERT INTO term_counts (source, community, day, term, count) VALUES %s "
+            "ON CONFLICT (source, community, day, term) DO UPDATE SET count = term_counts.count + excluded.count",
+            [(source, community, day, term, count) for (community, day, term), count in sorted(counts.items())]
+        )
+
+
+def rebuild(source, batch_size=10000):
+    """Recount every term of a source from its table (for data crawled before the index existed).
+
+    The source's counts are deleted first, since store_terms adds to the stored counts.
+    """
+    community, created, text, _ = SOURCES[source]
+    fold_rows(
+        f"SELECT {community}, {created}, {text} FROM {source}",
+        lambda cur, rows: store_terms(cur, source, rows),
+        clear=("DELETE FROM term_counts WHERE source = %s", (source,)),
+        batch_size=batch_size,
+    )
+
+
+if __name__ == "__main__":
+    rebuild_command(__doc__, rebuild, SOURCES)
@@ -0,0 +1,37 @@
+from chan_text import clean_comment
+from dedup import normalize
+from terms import tokenize
+
+
+def test_clean_comment_strips_html_and_keeps_lines():
+    com = ('<a href="#p123" class="quotelink">&gt;&gt;123</a><br>'
+           '<span class="quote">&gt;be me</span><br><br>'
+           'can&#039;t squat<wbr>ting  &amp; benching')
+    cleaned = clean_comment(com, "fit")
+    assert cleaned.text == ">be me\ncan't squatting  & benching"
+    assert cleaned.quote_links == [("fit", 123)]
+    assert cleaned.greentext
+
+
+def test_clean_comment_quote_links_to_other_threads_and_boards():
+    com = ('<a href="/fit/thread/120#p125" class="quotelink">&gt;&gt;125</a> '
+           '<a href="/g/thread/9#p10" class="quotelink">&gt;&gt;&gt;/g/10</a> '
+           '<a href="//boards.4channel.org/g/" class="quotelink">&gt;&gt;&gt;/g/</a> same')
+    cleaned = clean_comment(com, "fit")
+    assert cleaned.quote_links == [("fit", 125), ("g", 10)]
+    assert cleaned.text == "same"
+    assert not cleaned.greentext
+
+
+def test_clean_comment_plain_and_empty():
+    assert clean_comment("  just text ", "fit") == ("just text", [], False)
+    assert clean_comment(None, "fit") == ("", [], False)
+
+
+def test_cleaned_text_is_not_unescaped_again():
+    # The user typed "&lt;", which the API sends as "&amp;lt;"
+    text = clean_comment("I typed &amp;lt; here", "fit").text
+    assert text == "I typed &lt; here"
+    assert normalize(text, markup=False) == "i typed lt here"
+    assert tokenize("&lt;tag&gt; &amp; words", markup=False) == ["tag", "amp", "words"]
+    assert tokenize("&lt;tag&gt; &amp; words") == ["tag", "words"]
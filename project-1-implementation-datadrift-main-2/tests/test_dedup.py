@@ -0,0 +1,65 @@
+import random
+import numpy as np
+from dedup import BANDS, NUM_PERM, SHINGLE, band_hashes, normalize, signatures, similarity
+
+
+def shingles(text):
+    words = normalize(text)
+    return {words[i:i + SHINGLE] for i in range(len(words) - SHINGLE + 1)}
+
+
+def jaccard(a, b):
+    a, b = shingles(a), shingles(b)
+    return len(a & b) / len(a | b)
+
+
+def corpus(count, seed=0):
+    rng = random.Random(seed)
+    words = [f"word{i}" for i in range(300)]
+    return [" ".join(rng.choices(words, k=rng.randint(5, 60))) for _ in range(count)]
+
+
+def test_normalize_drops_markup_quote_links_and_punctuation():
+    assert normalize('&gt;&gt;123<br>Do you even <b>LIFT</b>, bro?!') == "do you even lift bro"
+    assert normalize(None) == ""
+
+
+def test_batch_signatures_match_one_at_a_time():
+    texts = corpus(50) + ["", "tiny", "<br>"]
+    batch = signatures(texts)
+    assert batch.shape == (len(texts), NUM_PERM)
+    assert batch.dtype == np.uint32
+    for i, text in enumerate(texts):
+        assert np.array_equal(batch[i], signatures([text])[0])
+
+
+def test_texts_without_words_get_the_empty_signature():
+    empty = signatures(["", "!!!", None])
+    assert (empty == np.iinfo(np.uint32).max).all()
+
+
+def test_signature_similarity_estimates_jaccard():
+    rng = random.Random(1)
+    errors = []
+    for base in corpus(200, seed=2):
+        tokens = base.split()
+        # A repost: some words changed, some dropped
+        edited = [t if rng.random() > 0.2 else f"other{rng.randrange(50)}" for t in tokens if rng.random() > 0.1]
+        edited = " ".join(edited) or "other"
+        a, b = signatures([base, edited])
+        estimate = similarity(a, b[None])[0]
+        errors.append(estimate - jaccard(base, edited))
+    # 64 values give a standard error of at most 1 / 16 per pair; the mean error is far smaller
+    assert abs(np.mean(errors)) < 0.02
+    assert np.percentile(np.abs(errors), 95) < 2.5 / np.sqrt(NUM_PERM)
+
+
+def test_equal_texts_share_every_band_and_unrelated_texts_almost_none():
+    texts = corpus(200, seed=3)
+    first = band_hashes(signatures(texts))
+    again = band_hashes(signatures([normalize(t).upper() for t in texts]))
+    assert first.shape == (len(texts), BANDS)
+    assert np.array_equal(first, again)
+    # Pairs of unrelated texts that agree on any band would become LSH candidates
+    candidates = sum((first[i] == first[j]).any() for i in range(0, 200, 2) for j in range(1, 200, 2))
+    assert candidates / (100 * 100) < 0.05
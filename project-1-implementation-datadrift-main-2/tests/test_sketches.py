@@ -0,0 +1,116 @@
+import bisect
+import importlib.util
+import os
+import random
+import pytest
+import pandas as pd
+from sketches import BucketSketch, HyperLogLog, KllSketch, chan_author, hll_estimate, weighted_quantile
+
+# The dashboard's reader of the same rows (project 3's sketches.py), loaded under its own name
+DASHBOARD_SKETCHES = os.path.join(os.path.dirname(__file__), "..", "..", "project-3-implementation-datadrift-main", "sketches.py")
+spec = importlib.util.spec_from_file_location("dashboard_sketches", DASHBOARD_SKETCHES)
+dashboard = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(dashboard)
+
+
+def rank_error(values, estimate, q):
+    """Distance between q and the normalized rank of estimate among the sorted values."""
+    low = bisect.bisect_left(values, estimate) / len(values)
+    high = bisect.bisect_right(values, estimate) / len(values)
+    return 0 if low <= q <= high else min(abs(q - low), abs(q - high))
+
+
+@pytest.fixture(autouse=True)
+def seeded():
+    random.seed(0)
+
+
+def test_kll_merged_quantiles_within_rank_error():
+    values = [random.lognormvariate(0, 1) for _ in range(100_000)]
+    parts = []
+    for start in range(0, len(values), 10_000):
+        part = KllSketch()
+        for value in values[start:start + 10_000]:
+            part.update(value)
+        parts.append(part)
+    merged = KllSketch()
+    for part in parts:
+        merged.merge(part)
+
+    assert merged.n == len(values)
+    assert sum(len(items) for items in merged.levels) < 3 * merged.k
+    values.sort()
+    for q in (0.01, 0.25, 0.5, 0.75, 0.95, 0.99):
+        # about 1.65 / k normalized rank error, with room for the randomness of compaction
+        assert rank_error(values, merged.quantile(q), q) <= 2 * 1.65 / merged.k
+
+
+def test_kll_survives_json_round_trip():
+    sketch = KllSketch()
+    for value in range(5000):
+        sketch.update(value / 100)
+    restored = KllSketch.from_json(sketch.to_json())
+    assert restored.n == sketch.n
+    assert restored.quantile(0.5) == sketch.quantile(0.5)
+
+
+def test_kll_empty():
+    assert KllSketch().quantile(0.5) is None
+
+
+@pytest.mark.parametrize("distinct", [100, 5000, 200_000])
+def test_hll_merged_count_within_relative_error(distinct):
+    parts = [HyperLogLog() for _ in range(4)]
+    for i in range(distinct):
+        # Every value lands in two parts, so merging must not double count
+        parts[i % 4].add(f"author{i}")
+        parts[(i + 1) % 4].add(f"author{i}")
+    merged = HyperLogLog()
+    for part in parts:
+        merged.merge(part)
+    # 1.04 / sqrt(4096) is about 1.6% standard error; allow three of those
+    assert abs(merged.count() - distinct) <= 3 * 1.04 / 64 * distinct
+
+
+def test_dashboard_reader_agrees_with_crawler_sketches():
+    buckets = []
+    for day in range(7):
+        bucket = BucketSketch()
+        for i in range(3000 + 1000 * day):
+            bucket.add(random.expovariate(1), f"author{random.randrange(20_000)}")
+        buckets.append(bucket)
+    # What the crawlers store per row: the KLL sketch as JSON, the HLL registers as bytes
+    stored = [(bucket.quantiles.to_json(), bytes(bucket.authors.registers)) for bucket in buckets]
+
+    pooled = [[] for _ in range(max(len(json["levels"]) for json, _ in stored))]
+    for json, _ in stored:
+        for level, items in enumerate(json["levels"]):
+            pooled[level].extend(items)
+    qs = (0.05, 0.5, 0.95)
+    assert dashboard.quantiles([json for json, _ in stored], qs) == [weighted_quantile(pooled, q) for q in qs]
+
+    merged = HyperLogLog()
+    for bucket in buckets:
+        merged.merge(bucket.authors)
+    registers = dashboard.merge_registers([registers for _, registers in stored])
+    assert bytes(registers) == bytes(merged.registers)
+    assert dashboard.distinct_count(registers) == hll_estimate(merged.registers) == merged.count()
+
+
+def test_anonymous_4chan_posts_count_no_authors():
+    assert chan_author(120, "a1B2c3D4") == "120/a1B2c3D4"
+    # Boards without poster IDs: authors are left out rather than all counted as "Anonymous"
+    assert chan_author(120, None) is None
+
+    without_ids, with_ids = BucketSketch(), BucketSketch()
+    for post in range(50):
+        without_ids.add(0.5, chan_author(120, None))
+        with_ids.add(0.5, chan_author(120 + post % 2, f"id{post % 10}"))
+    rows = pd.DataFrame({
+        "rows": [without_ids.rows],
+        "toxicity": [without_ids.quantiles.to_json()],
+        "authors": [bytes(without_ids.authors.registers)],
+    })
+    assert dashboard.summarize(rows)["distinct_authors"] is None
+    rows["authors"] = [bytes(with_ids.authors.registers)]
+    assert dashboard.summarize(rows)["distinct_authors"] == 10
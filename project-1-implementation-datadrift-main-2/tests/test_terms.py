@@ -0,0 +1,22 @@
+from terms import tokenize
+
+
+def test_tokenize_drops_stopwords_links_and_short_words():
+    text = "The SQUAT is really the king of lifts, see https://example.com/squat?x=1 or www.lifts.org ok"
+    assert tokenize(text) == ["squat", "king", "lifts", "see"]
+
+
+def test_tokenize_keeps_contractions_and_trims_trailing_quotes():
+    assert tokenize("lifters' gains ain't fake") == ["lifters", "gains", "ain't", "fake"]
+
+
+def test_tokenize_markup_strips_tags_and_decodes_entities():
+    assert tokenize("<p>bench&amp;press</p><a href='https://x.org'>squat</a>") == ["bench", "press", "squat"]
+    # Cleaned text is taken as it is: a literal entity is not decoded a second time
+    assert tokenize("bench&amp;press", markup=False) == ["bench", "amp", "press"]
+
+
+def test_tokenize_empty():
+    assert tokenize(None) == []
+    assert tokenize("") == []
+    assert tokenize("a an to") == []
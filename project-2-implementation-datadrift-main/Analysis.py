@@ -1,8 +1,22 @@
+import argparse
+import multiprocessing
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import matplotlib
 import matplotlib.pyplot as plt
-from sqlalchemy import create_engine
+from matplotlib.colors import LogNorm
+from functools import lru_cache
 import os
 from dotenv import load_dotenv
+from aggregators import ToxicityAggregator
+from db import pooled_engine
+import incremental
 
 # Load environment variables
 load_dotenv()
@@ -10,26 +24,190 @@ load_dotenv()
 # Database connection
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Parquet snapshot written by export_parquet.py
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshot")
+
+# Rows fetched per round trip when streaming a source through the aggregators
+FETCH_CHUNKSIZE = int(os.getenv("FETCH_CHUNKSIZE", 50_000))
+
+# Processes used to render the figures. Each spawned worker re-imports pandas and matplotlib
+# before drawing anything, which costs more than the handful of figures take in-process.
+DEFAULT_WORKERS = 1
+
+# Analysis window (the SQL queries below use the same dates)
+START_DATE = '2024-11-01'
+END_DATE = '2024-11-14'
+
+# Bins of the per-source histograms, and of the combined comparison over a shared range
+HISTOGRAM_BINS = 20
+COMBINED_BINS = 50  # Increase the number of bins for a detailed histogram
+COMBINED_RANGE = (0, 20)  # Extend the x-axis range for a wider display
+
+# Number of toxicity strata the engagement scatter is sampled from, and cells per axis of its binned version
+SCATTER_STRATA = 20
+SCATTER_GRID = 40
+
+# Text columns are read into Arrow-backed strings rather than Python objects
+ARROW_STRING = pd.ArrowDtype(pa.string())
+
+# Queries used by analyze_and_visualize (module level so benchmarks can reuse them)
+QUERY_REDDIT = """
+    SELECT title AS content, created_utc, num_comments
+    FROM reddit_posts
+    WHERE created_utc BETWEEN '2024-11-01' AND '2024-11-14';
+"""
+QUERY_REDDIT_POLITICS_POSTS = """
+    SELECT title AS content, created_utc
+    FROM reddit_politics_posts
+    WHERE created_utc BETWEEN '2024-11-01' AND '2024-11-14';
+"""
+QUERY_REDDIT_POLITICS_COMMENTS = """
+    SELECT content, created_utc
+    FROM reddit_politics_comments
+    WHERE created_utc BETWEEN '2024-11-01' AND '2024-11-14';
+"""
+QUERY_4CHAN = """
+    SELECT text AS content, created_at
+    FROM chan_posts
+    WHERE created_at BETWEEN '2024-11-01' AND '2024-11-14'
+    AND board = 'fit';
+"""
+
+# Time series come from the continuous aggregates instead of rescanning raw rows
+QUERY_REDDIT_TOXICITY_DAILY = """
+    SELECT bucket AS created_utc, sum(mean_toxicity * post_count) / sum(post_count) AS toxicity
+    FROM reddit_posts_daily
+    WHERE bucket BETWEEN '2024-11-01' AND '2024-11-14'
+    GROUP BY bucket
+    ORDER BY bucket;
+"""
+QUERY_4CHAN_TOXICITY_DAILY = """
+    SELECT bucket AS created_at, mean_toxicity AS toxicity
+    FROM posts_daily
+    WHERE bucket BETWEEN '2024-11-01' AND '2024-11-14'
+    AND board = 'fit'
+    ORDER BY bucket;
+"""
+QUERY_POLITICS_SUBMISSIONS_DAILY = """
+    SELECT bucket AS created_utc, sum(post_count) AS submissions
+    FROM reddit_politics_posts_daily
+    WHERE bucket BETWEEN '2024-11-01' AND '2024-11-14'
+    GROUP BY bucket
+    ORDER BY bucket;
+"""
+QUERY_POLITICS_COMMENTS_HOURLY = """
+    SELECT bucket AS created_utc, sum(comment_count) AS comments
+    FROM reddit_politics_comments_hourly
+    WHERE bucket BETWEEN '2024-11-01' AND '2024-11-14'
+    GROUP BY bucket
+    ORDER BY bucket;
+"""
+
+# Seconds taken by each stage of the last analyze_and_visualize run, and the process's
+# peak RSS in MB when it ended, for the report
+stage_times = {}
+stage_memory = {}
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (ru_maxrss is in KB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+@contextmanager
+def timed(stage):
+    """Record how long the with-block takes, and the peak RSS at its end, under stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_times[stage] = time.perf_counter() - start
+        stage_memory[stage] = peak_rss_mb()
+
+def timed_call(stage, function, *args):
+    """Call function(*args), recording its duration under stage."""
+    with timed(stage):
+        return function(*args)
+
+@lru_cache(maxsize=None)
+def get_engine():
+    """Return the engine (and connection pool) shared by every query in this process."""
+    return pooled_engine(DATABASE_URL)
+
 def fetch_data(query):
     """Fetch data from PostgreSQL using SQLAlchemy."""
-    engine = create_engine(DATABASE_URL)
-    with engine.connect() as connection:
+    with get_engine().connect() as connection:
         return pd.read_sql(query, connection)
 
-def preprocess_4chan_dates(data, date_column):
-    """Preprocess 4chan created_at dates to a standard format."""
-    try:
-        # Extract date and time portion, ignoring unnecessary text like (Tue)
-        data[date_column] = data[date_column].str.extract(r'(\d{2}/\d{2}/\d{4}\s\d{2}:\d{2}:\d{2})')[0]
-        data[date_column] = pd.to_datetime(data[date_column], format='%m/%d/%Y %H:%M:%S', errors='coerce')
-        return data
-    except Exception as e:
-        print(f"Error preprocessing 4chan dates: {e}")
-        return data
+def fetch_chunks(query, chunksize=FETCH_CHUNKSIZE):
+    """Yield the result of a query as DataFrames of at most chunksize rows.
+
+    stream_results makes psycopg2 use a named (server-side) cursor, so only one
+    chunk is held in client memory at a time. The text column is Arrow-backed
+    (one buffer per chunk instead of a Python object per row); times and numbers
+    stay NumPy, which the aggregators handle fastest.
+    """
+    with get_engine().connect().execution_options(stream_results=True, max_row_buffer=chunksize) as connection:
+        yield from pd.read_sql(query, connection, chunksize=chunksize, dtype={'content': ARROW_STRING})
+
+def snapshot_chunks(source, columns, time_column, start_date, end_date, community=None, chunksize=FETCH_CHUNKSIZE):
+    """Yield rows of a source from the Parquet snapshot as DataFrames of at most chunksize rows.
+
+    Only the requested columns are read, and the day/community partitions and
+    the time filter are pushed down so pyarrow skips files and row groups
+    outside the window. The window is inclusive on both ends, like BETWEEN.
+    Files in the window that lack one of the columns (exported before it existed)
+    raise a ValueError instead of reading as nulls.
+    """
+    partitioning = ds.partitioning(pa.schema([("community", pa.string()), ("day", pa.string())]), flavor="hive")
+    dataset = ds.dataset(os.path.join(SNAPSHOT_DIR, f"source={source}"), format="parquet", partitioning=partitioning)
+
+    time_type = dataset.schema.field(time_column).type
+    start = pd.Timestamp(start_date, tz=time_type.tz)
+    end = pd.Timestamp(end_date, tz=time_type.tz)
+    partitions = (ds.field("day") >= start.date().isoformat()) & (ds.field("day") <= end.date().isoformat())
+    if community:
+        partitions &= ds.field("community") == community
+    outdated = sorted(
+        fragment.path for fragment in dataset.get_fragments(filter=partitions)
+        if not set(columns) <= set(fragment.physical_schema.names)
+    )
+    if outdated:
+        raise ValueError(
+            f"{len(outdated)} snapshot files of {source} lack some of the columns {columns}, e.g. {outdated[0]}; "
+            f"re-export them with export_parquet.py --since <first day>"
+        )
+    condition = (
+        partitions
+        & (ds.field(time_column) >= pa.scalar(start, type=time_type))
+        & (ds.field(time_column) <= pa.scalar(end, type=time_type))
+    )
+    for batch in dataset.to_batches(columns=columns, filter=condition, batch_size=chunksize):
+        yield batch.to_pandas(types_mapper={pa.string(): ARROW_STRING}.get)
+
+def plot_histogram(histogram, title, xlabel, ylabel, filename):
+    """Plot a Histogram's precomputed bin counts."""
+    histogram.plot(plt.gca(), alpha=0.7)
+    plt.title(title)
+    plt.xlabel(xlabel)
+    plt.ylabel(ylabel)
+    plt.grid(True)
+    plt.savefig(filename)
+    plt.close()
 
-def plot_histogram(data, column, title, xlabel, ylabel, filename):
-    """Plot histogram of a given column."""
-    plt.hist(data[column].dropna(), bins=20, alpha=0.7)
+def plot_scatter(data, x_column, y_column, title, xlabel, ylabel, filename, max_points=2000, total=None):
+    """Plot scatter plot of given columns, as a stratified sample of at most max_points.
+
+    The sample is spread evenly over the x range. total is the number of rows data
+    was sampled from, if it is already a sample.
+    """
+    data = data[[x_column, y_column]].dropna()
+    if len(data) > max_points:
+        # Equal-width strata over x, with up to max_points // strata rows drawn from each
+        strata = pd.cut(data[x_column], bins=SCATTER_STRATA, labels=False)
+        rank = data.assign(_r=np.random.default_rng(0).random(len(data))).groupby(strata)['_r'].rank(method='first')
+        data = data[rank <= max_points // SCATTER_STRATA]
+        plt.text(0.99, 0.99, f"{len(data)} of {total or len(rank)} points", transform=plt.gca().transAxes,
+                 ha='right', va='top', fontsize=8)
+    plt.scatter(data[x_column], data[y_column], s=8, alpha=0.6)
     plt.title(title)
     plt.xlabel(xlabel)
     plt.ylabel(ylabel)
@@ -37,9 +215,11 @@ def plot_histogram(data, column, title, xlabel, ylabel, filename):
     plt.savefig(filename)
     plt.close()
 
-def plot_scatter(data, x_column, y_column, title, xlabel, ylabel, filename):
-    """Plot scatter plot of given columns."""
-    plt.scatter(data[x_column], data[y_column], alpha=0.6)
+def plot_density(histogram, title, xlabel, ylabel, filename):
+    """Plot a 2-D histogram (counts, x_edges, y_edges) as a density plot with a log color scale."""
+    counts, x_edges, y_edges = histogram
+    mesh = plt.pcolormesh(x_edges, y_edges, np.ma.masked_equal(counts.T, 0), norm=LogNorm(), cmap='viridis')
+    plt.colorbar(mesh, label='Count')
     plt.title(title)
     plt.xlabel(xlabel)
     plt.ylabel(ylabel)
@@ -81,35 +261,19 @@ def plot_line_graph(data, date_column, value_column, title, xlabel, ylabel, file
     except Exception as e:
         print(f"Error generating plot for {title}: {e}")
 
-def plot_combined_datasets(data_4chan, data_reddit, data_reddit_politics_posts, data_reddit_politics_comments):
+def plot_combined_datasets(histograms):
     """
     Plot all datasets on the same axes to compare toxicity scores across datasets.
+    histograms maps each source's label to its Histogram over COMBINED_BINS bins of COMBINED_RANGE.
     """
-    # Add a source label to each dataset
-    data_4chan['source'] = '4chan'
-    data_reddit['source'] = 'Reddit'
-    data_reddit_politics_posts['source'] = 'Reddit Politics Posts'
-    data_reddit_politics_comments['source'] = 'Reddit Politics Comments'
-
-    # Combine all datasets
-    combined_data = pd.concat(
-        [data_4chan, data_reddit, data_reddit_politics_posts, data_reddit_politics_comments],
-        ignore_index=True
-    )
-
-    # Remove rows with missing toxicity scores
-    combined_data = combined_data.dropna(subset=['toxicity'])
-
     # Plot the combined data
     plt.figure(figsize=(18, 10))  # Increase figure size for better visualization
-    bins = 50  # Increase the number of bins for a detailed histogram
-    range_values = (0, 20)  # Extend the x-axis range for a wider display
-
-    for source, group in combined_data.groupby('source'):
-        plt.hist(
-            group['toxicity'],
-            bins=bins,
-            range=range_values,  # Control the x-axis range
+
+    for source in sorted(histograms):
+        if histograms[source].total == 0:
+            continue
+        histograms[source].plot(
+            plt.gca(),
             alpha=0.6,
             label=source,
             density=True  # Normalize histogram
@@ -130,12 +294,19 @@ def plot_combined_datasets(data_4chan, data_reddit, data_reddit_politics_posts,
     plt.close()
     print(f"Combined toxicity comparison plot saved as {filename}")
 
-def plot_politics_submissions_daily(data, date_column, filename):
-    """Plot daily submissions in r/politics."""
+def plot_politics_submissions_daily(data, date_column, filename, count_column=None):
+    """Plot daily submissions in r/politics.
+
+    If count_column is given the rows are already bucketed counts (e.g. from a
+    continuous aggregate) and are summed instead of counted.
+    """
     try:
         data[date_column] = pd.to_datetime(data[date_column], errors='coerce')
         data = data.dropna(subset=[date_column])
-        daily_counts = data.set_index(date_column).resample('D').size()
+        if count_column:
+            daily_counts = data.set_index(date_column)[count_column].resample('D').sum()
+        else:
+            daily_counts = data.set_index(date_column).resample('D').size()
 
         daily_counts.plot(kind='bar', figsize=(14, 7), color='skyblue')
         plt.title('Daily Submissions in r/politics (Nov 1, 2024 - Nov 14, 2024)', fontsize=16)
@@ -150,12 +321,15 @@ def plot_politics_submissions_daily(data, date_column, filename):
     except Exception as e:
         print(f"Error generating daily submissions plot: {e}")
 
-def plot_politics_comments_hourly(data, date_column, filename):
-    """Plot hourly comments in r/politics."""
+def plot_politics_comments_hourly(data, date_column, filename, count_column=None):
+    """Plot hourly comments in r/politics (count_column as in plot_politics_submissions_daily)."""
     try:
         data[date_column] = pd.to_datetime(data[date_column], errors='coerce')
         data = data.dropna(subset=[date_column])
-        hourly_counts = data.set_index(date_column).resample('H').size()
+        if count_column:
+            hourly_counts = data.set_index(date_column)[count_column].resample('H').sum()
+        else:
+            hourly_counts = data.set_index(date_column).resample('H').size()
 
         hourly_counts.plot(kind='line', figsize=(14, 7), color='green')
         plt.title('Hourly Comments in r/politics (Nov 1, 2024 - Nov 14, 2024)', fontsize=16)
@@ -170,12 +344,15 @@ def plot_politics_comments_hourly(data, date_column, filename):
     except Exception as e:
         print(f"Error generating hourly comments plot: {e}")
 
-def plot_4chan_comments_hourly(data, date_column, filename):
-    """Plot hourly comments in 4chan’s /pol/."""
+def plot_4chan_comments_hourly(data, date_column, filename, count_column=None):
+    """Plot hourly comments in 4chan’s /pol/ (count_column as in plot_politics_submissions_daily)."""
     try:
         data[date_column] = pd.to_datetime(data[date_column], errors='coerce')
         data = data.dropna(subset=[date_column])
-        hourly_counts = data.set_index(date_column).resample('H').size()
+        if count_column:
+            hourly_counts = data.set_index(date_column)[count_column].resample('H').sum()
+        else:
+            hourly_counts = data.set_index(date_column).resample('H').size()
 
         hourly_counts.plot(kind='line', figsize=(14, 7), color='red')
         plt.title('Hourly Comments in 4chan’s /pol/ (Nov 1, 2024 - Nov 14, 2024)', fontsize=16)
@@ -191,66 +368,163 @@ def plot_4chan_comments_hourly(data, date_column, filename):
         print(f"Error generating hourly comments plot: {e}")
 
 
-def analyze_and_visualize():
-    """Perform all required analyses and generate figures."""
-    # Fetch data from database
-    query_reddit = """
-        SELECT id, title AS content, created_utc, num_comments
-        FROM reddit_posts
-        WHERE created_utc BETWEEN '2024-11-01' AND '2024-11-14';
-    """
-    query_reddit_politics_posts = """
-        SELECT post_id, title AS content, created_utc
-        FROM reddit_politics_posts
-        WHERE created_utc BETWEEN '2024-11-01' AND '2024-11-14';
-    """
-    query_reddit_politics_comments = """
-        SELECT post_id, content AS content, created_utc
-        FROM reddit_politics_comments
-        WHERE created_utc BETWEEN '2024-11-01' AND '2024-11-14';
-    """
-    query_4chan = """
-        SELECT id, data->>'com' AS content, "data"->>'now' AS created_at
-        FROM posts
-        WHERE "data"->>'now' BETWEEN '11/01/2024' AND '11/14/2024'
-        AND board = 'fit';
-    """
-    
-    reddit_data = fetch_data(query_reddit)
-    reddit_politics_posts = fetch_data(query_reddit_politics_posts)
-    reddit_politics_comments = fetch_data(query_reddit_politics_comments)
-    fourchan_data = fetch_data(query_4chan)
-    # fourchan_data_pol = fetch_data(query_4chan_pol)
-
-    # Preprocess 4chan dates
-    fourchan_data = preprocess_4chan_dates(fourchan_data, 'created_at')
+def fold(aggregate, chunks):
+    """Feed every chunk of a source into its aggregator."""
+    for chunk in chunks:
+        aggregate.add(chunk)
+    return aggregate
 
-    # Add mock toxicity data for demonstration
-    reddit_data['toxicity'] = reddit_data['content'].str.len() / 100
-    reddit_politics_posts['toxicity'] = reddit_politics_posts['content'].str.len() / 100
-    reddit_politics_comments['toxicity'] = reddit_politics_comments['content'].str.len() / 100
-    fourchan_data['toxicity'] = fourchan_data['content'].str.len() / 100
+def init_render_worker():
+    """Use the non-interactive Agg backend in figure worker processes."""
+    matplotlib.use('Agg')
 
-    # Plot Histogram of Toxicity
-    plot_histogram(reddit_data, 'toxicity', 'Reddit Toxicity Distribution', 'Toxicity Score', 'Count', 'reddit_toxicity_histogram.png')
-    plot_histogram(fourchan_data, 'toxicity', '4chan Toxicity Distribution', 'Toxicity Score', 'Count', '4chan_toxicity_histogram.png')
+def render_figure(plot, args, kwargs):
+    """Draw one figure and return (seconds taken, peak RSS in MB of the process that drew it)."""
+    start = time.perf_counter()
+    plot(*args, **kwargs)
+    return time.perf_counter() - start, peak_rss_mb()
 
-    # Plot Scatter Plot of Sentiment vs Engagement
-    plot_scatter(reddit_data, 'toxicity', 'num_comments', 'Sentiment vs Engagement (Reddit)', 'Toxicity Score', 'Number of Comments', 'sentiment_engagement_scatter.png')
-
-    # Plot Line Graph of Toxicity Over Time
-    plot_line_graph(reddit_data, 'created_utc', 'toxicity', 'Reddit Toxicity Over Time', 'Date', 'Average Toxicity', 'reddit_toxicity_over_time.png')
-    plot_line_graph(fourchan_data, 'created_at', 'toxicity', '4chan Toxicity Over Time', 'Date', 'Average Toxicity', '4chan_toxicity_over_time.png')
+def render_figures(figures, workers):
+    """Render {filename: (plot function, args, kwargs)}, in a process pool if workers > 1."""
+    if workers <= 1:
+        for filename, (plot, args, kwargs) in figures.items():
+            stage_times[f'render {filename}'], stage_memory[f'render {filename}'] = render_figure(plot, args, kwargs)
+        return
+    # spawn, so workers start clean instead of forking a process that has threads and open connections
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'), initializer=init_render_worker) as pool:
+        futures = {filename: pool.submit(render_figure, plot, args, kwargs) for filename, (plot, args, kwargs) in figures.items()}
+        for filename, future in futures.items():
+            stage_times[f'render {filename}'], stage_memory[f'render {filename}'] = future.result()
 
-    # Plot Combined Toxicity Comparison
-    plot_combined_datasets(fourchan_data, reddit_data, reddit_politics_posts, reddit_politics_comments)
+def print_stage_report():
+    """Print how long each stage took and the peak RSS reached by its end.
 
-    # Additional Required Plots
-    plot_politics_submissions_daily(reddit_politics_posts, 'created_utc', 'daily_submissions_politics.png')
-    plot_politics_comments_hourly(reddit_politics_comments, 'created_utc', 'hourly_comments_politics.png')
-    #plot_4chan_comments_hourly(fourchan_data_pol, 'created_at', 'hourly_comments_pol.png')
+    Peak RSS is a high-water mark, so a stage's value also covers the stages before it
+    in the same process (figures drawn in workers report the worker's own peak).
+    """
+    print(f"{'stage':<48} {'seconds':>8} {'peak RSS MB':>12}")
+    for stage, seconds in stage_times.items():
+        print(f"{stage:<48} {seconds:>8.2f} {stage_memory.get(stage, float('nan')):>12.0f}")
+
+def analyze_and_visualize(data_source='db', scatter_mode='sample', chunksize=FETCH_CHUNKSIZE, workers=DEFAULT_WORKERS):
+    """Perform all required analyses and generate figures.
+
+    data_source is 'db' to query PostgreSQL, 'parquet' to read the snapshot
+    written by export_parquet.py, or 'incremental' to fold only the rows added
+    since the last run into the stored aggregates and draw from those.
+    scatter_mode is 'sample' (plot_scatter over the sample) or 'binned' (plot_density
+    over the counts of every row). Rows are streamed chunksize at a time
+    into per-source aggregators, so memory stays bounded however many rows the
+    window holds. Sources are read concurrently and the figures are rendered in a
+    pool of worker processes; the time of every stage is printed at the end.
+    """
+    stage_times.clear()
+    stage_memory.clear()
+    started = time.perf_counter()
+    if data_source == 'incremental':
+        with timed('fold new rows (all sources)'):
+            incremental.update_state(get_engine(), chunksize, workers=len(incremental.SOURCES))
+        chunks = None
+    elif data_source == 'parquet':
+        chunks = {
+            'reddit': (c.rename(columns={'title': 'content'}) for c in snapshot_chunks('reddit_posts', ['title', 'created_utc', 'num_comments'], 'created_utc', START_DATE, END_DATE, chunksize=chunksize)),
+            'politics_posts': (c.rename(columns={'title': 'content'}) for c in snapshot_chunks('reddit_politics_posts', ['title', 'created_utc'], 'created_utc', START_DATE, END_DATE, chunksize=chunksize)),
+            'politics_comments': snapshot_chunks('reddit_politics_comments', ['content', 'created_utc'], 'created_utc', START_DATE, END_DATE, chunksize=chunksize),
+            '4chan': (c.rename(columns={'text': 'content'}) for c in snapshot_chunks('4chan', ['text', 'created_at'], 'created_at', START_DATE, END_DATE, community='fit', chunksize=chunksize)),
+        }
+    else:
+        # Stream rows from the database through server-side cursors
+        chunks = {
+            'reddit': fetch_chunks(QUERY_REDDIT, chunksize),
+            'politics_posts': fetch_chunks(QUERY_REDDIT_POLITICS_POSTS, chunksize),
+            'politics_comments': fetch_chunks(QUERY_REDDIT_POLITICS_COMMENTS, chunksize),
+            '4chan': fetch_chunks(QUERY_4CHAN, chunksize),
+        }
+        # fourchan_data_pol = fetch_data(query_4chan_pol)
+
+    # Time series queries (db mode) run alongside the row streams
+    series_queries = {} if data_source != 'db' else {
+        'reddit_toxicity_daily': QUERY_REDDIT_TOXICITY_DAILY,
+        'fourchan_toxicity_daily': QUERY_4CHAN_TOXICITY_DAILY,
+        'politics_submissions_daily': QUERY_POLITICS_SUBMISSIONS_DAILY,
+        'politics_comments_hourly': QUERY_POLITICS_COMMENTS_HOURLY,
+    }
+
+    with timed('read sources (wall)'):
+        if chunks is None:
+            aggregates = incremental.load_window(get_engine(), START_DATE, END_DATE)
+        else:
+            # Mock toxicity (content length / 100) is computed by the aggregators chunk by chunk
+            aggregates = {
+                'reddit': ToxicityAggregator('created_utc', sample_columns=['num_comments']),
+                'politics_posts': ToxicityAggregator('created_utc'),
+                'politics_comments': ToxicityAggregator('created_utc'),
+                '4chan': ToxicityAggregator('created_at'),
+            }
+        # Each source gets its own connection from the pool; threads are enough since the work is mostly I/O
+        with ThreadPoolExecutor(max_workers=len(aggregates) + len(series_queries)) as pool:
+            folds = {} if chunks is None else {
+                name: pool.submit(timed_call, f'read {name}', fold, aggregate, chunks[name])
+                for name, aggregate in aggregates.items()
+            }
+            series = {name: pool.submit(timed_call, f'query {name}', fetch_data, query) for name, query in series_queries.items()}
+            for future in list(folds.values()) + list(series.values()):
+                future.result()
+    reddit, fourchan = aggregates['reddit'], aggregates['4chan']
+
+    if data_source != 'db':
+        # The snapshot and the stored state have no continuous aggregates, so the series come from the aggregates
+        reddit_toxicity_daily = reddit.time_series('D')
+        fourchan_toxicity_daily = fourchan.time_series('D')
+        politics_submissions_daily, submissions_column = aggregates['politics_posts'].time_series('D'), 'count'
+        politics_comments_hourly, comments_column = aggregates['politics_comments'].time_series('h'), 'count'
+    else:
+        reddit_toxicity_daily = series['reddit_toxicity_daily'].result()
+        fourchan_toxicity_daily = series['fourchan_toxicity_daily'].result()
+        politics_submissions_daily, submissions_column = series['politics_submissions_daily'].result(), 'submissions'
+        politics_comments_hourly, comments_column = series['politics_comments_hourly'].result(), 'comments'
+
+    figures = {
+        # Histograms of Toxicity
+        'reddit_toxicity_histogram.png': (plot_histogram, (reddit.toxicity_histogram(HISTOGRAM_BINS), 'Reddit Toxicity Distribution', 'Toxicity Score', 'Count', 'reddit_toxicity_histogram.png'), {}),
+        '4chan_toxicity_histogram.png': (plot_histogram, (fourchan.toxicity_histogram(HISTOGRAM_BINS), '4chan Toxicity Distribution', 'Toxicity Score', 'Count', '4chan_toxicity_histogram.png'), {}),
+        # Scatter Plot of Sentiment vs Engagement
+        'sentiment_engagement_scatter.png': (
+            (plot_density, (reddit.scatter_histogram(SCATTER_GRID), 'Sentiment vs Engagement (Reddit)', 'Toxicity Score', 'Number of Comments', 'sentiment_engagement_scatter.png'), {})
+            if scatter_mode == 'binned' else
+            (plot_scatter, (reddit.sample_frame(), 'toxicity', 'num_comments', 'Sentiment vs Engagement (Reddit)', 'Toxicity Score', 'Number of Comments', 'sentiment_engagement_scatter.png'), {'total': reddit.rows})
+        ),
+        # Line Graphs of Toxicity Over Time
+        'reddit_toxicity_over_time.png': (plot_line_graph, (reddit_toxicity_daily, 'created_utc', 'toxicity', 'Reddit Toxicity Over Time', 'Date', 'Average Toxicity', 'reddit_toxicity_over_time.png'), {}),
+        '4chan_toxicity_over_time.png': (plot_line_graph, (fourchan_toxicity_daily, 'created_at', 'toxicity', '4chan Toxicity Over Time', 'Date', 'Average Toxicity', '4chan_toxicity_over_time.png'), {}),
+        # Combined Toxicity Comparison
+        'combined_toxicity_comparison.png': (plot_combined_datasets, ({
+            label: aggregates[source].toxicity_histogram(COMBINED_BINS, COMBINED_RANGE)
+            for label, source in [('4chan', '4chan'), ('Reddit', 'reddit'), ('Reddit Politics Posts', 'politics_posts'), ('Reddit Politics Comments', 'politics_comments')]
+        },), {}),
+        # Additional Required Plots
+        'daily_submissions_politics.png': (plot_politics_submissions_daily, (politics_submissions_daily, 'created_utc', 'daily_submissions_politics.png'), {'count_column': submissions_column}),
+        'hourly_comments_politics.png': (plot_politics_comments_hourly, (politics_comments_hourly, 'created_utc', 'hourly_comments_politics.png'), {'count_column': comments_column}),
+        #'hourly_comments_pol.png': (plot_4chan_comments_hourly, (fourchan_data_pol, 'created_at', 'hourly_comments_pol.png'), {}),
+    }
+    with timed('render figures (wall)'):
+        render_figures(figures, workers)
+    stage_times['total (wall)'] = time.perf_counter() - started
+    stage_memory['total (wall)'] = peak_rss_mb()
 
     print("Figures generated successfully!")
+    print_stage_report()
 
 if __name__ == "__main__":
-    analyze_and_visualize()
+    parser = argparse.ArgumentParser(description="Generate the toxicity and activity figures.")
+    parser.add_argument("--source", choices=["db", "parquet", "incremental"], default="db",
+                        help="read from PostgreSQL (default), the Parquet snapshot in $SNAPSHOT_DIR, "
+                             "or the incremental state tables after folding in new rows")
+    parser.add_argument("--scatter-mode", choices=["sample", "binned"], default="sample",
+                        help="how the engagement scatter is reduced (default: stratified sample)")
+    parser.add_argument("--chunksize", type=int, default=FETCH_CHUNKSIZE,
+                        help="rows streamed per chunk (default: $FETCH_CHUNKSIZE or 50000)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="processes rendering figures (default: 1, render in this process)")
+    args = parser.parse_args()
+    analyze_and_visualize(data_source=args.source, scatter_mode=args.scatter_mode, chunksize=args.chunksize, workers=args.workers)
@@ -0,0 +1,125 @@
+"""
+Incremental aggregates for the analysis figures.
+
+An aggregator folds DataFrame chunks into running totals. Their size depends on the
+domain of the data (distinct toxicity scores, hours and days covered), not on the
+number of rows, so a source of any size can be streamed through in bounded memory.
+Times are kept as naive UTC, and everything is kept per day or finer so the totals
+can also be stored and later cut to any window of days (see incremental.py).
+"""
+import numpy as np
+import pandas as pd
+from histograms import Histogram
+
+# Rows kept per day for the engagement scatter sample
+SAMPLE_SIZE = 20_000
+
+
+class ToxicityAggregator:
+    """Running toxicity aggregates for one source.
+
+    - daily_counts: rows per (day, toxicity score). Scores are character length / 100,
+      so they are discrete and the counts give exact histograms.
+    - hourly: rows, scored rows and toxicity sum per hour of time_column.
+    - sample: per day, the sample_size rows with the smallest random keys (bottom-k)
+      of sample_columns plus toxicity. The union over any set of days contains the
+      bottom-k of those days, so sample_frame() is a uniform sample of the window.
+      seed fixes the sample keys for reproducible figures; pass None when the keys are
+      stored and merged with those of other runs (see incremental.py).
+    - scatter_counts: rows per (day, toxicity score, value of the first sample column),
+      so the binned scatter is an exact 2-D histogram of every row, not of the sample.
+    """
+
+    def __init__(self, time_column, sample_columns=None, sample_size=SAMPLE_SIZE, seed=0):
+        self.time_column = time_column
+        self.sample_columns = sample_columns
+        self.sample_size = sample_size
+        self.rng = np.random.default_rng(seed)
+        self.rows = 0
+        self.daily_counts = pd.Series(dtype='float64', index=pd.MultiIndex.from_arrays([[], []], names=['day', 'toxicity']))
+        self.hourly = pd.DataFrame(columns=['rows', 'scored', 'toxicity_sum'], dtype='float64')
+        self.sample = None
+        self.scatter_counts = pd.Series(dtype='float64', index=pd.MultiIndex.from_arrays([[], [], []], names=['day', 'toxicity', 'value']))
+
+    @classmethod
+    def from_frames(cls, time_column, rows, hourly, toxicity_counts, sample, scatter_counts=None, sample_size=SAMPLE_SIZE):
+        """Rebuild an aggregator from stored totals (day column optional in toxicity_counts, sample and scatter_counts)."""
+        aggregate = cls(time_column, sample_columns=[c for c in sample.columns if c not in ('toxicity', '_key', 'day')],
+                        sample_size=sample_size)
+        aggregate.rows = rows
+        aggregate.hourly = hourly.astype('float64')
+        if 'day' not in toxicity_counts:
+            toxicity_counts = toxicity_counts.assign(day=pd.NaT)
+        aggregate.daily_counts = toxicity_counts.set_index(['day', 'toxicity'])['count'].astype('float64')
+        aggregate.sample = sample
+        if scatter_counts is not None:
+            if 'day' not in scatter_counts:
+                scatter_counts = scatter_counts.assign(day=pd.NaT)
+            aggregate.scatter_counts = scatter_counts.set_index(['day', 'toxicity', 'value'])['count'].astype('float64')
+        return aggregate
+
+    def add(self, chunk):
+        """Fold a chunk with 'content' and time_column columns into the aggregates ('content' may be Arrow-backed)."""
+        toxicity = chunk['content'].str.len().astype('float64') / 100
+        times = pd.to_datetime(chunk[self.time_column], errors='coerce', utc=True).dt.tz_localize(None)
+        days = times.dt.floor('D')
+        self.rows += len(chunk)
+
+        counts = toxicity.groupby([days, toxicity]).size()
+        counts.index.names = ['day', 'toxicity']
+        self.daily_counts = self.daily_counts.add(counts, fill_value=0)
+
+        partial = toxicity.groupby(times.dt.floor('h')).agg(['size', 'count', 'sum'])
+        partial.columns = ['rows', 'scored', 'toxicity_sum']
+        self.hourly = self.hourly.add(partial, fill_value=0) if len(self.hourly) else partial.astype('float64')
+
+        if self.sample_columns:
+            values = chunk[self.sample_columns[0]].astype('float64')
+            pairs = toxicity.groupby([days, toxicity, values]).size()
+            pairs.index.names = ['day', 'toxicity', 'value']
+            self.scatter_counts = self.scatter_counts.add(pairs, fill_value=0)
+
+            # float32 is plenty for points on a scatter plot
+            keyed = chunk[self.sample_columns].astype('float32').assign(
+                toxicity=toxicity.astype('float32'), day=days, _key=self.rng.random(len(chunk))
+            )
+            self.sample = (
+                pd.concat([self.sample, keyed.dropna(subset=['day'])])
+                .sort_values('_key')
+                .groupby('day', sort=False)
+                .head(self.sample_size)
+            )
+
+    def toxicity_frame(self):
+        """Distinct toxicity scores and their row counts (columns toxicity, count)."""
+        return self.daily_counts.groupby(level='toxicity').sum().reset_index(name='count')
+
+    def toxicity_histogram(self, bins, range=None):
+        """Histogram of the toxicity scores in bins bins over range (default: the lowest to highest score)."""
+        scores = self.toxicity_frame().dropna(subset=['toxicity'])
+        if range is None:
+            range = (scores['toxicity'].min(), scores['toxicity'].max()) if len(scores) else (0, 1)
+        return Histogram.uniform(*range, bins).add(scores['toxicity'], weights=scores['count'])
+
+    def sample_frame(self):
+        """Uniform sample of at most sample_size rows over all days seen."""
+        if self.sample is None:
+            return pd.DataFrame(columns=(self.sample_columns or []) + ['toxicity'])
+        return self.sample.nsmallest(self.sample_size, '_key')
+
+    def scatter_histogram(self, bins):
+        """2-D histogram of toxicity against the first sample column over every row: (counts, x_edges, y_edges)."""
+        pairs = self.scatter_counts.groupby(level=['toxicity', 'value']).sum()
+        return np.histogram2d(pairs.index.get_level_values('toxicity'), pairs.index.get_level_values('value'),
+                              bins=bins, weights=pairs.to_numpy())
+
+    def time_series(self, freq='D'):
+        """Row count and mean toxicity per freq bucket (columns time_column, count, toxicity)."""
+        if self.hourly.empty:
+            return pd.DataFrame(columns=[self.time_column, 'count', 'toxicity'])
+        totals = self.hourly.sort_index().resample(freq).sum()
+        return pd.DataFrame({
+            self.time_column: totals.index,
+            'count': totals['rows'].to_numpy(),
+            'toxicity': (totals['toxicity_sum'] / totals['scored']).to_numpy(),
+        })
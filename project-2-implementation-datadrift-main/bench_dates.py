@@ -0,0 +1,81 @@
+"""
+Micro-benchmark of the ways 4chan post times can be turned into timestamps.
+
+The analysis used to select the post's "now" string and run a regex extract
+plus pd.to_datetime over every row (preprocess_4chan_dates). It now reads the
+typed chan_posts.created_at column, filled at ingest from the integer "time"
+epoch. This compares, on synthetic rows:
+
+- regex:  the removed str.extract + to_datetime path over "now" strings
+- epoch:  one vectorized pd.to_datetime(unit='s', utc=True) over "time"
+- typed:  what created_at costs once it is already a timestamp column
+
+Every post the API returns has "time", and the created_at migration fills the
+column from it, so no row needs its "now" string parsed any more.
+
+Usage: python3 bench_dates.py --rows 5000000
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+# 4chan's "now" field is US Eastern local time, e.g. 11/01/24(Fri)12:34:56
+NOW_FORMAT = "%m/%d/%y(%a)%H:%M:%S"
+NOW_TIMEZONE = "America/New_York"
+
+
+def synthetic_posts(rows):
+    """Return (epoch seconds, "now" strings) for rows posts spread over two months."""
+    epoch = np.random.default_rng(0).integers(1727740800, 1733011200, rows)  # 2024-10-01 .. 2024-12-01
+    now = pd.to_datetime(epoch, unit="s", utc=True).tz_convert(NOW_TIMEZONE).strftime(NOW_FORMAT)
+    return pd.Series(epoch), pd.Series(now)
+
+
+def parse_regex(now):
+    """The removed preprocess_4chan_dates: regex extract, then parse."""
+    extracted = now.str.extract(r'(\d{2}/\d{2}/\d{4}\s\d{2}:\d{2}:\d{2})')[0]
+    return pd.to_datetime(extracted, format='%m/%d/%Y %H:%M:%S', errors='coerce')
+
+
+def parse_epoch(epoch):
+    """Convert epoch seconds in one vectorized call."""
+    return pd.to_datetime(epoch, unit="s", utc=True)
+
+
+def best_of(repeat, function, *args):
+    """Return (fastest wall time in seconds, result of the last run)."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5_000_000, help="number of synthetic posts")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per method (fastest is reported)")
+    args = parser.parse_args()
+
+    epoch, now = synthetic_posts(args.rows)
+    typed = parse_epoch(epoch)
+    expected = typed.dt.tz_localize(None)
+
+    results = {
+        "regex": best_of(args.repeat, parse_regex, now),
+        "epoch": best_of(args.repeat, parse_epoch, epoch),
+        "typed": best_of(args.repeat, pd.to_datetime, typed),
+    }
+
+    print(f"{'method':<8} {'seconds':>9} {'rows/s':>13} {'parsed':>8} {'correct':>8}")
+    for name, (seconds, parsed) in results.items():
+        parsed = parsed.dt.tz_convert("UTC").dt.tz_localize(None) if parsed.dt.tz is not None else parsed
+        valid = parsed.notna().mean()
+        correct = (parsed == expected).mean()
+        print(f"{name:<8} {seconds:>9.3f} {args.rows / seconds:>13,.0f} {valid:>8.1%} {correct:>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Benchmark the analysis queries against a synthetic dataset, before and after the
+covering indexes of project 1's analysis-reads migration (created_utc INCLUDE the
+columns read), which turn the Reddit post reads into index-only scans. The baseline
+has every index the schema had before that migration, and the 4chan reads, which
+it does not touch, are run against both the narrow chan_posts table and the raw
+JSON in posts for reference.
+
+Everything is loaded into a scratch `bench` schema so the real tables are never
+touched. Each query runs under EXPLAIN (ANALYZE, BUFFERS) and the report shows
+the scans used plus median planning/execution time.
+
+Usage: python3 bench_queries.py --posts 5000000 --reddit 1000000
+"""
+import argparse
+import json
+import statistics
+from sqlalchemy import create_engine
+from Analysis import (
+    DATABASE_URL,
+    QUERY_REDDIT,
+    QUERY_REDDIT_POLITICS_POSTS,
+    QUERY_REDDIT_POLITICS_COMMENTS,
+    QUERY_4CHAN,
+)
+
+SCHEMA = "bench"
+
+# Synthetic data spans two months so the Nov 1 - Nov 14 analysis window selects a slice of it
+DATA_START = "2024-10-01"
+DATA_SECONDS = 61 * 86400
+
+QUERIES = {
+    "reddit_posts": QUERY_REDDIT,
+    "reddit_politics_posts": QUERY_REDDIT_POLITICS_POSTS,
+    "reddit_politics_comments": QUERY_REDDIT_POLITICS_COMMENTS,
+    "4chan_chan_posts": QUERY_4CHAN,
+    # The same read against the full JSON documents, to show what the narrow table saves
+    "4chan_posts_jsonb": """
+        SELECT id, data->>'com' AS content, created_at
+        FROM posts
+        WHERE created_at BETWEEN '2024-11-01' AND '2024-11-14'
+        AND board = 'fit';
+    """,
+    # The filter the 4chan query used before created_at existed, for reference
+    "4chan_posts_legacy_now": """
+        SELECT id, data->>'com' AS content, "data"->>'now' AS created_at
+        FROM posts
+        WHERE "data"->>'now' BETWEEN '11/01/2024' AND '11/14/2024'
+        AND board = 'fit';
+    """,
+}
+
+BASELINE_DDL = f"""
+    DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+    CREATE SCHEMA {SCHEMA};
+    SET search_path TO {SCHEMA}, public;
+
+    CREATE TABLE posts (
+        id BIGSERIAL PRIMARY KEY,
+        post_number BIGINT NOT NULL,
+        thread_number BIGINT NOT NULL,
+        board TEXT NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL,
+        data JSONB NOT NULL
+    );
+    CREATE TABLE chan_posts (
+        id BIGSERIAL PRIMARY KEY,
+        board TEXT NOT NULL,
+        thread_number BIGINT NOT NULL,
+        post_number BIGINT NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL,
+        com TEXT,
+        text TEXT,
+        name TEXT,
+        country TEXT,
+        replies INTEGER,
+        images INTEGER,
+        resto BIGINT NOT NULL
+    );
+    CREATE TABLE reddit_posts (
+        id BIGSERIAL PRIMARY KEY,
+        subreddit TEXT NOT NULL,
+        post_id TEXT NOT NULL,
+        title TEXT NOT NULL,
+        content TEXT,
+        created_utc TIMESTAMP NOT NULL,
+        num_comments INTEGER,
+        score INTEGER,
+        search tsvector GENERATED ALWAYS AS (setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+                                             setweight(to_tsvector('english', coalesce(content, '')), 'B')) STORED
+    );
+    CREATE TABLE reddit_politics_posts (LIKE reddit_posts INCLUDING ALL);
+    CREATE TABLE reddit_politics_comments (
+        id BIGSERIAL PRIMARY KEY,
+        post_id TEXT NOT NULL,
+        subreddit TEXT NOT NULL,
+        comment_id TEXT NOT NULL,
+        content TEXT,
+        created_utc TIMESTAMP NOT NULL
+    );
+"""
+
+# Indexes of the other migrations (hypertables also get one on their time column)
+BASELINE_INDEXES = """
+    CREATE INDEX ON posts (post_number);
+    CREATE INDEX ON posts (thread_number, post_number);
+    CREATE UNIQUE INDEX ON posts (board, thread_number, post_number);
+    CREATE INDEX ON posts (created_at DESC);
+    CREATE INDEX ON posts (board, created_at DESC);
+    CREATE INDEX ON chan_posts (board, created_at DESC);
+    CREATE INDEX ON reddit_posts (subreddit);
+    CREATE INDEX ON reddit_posts (post_id);
+    CREATE INDEX ON reddit_posts (created_utc);
+    CREATE INDEX ON reddit_politics_posts (created_utc);
+    CREATE INDEX ON reddit_politics_comments (created_utc);
+"""
+
+# Indexes added by the analysis-reads migration
+NEW_INDEXES = """
+    CREATE INDEX ON reddit_posts (created_utc) INCLUDE (title, num_comments);
+    CREATE INDEX ON reddit_politics_posts (created_utc) INCLUDE (title);
+"""
+
+
+def load_synthetic_data(connection, posts, reddit):
+    """Fill the scratch tables with generate_series data."""
+    connection.exec_driver_sql(f"""
+        INSERT INTO posts (board, thread_number, post_number, created_at, data)
+        SELECT CASE WHEN mod(g, 4) = 0 THEN 'pol' ELSE 'fit' END,
+               g / 150 * 150,
+               g,
+               ts,
+               jsonb_build_object(
+                   'no', g,
+                   'resto', CASE WHEN mod(g, 150) = 0 THEN 0 ELSE g / 150 * 150 END,
+                   'time', extract(epoch FROM ts)::bigint,
+                   'now', to_char(ts, 'MM/DD/YY(Dy)HH24:MI:SS'),
+                   'name', 'Anonymous',
+                   'country', (ARRAY['US', 'GB', 'CA', 'DE', 'AU'])[1 + mod(g, 5)],
+                   'com', repeat('&gt;lifting every day<br>', 1 + mod(g, 12))
+               )
+        FROM (
+            SELECT g, TIMESTAMPTZ '{DATA_START}' + (g::bigint * {DATA_SECONDS} / {posts}) * INTERVAL '1 second' AS ts
+            FROM generate_series(1, {posts}) AS g
+        ) AS s;
+    """)
+    connection.exec_driver_sql("""
+        INSERT INTO chan_posts (board, thread_number, post_number, created_at, com, text, name, country, replies, images, resto)
+        SELECT board, thread_number, post_number, created_at,
+               data->>'com', replace(replace(data->>'com', '&gt;', '>'), '<br>', E'\\n'), data->>'name', data->>'country',
+               (data->>'replies')::integer, (data->>'images')::integer, (data->>'resto')::bigint
+        FROM posts;
+    """)
+    for table in ("reddit_posts", "reddit_politics_posts"):
+        connection.exec_driver_sql(f"""
+            INSERT INTO {table} (subreddit, post_id, title, content, created_utc, num_comments, score)
+            SELECT (ARRAY['fitness', 'nutrition', 'running', 'politics'])[1 + mod(g, 4)],
+                   to_hex(g),
+                   repeat('title ', 1 + mod(g, 20)),
+                   repeat('body ', mod(g, 50)),
+                   TIMESTAMP '{DATA_START}' + (g::bigint * {DATA_SECONDS} / {reddit}) * INTERVAL '1 second',
+                   mod(g * 7, 500),
+                   mod(g * 13, 2000)
+            FROM generate_series(1, {reddit}) AS g;
+        """)
+    connection.exec_driver_sql(f"""
+        INSERT INTO reddit_politics_comments (post_id, subreddit, comment_id, content, created_utc)
+        SELECT to_hex(g / 20), 'politics', to_hex(g),
+               repeat('comment ', 1 + mod(g, 30)),
+               TIMESTAMP '{DATA_START}' + (g::bigint * {DATA_SECONDS} / {reddit}) * INTERVAL '1 second'
+        FROM generate_series(1, {reddit}) AS g;
+    """)
+    connection.exec_driver_sql("ANALYZE;")
+
+
+def scans_in_plan(plan):
+    """Collect 'Node Type [index]' for every scan node in an EXPLAIN JSON plan."""
+    scans = []
+    if "Scan" in plan["Node Type"]:
+        index = plan.get("Index Name")
+        scans.append(f"{plan['Node Type']} [{index}]" if index else plan["Node Type"])
+    for child in plan.get("Plans", []):
+        scans.extend(scans_in_plan(child))
+    return scans
+
+
+def run_queries(connection, repeat):
+    """EXPLAIN ANALYZE every benchmark query and return {name: result}."""
+    results = {}
+    for name, query in QUERIES.items():
+        planning, execution = [], []
+        for _ in range(repeat):
+            explain = connection.exec_driver_sql(
+                f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query.strip().rstrip(';')}"
+            ).scalar()
+            if isinstance(explain, str):
+                explain = json.loads(explain)
+            planning.append(explain[0]["Planning Time"])
+            execution.append(explain[0]["Execution Time"])
+        results[name] = {
+            "scans": ", ".join(scans_in_plan(explain[0]["Plan"])),
+            "rows": explain[0]["Plan"]["Actual Rows"],
+            "planning_ms": statistics.median(planning),
+            "execution_ms": statistics.median(execution),
+        }
+    return results
+
+
+def print_report(before, after):
+    """Print before/after plans and latency side by side."""
+    print(f"{'query':<28} {'rows':>9} {'before ms':>11} {'after ms':>10} {'speedup':>8}")
+    for name in QUERIES:
+        b, a = before[name], after[name]
+        speedup = b["execution_ms"] / a["execution_ms"] if a["execution_ms"] else float("inf")
+        print(f"{name:<28} {a['rows']:>9} {b['execution_ms']:>11.1f} {a['execution_ms']:>10.1f} {speedup:>7.1f}x")
+        print(f"    before: {b['scans']}  (planning {b['planning_ms']:.2f} ms)")
+        print(f"    after:  {a['scans']}  (planning {a['planning_ms']:.2f} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=5_000_000, help="number of synthetic 4chan posts")
+    parser.add_argument("--reddit", type=int, default=1_000_000, help="number of synthetic rows per Reddit table")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per query (median is reported)")
+    parser.add_argument("--keep", action="store_true", help=f"keep the {SCHEMA} schema afterwards")
+    args = parser.parse_args()
+
+    engine = create_engine(DATABASE_URL)
+    with engine.connect() as connection:
+        connection.exec_driver_sql(BASELINE_DDL)
+        connection.exec_driver_sql(BASELINE_INDEXES)
+        print(f"Loading {args.posts} posts and {args.reddit} rows per Reddit table...")
+        load_synthetic_data(connection, args.posts, args.reddit)
+        connection.commit()
+    # Index-only scans need the visibility map, which VACUUM (outside a transaction) sets
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.exec_driver_sql(f"VACUUM ANALYZE {SCHEMA}.reddit_posts, {SCHEMA}.reddit_politics_posts;")
+    with engine.connect() as connection:
+        connection.exec_driver_sql(f"SET search_path TO {SCHEMA}, public;")
+        before = run_queries(connection, args.repeat)
+        connection.exec_driver_sql(NEW_INDEXES)
+        connection.exec_driver_sql("ANALYZE reddit_posts, reddit_politics_posts;")
+        connection.commit()
+        after = run_queries(connection, args.repeat)
+
+        if not args.keep:
+            connection.exec_driver_sql(f"DROP SCHEMA {SCHEMA} CASCADE;")
+            connection.commit()
+
+    print_report(before, after)
+
+
+if __name__ == "__main__":
+    main()
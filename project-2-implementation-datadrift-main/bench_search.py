@@ -0,0 +1,250 @@
+"""
+Benchmark keyword search: ILIKE scans against the tsvector columns and their GIN
+indexes (project 1's search migration, served by the dashboard's /api/search).
+
+Synthetic 4chan posts (HTML, as the API returns them) and Reddit comments (text in
+the JSONB document) are generated in SQL from a skewed vocabulary, so terms range
+from very common to rare. Each search runs as a count of all matches and as the
+dashboard's first page (newest 20), under EXPLAIN (ANALYZE, BUFFERS), three ways:
+
+- jsonb_ilike: data->>'com' / data->>'body' ILIKE '%term%', what keyword analyses did
+- ilike:       the same over the narrow chan_posts.com column
+- tsvector:    search @@ websearch_to_tsquery(...) through the GIN index
+
+The report also shows how long the GIN indexes took to build and their size.
+
+chan_posts is a hypertable with one-day chunks, as in project 1, and every
+synthetic post is older than 7 days. The dashboard's near-duplicate lookups (a row
+by id, then its cluster's newest rows) run against it too, and the report flags any
+search or duplicate lookup that falls back to scanning those old chunks.
+Everything lives in the scratch `bench` schema.
+
+Usage: python3 bench_search.py --posts 2000000 --comments 1000000
+"""
+import argparse
+import collections
+import json
+import re
+import statistics
+import time
+from sqlalchemy import create_engine
+from Analysis import DATABASE_URL
+from bench_queries import DATA_SECONDS, DATA_START, SCHEMA, scans_in_plan
+
+VOCABULARY = 5000
+# Words planted at different rates, from in ~1/3 of the rows down to ~1 in 20000
+TERMS = {"squat": 3, "deadlift": 30, "creatine": 300, "sarcopenia": 20000}
+PAGE = 20
+# One post in CLUSTER_EVERY gets a cluster, shared by CLUSTER_SIZE of them
+CLUSTER_EVERY = 10
+CLUSTER_SIZE = 50
+
+DDL = f"""
+    DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+    CREATE SCHEMA {SCHEMA};
+    SET search_path TO {SCHEMA}, public;
+
+    CREATE FUNCTION chan_html_to_text(html TEXT) RETURNS TEXT
+    LANGUAGE SQL IMMUTABLE PARALLEL SAFE RETURNS NULL ON NULL INPUT
+    AS $$
+        SELECT replace(replace(replace(replace(replace(replace(
+            regexp_replace(html, '<[^>]*>', ' ', 'g'),
+            '&gt;', '>'), '&lt;', '<'), '&quot;', '"'), '&#039;', ''''), '&#39;', ''''), '&amp;', '&')
+    $$;
+
+    CREATE TABLE posts (
+        id BIGSERIAL PRIMARY KEY,
+        board TEXT NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL,
+        data JSONB NOT NULL
+    );
+    CREATE TABLE chan_posts (
+        id BIGSERIAL,
+        board TEXT NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL,
+        com TEXT,
+        cluster_id BIGINT,
+        search tsvector,
+        PRIMARY KEY (id, created_at)
+    );
+    SELECT create_hypertable('chan_posts', 'created_at', chunk_time_interval => INTERVAL '1 day');
+    CREATE INDEX ON chan_posts (cluster_id, created_at DESC) WHERE cluster_id IS NOT NULL;
+    CREATE FUNCTION chan_posts_search() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+    BEGIN
+        NEW.search := to_tsvector('english', coalesce(chan_html_to_text(NEW.com), ''));
+        RETURN NEW;
+    END
+    $$;
+    CREATE TRIGGER chan_posts_search BEFORE INSERT ON chan_posts
+        FOR EACH ROW EXECUTE FUNCTION chan_posts_search();
+    CREATE TABLE reddit_comments (
+        id BIGSERIAL PRIMARY KEY,
+        subreddit TEXT NOT NULL,
+        created_utc TIMESTAMP NOT NULL,
+        data JSONB NOT NULL,
+        search tsvector GENERATED ALWAYS AS (to_tsvector('english', coalesce(data->>'body', ''))) STORED
+    );
+"""
+
+# Rows are words drawn with random()^3 (so low ids are common) plus the planted terms
+SENTENCE = """
+    array_to_string(ARRAY(
+        SELECT 'w' || floor(power(random(), 3) * {VOCABULARY})::int
+        FROM generate_series(1, 5 + mod(g, 40))
+    ), ' ')
+    || CASE WHEN mod(g, {squat}) = 0 THEN ' squats' ELSE '' END
+    || CASE WHEN mod(g, {deadlift}) = 1 THEN ' deadlifting' ELSE '' END
+    || CASE WHEN mod(g, {creatine}) = 2 THEN ' creatine' ELSE '' END
+    || CASE WHEN mod(g, {sarcopenia}) = 3 THEN ' sarcopenia' ELSE '' END
+""".format(VOCABULARY=VOCABULARY, **TERMS)
+
+
+def load_synthetic_data(connection, posts, comments):
+    """Fill the scratch tables; the search columns are computed on insert."""
+    connection.exec_driver_sql(f"""
+        INSERT INTO posts (board, created_at, data)
+        SELECT CASE WHEN mod(g, 4) = 0 THEN 'pol' ELSE 'fit' END, ts,
+               jsonb_build_object('no', g, 'com', '&gt;' || replace({SENTENCE}, ' w1 ', '<br>w1 ') || '<wbr>')
+        FROM (
+            SELECT g, TIMESTAMPTZ '{DATA_START}' + (g::bigint * {DATA_SECONDS} / {posts}) * INTERVAL '1 second' AS ts
+            FROM generate_series(1, {posts}) AS g
+        ) AS s;
+    """)
+    connection.exec_driver_sql(f"""
+        INSERT INTO chan_posts (board, created_at, com, cluster_id)
+        SELECT board, created_at, data->>'com',
+               CASE WHEN mod(id, {CLUSTER_EVERY}) = 0 THEN id / ({CLUSTER_EVERY} * {CLUSTER_SIZE}) END
+        FROM posts;
+    """)
+    connection.exec_driver_sql(f"""
+        INSERT INTO reddit_comments (subreddit, created_utc, data)
+        SELECT (ARRAY['fitness', 'nutrition', 'running', 'politics'])[1 + mod(g, 4)],
+               TIMESTAMP '{DATA_START}' + (g::bigint * {DATA_SECONDS} / {comments}) * INTERVAL '1 second',
+               jsonb_build_object('id', to_hex(g), 'body', {SENTENCE})
+        FROM generate_series(1, {comments}) AS g;
+    """)
+    connection.exec_driver_sql("CREATE INDEX ON reddit_comments (created_utc DESC);")
+    connection.exec_driver_sql("ANALYZE;")
+
+
+def build_search_indexes(connection):
+    """Create the GIN indexes; return {table: (seconds, size in MB)}."""
+    built = {}
+    for table in ("chan_posts", "reddit_comments"):
+        start = time.perf_counter()
+        connection.exec_driver_sql(f"CREATE INDEX {table}_search_idx ON {table} USING GIN (search);")
+        seconds = time.perf_counter() - start
+        size = connection.exec_driver_sql(f"SELECT pg_relation_size('{table}_search_idx')").scalar()
+        built[table] = (seconds, size / 2 ** 20)
+    connection.exec_driver_sql("ANALYZE;")
+    return built
+
+
+def search_queries(term):
+    """{name: query} for one term: every way of searching, counting all matches and fetching a page."""
+    like = f"'%{term}%'"
+    # A tsquery stems like the indexed text does, so 'squat' also finds 'squats'
+    match = f"search @@ websearch_to_tsquery('english', '{term}')"
+    filters = {
+        "chan_posts": {
+            "jsonb_ilike": ("posts", f"data->>'com' ILIKE {like}", "created_at"),
+            "ilike": ("chan_posts", f"com ILIKE {like}", "created_at"),
+            "tsvector": ("chan_posts", match, "created_at"),
+        },
+        "reddit_comments": {
+            "jsonb_ilike": ("reddit_comments", f"data->>'body' ILIKE {like}", "created_utc"),
+            "tsvector": ("reddit_comments", match, "created_utc"),
+        },
+    }
+    queries = {}
+    for source, methods in filters.items():
+        for method, (table, condition, created) in methods.items():
+            queries[(source, method, "count")] = f"SELECT count(*) FROM {table} WHERE {condition}"
+            queries[(source, method, "page")] = (
+                f"SELECT id FROM {table} WHERE {condition} ORDER BY {created} DESC LIMIT {PAGE}"
+            )
+    return queries
+
+
+def duplicate_queries(posts):
+    """{name: query} for the dashboard's near-duplicate lookups of a post halfway through the data."""
+    row_id = posts // 2
+    cluster_id = row_id // (CLUSTER_EVERY * CLUSTER_SIZE)
+    return {
+        ("chan_posts", "cluster_id", "row"): f"SELECT cluster_id FROM chan_posts WHERE id = {row_id}",
+        ("chan_posts", "cluster_id", "page"): (
+            f"SELECT id FROM chan_posts WHERE cluster_id = {cluster_id} ORDER BY created_at DESC LIMIT {PAGE}"
+        ),
+    }
+
+
+def old_chunks(connection):
+    """(chunks, chunks older than 7 days, compressed chunks) of chan_posts."""
+    return connection.exec_driver_sql(f"""
+        SELECT count(*), count(*) FILTER (WHERE range_end < now() - INTERVAL '7 days'), count(*) FILTER (WHERE is_compressed)
+        FROM timescaledb_information.chunks
+        WHERE hypertable_schema = '{SCHEMA}' AND hypertable_name = 'chan_posts'
+    """).one()
+
+
+def explain(connection, query, repeat):
+    """Median execution time, scans and rows of a query under EXPLAIN ANALYZE."""
+    times = []
+    for _ in range(repeat):
+        plan = connection.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}").scalar()
+        plan = (json.loads(plan) if isinstance(plan, str) else plan)[0]
+        times.append(plan["Execution Time"])
+    # One scan per chunk on the hypertable: count them instead of listing each chunk's index
+    scans = collections.Counter(re.sub(r"_hyper_\d+_\d+_chunk_", "", scan) for scan in scans_in_plan(plan["Plan"]))
+    scans = ", ".join(f"{scan} x{count}" if count > 1 else scan for scan, count in scans.items())
+    return statistics.median(times), scans, plan["Plan"]["Actual Rows"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=2_000_000, help="number of synthetic 4chan posts")
+    parser.add_argument("--comments", type=int, default=1_000_000, help="number of synthetic Reddit comments")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per query (median is reported)")
+    parser.add_argument("--keep", action="store_true", help=f"keep the {SCHEMA} schema afterwards")
+    args = parser.parse_args()
+
+    engine = create_engine(DATABASE_URL)
+    with engine.connect() as connection:
+        # Send statements without a parameter set, so the driver leaves the % of LIKE patterns alone
+        connection.execution_options(no_parameters=True)
+        connection.exec_driver_sql(DDL)
+        print(f"Loading {args.posts} posts and {args.comments} comments...")
+        start = time.perf_counter()
+        load_synthetic_data(connection, args.posts, args.comments)
+        print(f"Loaded in {time.perf_counter() - start:.1f} s (tsvectors computed on insert)")
+        for table, (seconds, size) in build_search_indexes(connection).items():
+            print(f"GIN index on {table}: built in {seconds:.1f} s, {size:.0f} MB")
+        connection.commit()
+        chunks, old, compressed = old_chunks(connection)
+        print(f"chan_posts: {chunks} chunks, {old} older than 7 days, {compressed} compressed")
+
+        print(f"{'term':<11} {'source':<16} {'method':<12} {'query':<6} {'rows':>8} {'ms':>10}  scans")
+        for term in TERMS:
+            for (source, method, kind), query in search_queries(term).items():
+                ms, scans, rows = explain(connection, query, args.repeat)
+                if kind == "count":
+                    rows = connection.exec_driver_sql(query).scalar()  # matches, not the one aggregate row
+                print(f"{term:<11} {source:<16} {method:<12} {kind:<6} {rows:>8} {ms:>10.1f}  {scans}")
+                # Common terms may rightly be scanned; rare ones should always come from the index
+                if method == "tsvector" and TERMS[term] >= 300 and "Seq Scan" in scans:
+                    print(f"{'':<11} {source} search scans chunks instead of using the GIN index")
+        for (source, method, kind), query in duplicate_queries(args.posts).items():
+            ms, scans, rows = explain(connection, query, args.repeat)
+            print(f"{'':<11} {source:<16} {method:<12} {kind:<6} {rows:>8} {ms:>10.1f}  {scans}")
+            if "Seq Scan" in scans:
+                print(f"{'':<11} {source} duplicate lookup scans chunks instead of using an index")
+
+        if not args.keep:
+            connection.exec_driver_sql(f"DROP SCHEMA {SCHEMA} CASCADE;")
+            connection.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Incremental Parquet export of the content tables for offline analysis.
+
+Files are laid out as <root>/source=<source>/community=<board or subreddit>/day=<YYYY-MM-DD>/part-0.parquet.
+Only complete (UTC) days are exported and each source keeps a _watermark file
+with the last day written, so every run appends just the new day partitions.
+Rows can arrive after their day was exported (crawler backlog, late comments), so
+each run also rewrites the last REEXPORT_DAYS exported days.
+Rows are streamed with a server-side cursor, so memory stays bounded by the chunk size.
+
+Usage: python3 export_parquet.py [--root snapshot] [--sources 4chan reddit_posts ...] [--since YYYY-MM-DD]
+"""
+import argparse
+import datetime
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshot")
+# Already exported days rewritten by every run, to pick up rows that arrived late
+REEXPORT_DAYS = 3
+
+REDDIT_POST_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("subreddit", pa.string()),
+    ("post_id", pa.string()),
+    ("title", pa.string()),
+    ("content", pa.string()),
+    ("created_utc", pa.timestamp("us")),
+    ("author", pa.string()),
+    ("num_comments", pa.int64()),
+    ("score", pa.int64()),
+])
+REDDIT_COMMENT_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("subreddit", pa.string()),
+    ("post_id", pa.string()),
+    ("comment_id", pa.string()),
+    ("content", pa.string()),
+    ("created_utc", pa.timestamp("us")),
+])
+
+# source name -> table, partitioning column, time column and the Arrow schema of the exported rows
+EXPORTS = {
+    "4chan": {
+        "table": "chan_posts",
+        "community": "board",
+        "time": "created_at",
+        "schema": pa.schema([
+            ("id", pa.int64()),
+            ("board", pa.string()),
+            ("thread_number", pa.int64()),
+            ("post_number", pa.int64()),
+            ("created_at", pa.timestamp("us", tz="UTC")),
+            ("com", pa.string()),
+            ("text", pa.string()),
+            ("greentext", pa.bool_()),
+            ("name", pa.string()),
+            ("country", pa.string()),
+            ("replies", pa.int64()),
+            ("images", pa.int64()),
+            ("resto", pa.int64()),
+        ]),
+    },
+    "reddit_posts": {"table": "reddit_posts", "community": "subreddit", "time": "created_utc", "schema": REDDIT_POST_SCHEMA},
+    "reddit_politics_posts": {"table": "reddit_politics_posts", "community": "subreddit", "time": "created_utc", "schema": REDDIT_POST_SCHEMA},
+    "reddit_comments": {"table": "reddit_comments", "community": "subreddit", "time": "created_utc", "schema": REDDIT_COMMENT_SCHEMA},
+    "reddit_politics_comments": {"table": "reddit_politics_comments", "community": "subreddit", "time": "created_utc", "schema": REDDIT_COMMENT_SCHEMA},
+}
+
+
+def read_watermark(source_dir):
+    """Return the last exported day for a source, or None if nothing was exported yet."""
+    path = os.path.join(source_dir, "_watermark")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return datetime.date.fromisoformat(f.read().strip())
+
+
+def write_watermark(source_dir, day):
+    """Record the last fully exported day for a source."""
+    path = os.path.join(source_dir, "_watermark")
+    with open(path + ".tmp", "w") as f:
+        f.write(day.isoformat())
+    os.replace(path + ".tmp", path)
+
+
+def first_day(connection, export):
+    """Return the day of the oldest row in the source table, or None if it is empty."""
+    oldest = connection.execute(text(f"SELECT min({export['time']}) FROM {export['table']}")).scalar()
+    return oldest.date() if oldest else None
+
+
+def export_day(connection, export, source_dir, day, chunksize):
+    """Stream one day of rows into per-community partition files. Returns the row count."""
+    schema = export["schema"]
+    query = text(f"""
+        SELECT {", ".join(schema.names)}
+        FROM {export['table']}
+        WHERE {export['time']} >= :start AND {export['time']} < :end
+        ORDER BY {export['community']}
+    """)
+    params = {"start": day, "end": day + datetime.timedelta(days=1)}
+    writers = {}
+    rows = 0
+    try:
+        for chunk in pd.read_sql(query, connection, params=params, chunksize=chunksize):
+            for community, group in chunk.groupby(export["community"], sort=False):
+                if community not in writers:
+                    partition = os.path.join(source_dir, f"community={community}", f"day={day.isoformat()}")
+                    os.makedirs(partition, exist_ok=True)
+                    writers[community] = pq.ParquetWriter(os.path.join(partition, "part-0.parquet.tmp"), schema)
+                writers[community].write_table(pa.Table.from_pandas(group, schema=schema, preserve_index=False))
+            rows += len(chunk)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    # Files only get their final name once the whole day has been written
+    for community in writers:
+        partition = os.path.join(source_dir, f"community={community}", f"day={day.isoformat()}")
+        os.replace(os.path.join(partition, "part-0.parquet.tmp"), os.path.join(partition, "part-0.parquet"))
+    return rows
+
+
+def export_source(engine, source, root, chunksize, reexport_days=REEXPORT_DAYS, since=None):
+    """Export every complete day after the source's watermark, and rewrite the last reexport_days up to it.
+
+    since (a date) ignores the watermark and rewrites every day from then on, e.g. after
+    a column was added to the schema.
+    """
+    export = EXPORTS[source]
+    source_dir = os.path.join(root, f"source={source}")
+    os.makedirs(source_dir, exist_ok=True)
+    last_complete_day = datetime.datetime.utcnow().date() - datetime.timedelta(days=1)
+
+    # stream_results makes psycopg2 use a named (server-side) cursor
+    with engine.connect().execution_options(stream_results=True) as connection:
+        watermark = read_watermark(source_dir)
+        if since:
+            day = since
+        elif watermark:
+            day = watermark + datetime.timedelta(days=1 - reexport_days)
+        else:
+            day = first_day(connection, export)
+        if day is None:
+            print(f"{source}: table {export['table']} is empty, nothing to export")
+            return
+
+        while day <= last_complete_day:
+            rows = export_day(connection, export, source_dir, day, chunksize)
+            write_watermark(source_dir, day)
+            print(f"{source}: exported {rows} rows for {day}")
+            day += datetime.timedelta(days=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--root", default=SNAPSHOT_DIR, help="snapshot directory (default: $SNAPSHOT_DIR or ./snapshot)")
+    parser.add_argument("--sources", nargs="+", choices=EXPORTS.keys(), default=list(EXPORTS), help="sources to export")
+    parser.add_argument("--chunksize", type=int, default=50_000, help="rows fetched per round trip")
+    parser.add_argument("--reexport-days", type=int, default=REEXPORT_DAYS,
+                        help=f"exported days to rewrite for late rows (default: {REEXPORT_DAYS})")
+    parser.add_argument("--since", type=datetime.date.fromisoformat,
+                        help="rewrite every day from this one (YYYY-MM-DD) on, whatever the watermark")
+    args = parser.parse_args()
+
+    engine = create_engine(DATABASE_URL)
+    for source in args.sources:
+        export_source(engine, source, args.root, args.chunksize, args.reexport_days, args.since)
+
+
+if __name__ == "__main__":
+    main()
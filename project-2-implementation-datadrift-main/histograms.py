@@ -0,0 +1,95 @@
+# Histogram engine for the dashboard and the project 2 analysis figures. Each project
+# ships its own copy of this file so it deploys on its own; keep the two identical
+# (project 3's tests/test_shared_modules.py checks).
+#
+# Bin counts are computed where the rows live: in Postgres with width_bucket, or with
+# np.histogram over streamed chunks. Histograms over the same edges merge by adding
+# their counts, and only the counts reach the renderer or the JSON API, so a histogram
+# over any number of rows never loads the rows.
+
+import numpy as np
+
+
+def width_bucket_query(values_query):
+    """Wrap a query returning a value column so it returns (bin, count, low, high) rows for :bins bins.
+
+    The range is the min..max of the values (widened by 0.5 each way when they are all
+    equal), and the maximum is counted in the last bin, as np.histogram does. Bins
+    without rows are not returned.
+    """
+    return f"""
+        WITH hist_values AS ({values_query}),
+        bounds AS (
+            SELECT CASE WHEN min(value) = max(value) THEN min(value) - 0.5 ELSE min(value) END AS low,
+                   CASE WHEN min(value) = max(value) THEN max(value) + 0.5 ELSE max(value) END AS high
+            FROM hist_values
+        )
+        SELECT least(width_bucket(value, low, high, :bins), :bins) AS bin, count(*) AS count,
+               min(low) AS low, min(high) AS high
+        FROM hist_values, bounds
+        WHERE value IS NOT NULL
+        GROUP BY 1
+        ORDER BY 1
+    """
+
+
+class Histogram:
+    """Counts over fixed bin edges.
+
+    Bins follow np.histogram (and ax.hist): each is [edge, next edge) except the last, which also
+    holds its upper edge. Values outside the edges are not counted.
+    """
+
+    def __init__(self, edges, counts=None):
+        self.edges = np.asarray(edges, dtype="float64")
+        self.counts = np.zeros(len(self.edges) - 1) if counts is None else np.asarray(counts, dtype="float64")
+
+    @classmethod
+    def uniform(cls, low, high, bins):
+        """Empty histogram with bins equal-width bins over [low, high] (widened by 0.5 each way if low == high, like NumPy)."""
+        if low == high:
+            low, high = low - 0.5, high + 0.5
+        return cls(np.linspace(low, high, bins + 1))
+
+    @classmethod
+    def from_bucket_rows(cls, rows, bins):
+        """Histogram from the rows of a width_bucket_query (None if there were no values)."""
+        if rows.empty:
+            return None
+        histogram = cls(np.linspace(float(rows["low"].iloc[0]), float(rows["high"].iloc[0]), bins + 1))
+        buckets = rows["bin"].to_numpy(dtype="int64")
+        inside = (buckets >= 1) & (buckets <= bins)
+        np.add.at(histogram.counts, buckets[inside] - 1, rows["count"].to_numpy(dtype="float64")[inside])
+        return histogram
+
+    def add(self, values, weights=None):
+        """Count a chunk of values (optionally weighted; NaN is skipped) into the bins and return self."""
+        values = np.asarray(values, dtype="float64")
+        scored = ~np.isnan(values)
+        if weights is not None:
+            weights = np.asarray(weights, dtype="float64")[scored]
+        self.counts += np.histogram(values[scored], bins=self.edges, weights=weights)[0]
+        return self
+
+    def merge(self, other):
+        """Return a histogram holding the counts of both; they must have the same edges."""
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Cannot merge histograms with different bin edges")
+        return Histogram(self.edges, self.counts + other.counts)
+
+    __add__ = merge
+
+    @property
+    def total(self):
+        return self.counts.sum()
+
+    def bins(self):
+        """The bins as [{"start", "end", "count"}], for the JSON API."""
+        return [
+            {"start": float(start), "end": float(end), "count": int(count)}
+            for start, end, count in zip(self.edges[:-1], self.edges[1:], self.counts)
+        ]
+
+    def plot(self, ax, **kwargs):
+        """Draw the bins on ax with ax.hist; one weighted value per bin draws the same bars as the raw values would."""
+        return ax.hist(self.edges[:-1], bins=self.edges, weights=self.counts, **kwargs)
@@ -0,0 +1,209 @@
+"""
+Incremental analysis state, stored in the analysis_* tables (see the project 1 migrations).
+
+update_state keeps per-hour and per-day totals of every source. Each run counts the
+rows per UTC day that a source's table holds from LOOKBACK_DAYS before the newest
+folded time, compares them with the rows folded for those days, and refolds only the
+days that differ, in one transaction per source. A row is therefore picked up however
+its id compares to rows already folded: ids come from a sequence when the row is
+inserted, and a crawler transaction that took a lower id can commit after a higher id
+was folded. A daily run reads the rows of the changed days (usually one or two) rather
+than all of them. load_window rebuilds aggregators for a window of whole days from
+those totals, and the figures are drawn from them.
+
+The lookback also lets the scan skip old chunks. Rows that arrive with a created time
+more than LOOKBACK_DAYS older than the newest folded row are not picked up.
+"""
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from sqlalchemy import text
+from aggregators import SAMPLE_SIZE, ToxicityAggregator
+
+LOOKBACK_DAYS = 7
+
+# source -> table, columns read (content and the time column), extra filter, time column
+# and scatter sample columns
+SOURCES = {
+    "reddit": {
+        "table": "reddit_posts",
+        "columns": "title AS content, created_utc, num_comments",
+        "filter": None,
+        "time": "created_utc",
+        "sample": ["num_comments"],
+    },
+    "politics_posts": {
+        "table": "reddit_politics_posts",
+        "columns": "title AS content, created_utc",
+        "filter": None,
+        "time": "created_utc",
+        "sample": None,
+    },
+    "politics_comments": {
+        "table": "reddit_politics_comments",
+        "columns": "content, created_utc",
+        "filter": None,
+        "time": "created_utc",
+        "sample": None,
+    },
+    "4chan": {
+        "table": "chan_posts",
+        "columns": "text AS content, created_at",
+        "filter": "board = 'fit'",
+        "time": "created_at",
+        "sample": None,
+    },
+}
+
+
+def read_watermark(connection, source):
+    """Return the newest created time folded for a source (None before its first run)."""
+    return connection.execute(
+        text("SELECT watermark_time FROM analysis_state WHERE source = :source"),
+        {"source": source},
+    ).scalar()
+
+
+def stale_days(table_rows, folded_rows):
+    """Days whose row count in the table differs from the rows folded for them.
+
+    Both are Series of row counts indexed by day; a day missing from one counts as 0.
+    """
+    table_rows, folded_rows = table_rows.align(folded_rows, fill_value=0)
+    return sorted(table_rows.index[table_rows != folded_rows])
+
+
+def delete_days(connection, source, days):
+    """Remove a source's stored totals for days, before they are folded again."""
+    params = {"source": source, "days": days}
+    connection.execute(text("DELETE FROM analysis_hourly WHERE source = :source AND bucket::date = ANY(:days)"), params)
+    for table in ("analysis_toxicity_counts", "analysis_scatter_counts", "analysis_samples"):
+        connection.execute(text(f"DELETE FROM {table} WHERE source = :source AND day = ANY(:days)"), params)
+
+
+def save_aggregate(connection, source, aggregate):
+    """Insert an aggregator's totals for days that have none stored (see delete_days)."""
+    hourly = aggregate.hourly.rename_axis("bucket").reset_index()
+    if not hourly.empty:
+        connection.execute(text("""
+            INSERT INTO analysis_hourly (source, bucket, rows, scored, toxicity_sum)
+            VALUES (:source, :bucket, :rows, :scored, :toxicity_sum)
+        """), [dict(r, source=source, bucket=r["bucket"].to_pydatetime()) for r in hourly.to_dict("records")])
+
+    counts = aggregate.daily_counts.reset_index(name="count")
+    if not counts.empty:
+        connection.execute(text("""
+            INSERT INTO analysis_toxicity_counts (source, day, toxicity, count)
+            VALUES (:source, :day, :toxicity, :count)
+        """), [dict(r, source=source, day=r["day"].date(), count=int(r["count"])) for r in counts.to_dict("records")])
+
+    scatter = aggregate.scatter_counts.reset_index(name="count")
+    if not scatter.empty:
+        connection.execute(text("""
+            INSERT INTO analysis_scatter_counts (source, day, toxicity, value, count)
+            VALUES (:source, :day, :toxicity, :value, :count)
+        """), [dict(r, source=source, day=r["day"].date(), count=int(r["count"])) for r in scatter.to_dict("records")])
+
+    if aggregate.sample is not None and not aggregate.sample.empty:
+        # The aggregator already holds the bottom-k of each day it folded
+        sample = aggregate.sample
+        connection.execute(text("""
+            INSERT INTO analysis_samples (source, day, sample_key, toxicity, num_comments)
+            VALUES (:source, :day, :sample_key, :toxicity, :num_comments)
+        """), [
+            {"source": source, "day": day.date(), "sample_key": key,
+             "toxicity": None if pd.isna(toxicity) else toxicity,
+             "num_comments": None if pd.isna(num_comments) else int(num_comments)}
+            for day, key, toxicity, num_comments in zip(sample["day"], sample["_key"], sample["toxicity"], sample["num_comments"])
+        ])
+
+
+def update_source(engine, source, chunksize):
+    """Refold the days of a source whose rows changed since they were folded. Returns the rows read."""
+    spec = SOURCES[source]
+    where = f"{spec['time']} >= :since" + (f" AND {spec['filter']}" if spec["filter"] else "")
+    with engine.begin() as connection:
+        # Days and the naive UTC times stored in the state tables mean UTC for TIMESTAMPTZ columns too
+        connection.execute(text("SET LOCAL timezone = 'UTC'"))
+        watermark_time = read_watermark(connection, source)
+        # Whole days, so their counts compare with the folded ones
+        since = (watermark_time - datetime.timedelta(days=LOOKBACK_DAYS)).replace(hour=0, minute=0, second=0, microsecond=0) \
+            if watermark_time else datetime.datetime.min
+
+        table_rows = pd.read_sql(text(f"""
+            SELECT {spec['time']}::date AS day, count(*) AS rows FROM {spec['table']}
+            WHERE {where} GROUP BY 1
+        """), connection, params={"since": since}, index_col="day")["rows"]
+        folded_rows = pd.read_sql(text("""
+            SELECT bucket::date AS day, sum(rows)::bigint AS rows FROM analysis_hourly
+            WHERE source = :source AND bucket >= :since GROUP BY 1
+        """), connection, params={"source": source, "since": since}, index_col="day")["rows"]
+        days = stale_days(table_rows, folded_rows)
+        if not days:
+            return 0
+        delete_days(connection, source, days)
+
+        # Unseeded: a fixed seed would draw the same keys every run, which collide with the stored ones
+        aggregate = ToxicityAggregator(spec["time"], sample_columns=spec["sample"], seed=None)
+        newest = watermark_time
+        # stream_results makes psycopg2 use a named (server-side) cursor
+        streaming = connection.execution_options(stream_results=True, max_row_buffer=chunksize)
+        query = f"SELECT {spec['columns']} FROM {spec['table']} WHERE {where} AND {spec['time']}::date = ANY(:days)"
+        for chunk in pd.read_sql(text(query), streaming, params={"since": since, "days": days}, chunksize=chunksize):
+            aggregate.add(chunk)
+            latest = pd.to_datetime(chunk[spec["time"]], utc=True).max().tz_localize(None).to_pydatetime()
+            newest = max(newest, latest) if newest else latest
+
+        save_aggregate(connection, source, aggregate)
+        connection.execute(text("""
+            INSERT INTO analysis_state (source, watermark_time, rows_folded)
+            VALUES (:source, :watermark_time, (SELECT coalesce(sum(rows), 0) FROM analysis_hourly WHERE source = :source))
+            ON CONFLICT (source) DO UPDATE SET
+                watermark_time = excluded.watermark_time,
+                rows_folded = excluded.rows_folded,
+                updated_at = now()
+        """), {"source": source, "watermark_time": newest})
+    return aggregate.rows
+
+
+def update_state(engine, chunksize, workers=1):
+    """Refold the changed days of every source, up to workers sources at a time."""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        folded = {source: pool.submit(update_source, engine, source, chunksize) for source in SOURCES}
+        for source, rows in folded.items():
+            print(f"{source}: folded {rows.result()} rows")
+
+
+def load_window(engine, start_date, end_date):
+    """Rebuild an aggregator per source for the days in [start_date, end_date) from the stored totals."""
+    params = {"start": pd.Timestamp(start_date).to_pydatetime(), "end": pd.Timestamp(end_date).to_pydatetime()}
+    aggregates = {}
+    with engine.connect() as connection:
+        for source, spec in SOURCES.items():
+            p = dict(params, source=source)
+            hourly = pd.read_sql(text("""
+                SELECT bucket, rows, scored, toxicity_sum FROM analysis_hourly
+                WHERE source = :source AND bucket >= :start AND bucket < :end
+            """), connection, params=p, index_col="bucket")
+            counts = pd.read_sql(text("""
+                SELECT toxicity, sum(count) AS count FROM analysis_toxicity_counts
+                WHERE source = :source AND day >= :start AND day < :end
+                GROUP BY toxicity
+            """), connection, params=p)
+            sample = pd.read_sql(text("""
+                SELECT sample_key AS _key, toxicity, num_comments FROM analysis_samples
+                WHERE source = :source AND day >= :start AND day < :end
+                ORDER BY sample_key
+                LIMIT :sample_size
+            """), connection, params=dict(p, sample_size=SAMPLE_SIZE))
+            scatter = pd.read_sql(text("""
+                SELECT toxicity, value, sum(count) AS count FROM analysis_scatter_counts
+                WHERE source = :source AND day >= :start AND day < :end
+                GROUP BY toxicity, value
+            """), connection, params=p)
+            if not spec["sample"]:
+                sample = sample.drop(columns=["num_comments"])
+            aggregates[source] = ToxicityAggregator.from_frames(
+                spec["time"], int(hourly["rows"].sum()), hourly, counts, sample, scatter,
+            )
+    return aggregates
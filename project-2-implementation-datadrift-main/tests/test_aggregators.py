@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+from aggregators import ToxicityAggregator
+
+
+def comments(n, seed=0):
+    """n comments over three days with lengths up to 500 characters and a score column."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "content": ["x" * length for length in rng.integers(0, 500, n)],
+        "created_utc": pd.Timestamp("2024-11-01") + pd.to_timedelta(rng.integers(0, 3 * 86400, n), unit="s"),
+        "score": rng.integers(0, 50, n),
+    })
+
+
+def test_chunks_fold_into_the_same_totals_as_one_pass():
+    data = comments(3000)
+    whole, chunked = ToxicityAggregator("created_utc", ["score"]), ToxicityAggregator("created_utc", ["score"])
+    whole.add(data)
+    for start in range(0, len(data), 700):
+        chunked.add(data.iloc[start:start + 700])
+
+    assert chunked.rows == whole.rows == 3000
+    pd.testing.assert_frame_equal(chunked.toxicity_frame(), whole.toxicity_frame())
+    pd.testing.assert_frame_equal(chunked.time_series(), whole.time_series())
+    np.testing.assert_array_equal(chunked.scatter_histogram(10)[0], whole.scatter_histogram(10)[0])
+
+
+def test_totals_match_the_rows():
+    data = comments(2000)
+    toxicity = data["content"].str.len() / 100
+    aggregate = ToxicityAggregator("created_utc", ["score"])
+    aggregate.add(data)
+
+    counts = aggregate.toxicity_frame().set_index("toxicity")["count"]
+    pd.testing.assert_series_equal(counts, toxicity.value_counts().sort_index().astype("float64"),
+                                   check_names=False, check_index_type=False)
+    daily = aggregate.time_series()
+    expected = toxicity.groupby(data["created_utc"].dt.floor("D")).agg(["size", "mean"])
+    np.testing.assert_array_equal(daily["count"], expected["size"])
+    np.testing.assert_allclose(daily["toxicity"], expected["mean"])
+    assert aggregate.scatter_histogram(10)[0].sum() == 2000
+    assert aggregate.toxicity_histogram(20).counts.sum() == 2000
+
+
+def test_sample_keeps_at_most_sample_size_rows_per_day_and_overall():
+    aggregate = ToxicityAggregator("created_utc", ["score"], sample_size=100)
+    aggregate.add(comments(3000))
+
+    assert aggregate.sample.groupby("day").size().max() == 100
+    sample = aggregate.sample_frame()
+    assert len(sample) == 100
+    assert list(sample.columns[:2]) == ["score", "toxicity"]
+    assert ToxicityAggregator("created_utc", ["score"]).sample_frame().empty
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+from correlation import cross_correlation, direct_cross_correlation, scan_pairs, standardize
+
+HOURS = pd.date_range("2024-11-01", periods=24 * 30, freq="h", tz="UTC")
+
+
+def random_walks(columns, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(rng.standard_normal((len(HOURS), len(columns))).cumsum(axis=0), index=HOURS, columns=columns)
+
+
+def test_fft_matches_direct_correlation():
+    left = standardize(random_walks(["a", "b", "c"]), False)
+    right = standardize(random_walks(["x", "y"], seed=1), False)
+    fast = cross_correlation(left, right, 48)
+    assert fast.shape == (97, 3, 2)
+    np.testing.assert_allclose(fast, direct_cross_correlation(left, right, 48), atol=1e-10)
+
+
+def test_standardize_zscores_columns_and_zeroes_constants_and_gaps():
+    frame = random_walks(["a", "b"]).assign(constant=3.0)
+    frame.iloc[5, 0] = np.nan
+    values = standardize(frame, deseasonalize=False)
+    np.testing.assert_allclose(values[:, 1].mean(), 0, atol=1e-12)
+    np.testing.assert_allclose(values[:, 1].std(), 1)
+    assert values[5, 0] == 0
+    assert not values[:, 2].any()
+
+
+def test_standardize_removes_the_daily_cycle():
+    cycle = np.sin(2 * np.pi * HOURS.hour / 24)
+    values = standardize(pd.DataFrame({"a": 10 * cycle + random_walks(["a"])["a"].diff().fillna(0)}, index=HOURS))
+    assert abs(np.corrcoef(values[:, 0], cycle)[0, 1]) < 0.05
+
+
+def test_scan_pairs_finds_a_planted_lag():
+    rng = np.random.default_rng(2)
+    left = random_walks(["4chan/pol", "4chan/fit"]).diff().fillna(0)
+    right = pd.DataFrame({
+        # follows 4chan/pol by 6 hours
+        "reddit/politics": np.roll(left["4chan/pol"], 6) + 0.5 * rng.standard_normal(len(HOURS)),
+        "reddit/noise": rng.standard_normal(len(HOURS)),
+    }, index=HOURS)
+    pairs = scan_pairs(left, right, 24)
+
+    assert len(pairs) == 4
+    best = pairs.iloc[0]
+    assert (best["left"], best["right"], best["lag"]) == ("4chan/pol", "reddit/politics", 6)
+    assert best["correlation"] > 0.8 > abs(best["zero_lag"])
+    assert pairs["correlation"].abs().is_monotonic_decreasing
+
+
+def test_scan_pairs_skips_a_series_paired_with_itself():
+    frame = random_walks(["a", "b"])
+    pairs = scan_pairs(frame, frame, 12)
+    assert set(zip(pairs["left"], pairs["right"])) == {("a", "b"), ("b", "a")}
@@ -0,0 +1,55 @@
+import datetime
+import pandas as pd
+from aggregators import ToxicityAggregator
+from incremental import stale_days
+
+ROWS = pd.DataFrame({
+    "id": [1, 2, 3, 4, 5, 6],
+    "content": ["x" * n for n in (120, 40, 300, 75, 10, 220)],
+    "created_utc": pd.to_datetime([
+        "2024-11-01 08:00", "2024-11-01 09:30", "2024-11-01 23:10",
+        "2024-11-02 01:00", "2024-11-02 02:00", "2024-11-02 05:00",
+    ]),
+})
+
+
+def fold(state, committed):
+    """One update_source run over the committed rows: refold the days whose counts changed."""
+    days = committed["created_utc"].dt.floor("D")
+    table_rows = committed.groupby(days).size()
+    folded_rows = pd.Series({day: aggregate.rows for day, aggregate in state.items()}, dtype="int64")
+    for day in stale_days(table_rows, folded_rows):
+        aggregate = ToxicityAggregator("created_utc")
+        aggregate.add(committed[days == day])
+        state[day] = aggregate
+    return state
+
+
+def test_rows_committed_out_of_id_order_are_folded():
+    # Row 3 took its id before rows 4-6, but its transaction commits after the first run,
+    # which an id watermark (6 after that run) would skip for good
+    state = fold({}, ROWS[ROWS["id"] != 3])
+    fold(state, ROWS)
+
+    full = ToxicityAggregator("created_utc")
+    full.add(ROWS)
+    assert sum(aggregate.rows for aggregate in state.values()) == len(ROWS)
+    folded = pd.concat([aggregate.daily_counts for aggregate in state.values()]).sort_index()
+    pd.testing.assert_series_equal(folded, full.daily_counts.sort_index())
+    hourly = pd.concat([aggregate.hourly for aggregate in state.values()]).sort_index()
+    pd.testing.assert_frame_equal(hourly, full.hourly.sort_index())
+
+
+def test_unchanged_days_are_not_refolded():
+    state = fold({}, ROWS)
+    first = dict(state)
+    fold(state, ROWS)
+    assert all(state[day] is first[day] for day in first)
+
+
+def test_stale_days_compares_counts_per_day():
+    day = datetime.date
+    table = pd.Series({day(2024, 11, 1): 3, day(2024, 11, 2): 5, day(2024, 11, 3): 1})
+    folded = pd.Series({day(2024, 10, 31): 2, day(2024, 11, 1): 3, day(2024, 11, 2): 4})
+    assert stale_days(table, folded) == [day(2024, 10, 31), day(2024, 11, 2), day(2024, 11, 3)]
+    assert stale_days(table, table.copy()) == []
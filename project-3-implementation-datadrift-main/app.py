@@ -1,10 +1,24 @@
-from flask import Flask, render_template, request
+from flask import Flask, Response, render_template, request, make_response, url_for, abort, jsonify
 import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from sqlalchemy import create_engine
+from functools import lru_cache
+import hashlib
+import html
+import json
 import os
 from dotenv import load_dotenv
+from db import pooled_engine
+from histograms import Histogram, width_bucket_query
+from jobs import JobQueue
+from plot_cache import PlotCache
+from queries import run_prepared, stream_query, query_stats_snapshot
+from rendering import (
+    plot_reddit_toxicity_over_time,
+    plot_toxicity_vs_engagement,
+    plot_sentiment_over_time,
+    plot_toxicity_distribution,
+    render_stats_snapshot,
+)
+from sketches import summarize
 
 # Load environment variables
 load_dotenv()
@@ -15,109 +29,432 @@ app = Flask(__name__)
 # Database connection URL
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Rows per chunk for queries that stream raw rows through an aggregation
+FETCH_CHUNKSIZE = int(os.getenv("FETCH_CHUNKSIZE", 50_000))
+
+# Rendered plots keyed by analysis parameters and data watermark
+plot_cache = PlotCache(max_bytes=int(os.getenv("PLOT_CACHE_MAX_BYTES", 64 * 1024 * 1024)))
+
+# Background rendering for expensive analyses: windows of at least ASYNC_MIN_DAYS days
+# are rendered in a local process pool instead of the request thread
+ASYNC_MIN_DAYS = int(os.getenv("ASYNC_MIN_DAYS", 31))
+JOB_EVENTS_HEARTBEAT = 15  # seconds between status events while a job runs
+analysis_jobs = JobQueue(
+    max_workers=int(os.getenv("ANALYSIS_JOB_WORKERS", 2)),
+    ttl=int(os.getenv("ANALYSIS_JOB_TTL", 600)),  # seconds a finished job stays pollable
+)
+
+# Shared database engine
+@lru_cache(maxsize=None)
+def get_engine():
+    """Return the engine (and connection pool) shared by every query in this process."""
+    return pooled_engine(DATABASE_URL)
+
 # Fetch data from the database
-def fetch_data(query):
-    """Fetch data from PostgreSQL using SQLAlchemy."""
-    engine = create_engine(DATABASE_URL)
-    with engine.connect() as connection:
-        return pd.read_sql(query, connection)
+def fetch_data(name, query, params=None):
+    """Run a query with :name bound parameters as a prepared statement; timings are kept under name."""
+    with get_engine().connect() as connection:
+        return run_prepared(connection, name, query, params or {})
+
+def fetch_chunks(name, query, params=None, chunksize=FETCH_CHUNKSIZE):
+    """Yield the rows of a query in DataFrame chunks from a server-side cursor."""
+    with get_engine().connect() as connection:
+        yield from stream_query(connection, name, query, params or {}, chunksize)
+
+# Data watermark for the plot cache
+def data_watermark(start_date, end_date):
+    """Return the number of Reddit posts in the window; it changes whenever new posts land there.
+
+    Read from the hourly continuous aggregate, whose real-time part includes rows not materialized yet.
+    """
+    data = fetch_data('data_watermark', """
+        SELECT coalesce(sum(post_count), 0) AS watermark
+        FROM reddit_posts_hourly
+        WHERE bucket BETWEEN :start_date AND :end_date
+    """, {"start_date": start_date, "end_date": end_date})
+    return int(data['watermark'].iloc[0])
 
 # Generate data for Reddit Toxicity Over Time
 def generate_reddit_toxicity_over_time(start_date, end_date, min_comments, max_comments):
-    """Fetch and filter Reddit posts based on date range and comment count."""
-    query = f"""
+    """Daily mean toxicity of Reddit posts filtered by date range and comment count.
+
+    Posts are streamed in chunks and folded into per-day sums, so memory does not grow with the window.
+    """
+    totals = None
+    for chunk in fetch_chunks('reddit_toxicity_over_time', """
         SELECT post_id, title AS content, created_utc, num_comments
         FROM reddit_posts
-        WHERE created_utc BETWEEN '{start_date}' AND '{end_date}'
-          AND num_comments BETWEEN {min_comments} AND {max_comments}
-    """
-    data = fetch_data(query)
-    data['created_utc'] = pd.to_datetime(data['created_utc'], errors='coerce')
-    data['toxicity'] = data['content'].str.len() / 100  
-    return data
-
-# Function to plot Reddit Toxicity Over Time
-def plot_reddit_toxicity_over_time(data):
-    """Plot Reddit toxicity trends over time with proper date formatting."""
-    if data.empty:
-        return None  
-    
-    data.set_index('created_utc', inplace=True)
-    time_series = data.resample('D')['toxicity'].mean()  
-    
-    plt.figure(figsize=(10, 6))
-    plt.plot(time_series.index, time_series.values, color='blue', marker='o')
-    plt.title('Reddit Toxicity Over Time')
-    plt.xlabel('Date')
-    plt.ylabel('Average Toxicity')
-    plt.grid(True)
-
-    # Format the x-axis to show dates clearly
-    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%d %b %Y'))  
-    plt.gca().xaxis.set_major_locator(mdates.DayLocator())  
-    plt.xticks(rotation=45)  
-
-    # Adjust layout to prevent cutoff
-    plt.tight_layout(pad=2.0)
-    
-    filename = 'reddit_toxicity_over_time.png'
-    plt.savefig(f'static/{filename}')
-    plt.close()
-    return filename
+        WHERE created_utc BETWEEN :start_date AND :end_date
+          AND num_comments BETWEEN :min_comments AND :max_comments
+    """, {"start_date": start_date, "end_date": end_date, "min_comments": min_comments, "max_comments": max_comments}):
+        toxicity = chunk['content'].str.len() / 100
+        days = pd.to_datetime(chunk['created_utc'], errors='coerce').dt.floor('D')
+        partial = toxicity.groupby(days).agg(['sum', 'count'])
+        totals = partial if totals is None else totals.add(partial, fill_value=0)
+    if totals is None:
+        return pd.DataFrame(columns=['created_utc', 'toxicity'])
+    return pd.DataFrame({'created_utc': totals.index, 'toxicity': (totals['sum'] / totals['count']).to_numpy()})
+
+# Bins of the toxicity distribution (PNG and JSON)
+HISTOGRAM_BINS = 20
 
 # Function to generate analysis data
-def generate_analysis(start_date, end_date):
-    """Generate analysis with varying dates."""
-    query = f"""
-        SELECT post_id, title AS content, created_utc, num_comments
+def generate_analysis(start_date, end_date, bins=HISTOGRAM_BINS):
+    """Toxicity histogram of Reddit posts in the window (None if there are no posts).
+
+    The bins are counted in the database with width_bucket, so only bins rows come back.
+    """
+    data = fetch_data('toxicity_histogram', width_bucket_query("""
+        SELECT char_length(title) / 100.0 AS value
+        FROM reddit_posts
+        WHERE created_utc BETWEEN :start_date AND :end_date
+    """), {"start_date": start_date, "end_date": end_date, "bins": bins})
+    return Histogram.from_bucket_rows(data, bins)
+
+# Generate data for Sentiment Over Time
+def generate_sentiment_over_time(start_date, end_date):
+    """Fetch daily Reddit post counts from the reddit_posts_daily continuous aggregate."""
+    return fetch_data('sentiment_over_time', """
+        SELECT bucket AS created_utc, sum(post_count) AS post_count
+        FROM reddit_posts_daily
+        WHERE bucket BETWEEN :start_date AND :end_date
+        GROUP BY bucket
+        ORDER BY bucket
+    """, {"start_date": start_date, "end_date": end_date})
+
+# Pre-aggregated series for the JSON API; the browser draws the charts
+SCATTER_MAX_POINTS = 2000
+
+def reddit_toxicity_series(start_date, end_date, min_comments, max_comments):
+    """Daily mean toxicity of Reddit posts, filtered by comment count."""
+    data = fetch_data('reddit_toxicity_series', """
+        SELECT date_trunc('day', created_utc) AS day, avg(char_length(title) / 100.0) AS toxicity
         FROM reddit_posts
-        WHERE created_utc BETWEEN '{start_date}' AND '{end_date}'
+        WHERE created_utc BETWEEN :start_date AND :end_date
+          AND num_comments BETWEEN :min_comments AND :max_comments
+        GROUP BY day
+        ORDER BY day
+    """, {"start_date": start_date, "end_date": end_date, "min_comments": min_comments, "max_comments": max_comments})
+    return {
+        "kind": "line",
+        "title": "Reddit Toxicity Over Time",
+        "x_label": "Date",
+        "y_label": "Average Toxicity",
+        "points": [{"x": day.strftime('%Y-%m-%d'), "y": float(toxicity)} for day, toxicity in zip(data['day'], data['toxicity'])],
+    }
+
+def sentiment_series(start_date, end_date):
+    """Daily Reddit post counts from the continuous aggregate."""
+    data = fetch_data('sentiment_series', """
+        SELECT bucket AS day, sum(post_count) AS post_count
+        FROM reddit_posts_daily
+        WHERE bucket BETWEEN :start_date AND :end_date
+        GROUP BY bucket
+        ORDER BY bucket
+    """, {"start_date": start_date, "end_date": end_date})
+    return {
+        "kind": "line",
+        "title": "Sentiment Over Time",
+        "x_label": "Date",
+        "y_label": "Count",
+        "points": [{"x": day.strftime('%Y-%m-%d'), "y": int(count)} for day, count in zip(data['day'], data['post_count'])],
+    }
+
+def toxicity_histogram(start_date, end_date, bins=HISTOGRAM_BINS):
+    """Toxicity histogram of Reddit posts, binned in the database with width_bucket."""
+    histogram = generate_analysis(start_date, end_date, bins)
+    return {
+        "kind": "histogram",
+        "title": "Toxicity Distribution",
+        "x_label": "Toxicity",
+        "y_label": "Count",
+        "bins": histogram.bins() if histogram is not None else [],
+    }
+
+SCATTER_GRID = 40
+SCATTER_STRATA = 20
+SCATTER_MODES = ['sample', 'binned']
+
+# Posts in the window as (toxicity, engagement) points; shared by every scatter mode
+ENGAGEMENT_POINTS = """
+    SELECT char_length(title) / 100.0 AS toxicity, num_comments::numeric AS engagement
+    FROM reddit_posts
+    WHERE created_utc BETWEEN :start_date AND :end_date
+      AND title IS NOT NULL
+      AND num_comments IS NOT NULL
+"""
+
+def engagement_scatter(start_date, end_date, mode='sample', max_points=SCATTER_MAX_POINTS, grid=SCATTER_GRID):
+    """Toxicity vs engagement, reduced in the database to a bounded size.
+
+    mode 'sample' keeps up to max_points posts, stratified over toxicity so sparse high
+    toxicity posts are not drowned out; 'binned' returns at most grid x grid density cells.
+    """
+    params = {"start_date": start_date, "end_date": end_date}
+    series = {"title": "Toxicity vs Engagement", "x_label": "Toxicity", "y_label": "Engagement", "mode": mode}
+
+    if mode == 'binned':
+        data = fetch_data('engagement_binned', f"""
+            WITH points AS ({ENGAGEMENT_POINTS}), bounds AS (
+                SELECT min(toxicity) AS x_low, max(toxicity) + 0.000001 AS x_high,
+                       min(engagement) AS y_low, max(engagement) + 0.000001 AS y_high, count(*) AS total
+                FROM points
+            )
+            SELECT width_bucket(toxicity, x_low, x_high, :grid) AS x_bin,
+                   width_bucket(engagement, y_low, y_high, :grid) AS y_bin,
+                   count(*) AS count,
+                   min(x_low) AS x_low, min(x_high) AS x_high, min(y_low) AS y_low, min(y_high) AS y_high, min(total) AS total
+            FROM points, bounds
+            GROUP BY x_bin, y_bin
+        """, dict(params, grid=grid))
+        series.update(kind="density", total=0, x_edges=[], y_edges=[], cells=[])
+        if data.empty:
+            return series
+        first = data.iloc[0]
+        x_low, x_high, y_low, y_high = (float(first[c]) for c in ('x_low', 'x_high', 'y_low', 'y_high'))
+        series.update(
+            total=int(first['total']),
+            x_edges=[x_low + (x_high - x_low) * i / grid for i in range(grid + 1)],
+            y_edges=[y_low + (y_high - y_low) * i / grid for i in range(grid + 1)],
+            cells=[{"x": int(x) - 1, "y": int(y) - 1, "count": int(c)} for x, y, c in zip(data['x_bin'], data['y_bin'], data['count'])],
+        )
+        return series
+
+    data = fetch_data('engagement_sample', f"""
+        WITH points AS ({ENGAGEMENT_POINTS}), bounds AS (
+            SELECT min(toxicity) AS low, max(toxicity) + 0.000001 AS high, count(*) AS total FROM points
+        ), ranked AS (
+            SELECT toxicity, engagement, total,
+                   row_number() OVER (PARTITION BY width_bucket(toxicity, low, high, :strata) ORDER BY random()) AS rank
+            FROM points, bounds
+        )
+        SELECT toxicity, engagement, total FROM ranked WHERE rank <= :per_stratum
+        """, dict(params, strata=SCATTER_STRATA, per_stratum=max(1, max_points // SCATTER_STRATA)))
+
+    series.update(
+        kind="scatter",
+        total=int(data['total'].iloc[0]) if not data.empty else 0,
+        points=[{"x": float(x), "y": float(y)} for x, y in zip(data['toxicity'], data['engagement'])],
+    )
+    return series
+
+# Sources with ingest sketches (post_sketches.source)
+SKETCH_SOURCES = ['chan_posts', 'reddit_posts', 'reddit_politics_posts', 'reddit_comments', 'reddit_politics_comments']
+
+def sketch_summary(source, start_date, end_date, community=None):
+    """Median/p95 toxicity and distinct authors per board/subreddit, per day and over the whole window.
+
+    Merges the per-day sketches the crawlers maintain, so the cost depends on the number of
+    days and communities, not on the number of posts. Values are approximate (see sketches.py).
+    """
+    data = fetch_data('sketch_summary', """
+        SELECT community, bucket, rows, toxicity, authors
+        FROM post_sketches
+        WHERE source = :source
+          AND bucket BETWEEN CAST(:start_date AS date) AND CAST(:end_date AS date)
+          AND (CAST(:community AS text) IS NULL OR community = :community)
+        ORDER BY community, bucket
+    """, {"source": source, "start_date": start_date, "end_date": end_date, "community": community})
+    return {
+        "source": source,
+        "communities": [
+            {
+                "community": name,
+                "window": summarize(rows),
+                "days": [dict(summarize(day_rows), day=day.isoformat()) for day, day_rows in rows.groupby('bucket')],
+            }
+            for name, rows in data.groupby('community')
+        ],
+    }
+
+# Top terms of ingested text, from the per-day term counts the crawlers maintain
+TERM_SOURCES = SKETCH_SOURCES
+TOP_TERMS = 50
+
+def top_terms(start_date, end_date, sources=TERM_SOURCES, community=None, k=TOP_TERMS):
+    """The k most frequent terms in the window as [(term, count)], most frequent first."""
+    data = fetch_data('top_terms', """
+        SELECT term, sum(count) AS count
+        FROM term_counts
+        WHERE source = ANY(:sources)
+          AND day BETWEEN CAST(:start_date AS date) AND CAST(:end_date AS date)
+          AND (CAST(:community AS text) IS NULL OR community = :community)
+        GROUP BY term
+        ORDER BY count DESC, term
+        LIMIT :k
+    """, {"sources": list(sources), "start_date": start_date, "end_date": end_date, "community": community, "k": k})
+    return [(term, int(count)) for term, count in zip(data['term'], data['count'])]
+
+# Near-duplicate clusters the crawlers assign at insert (cluster_id columns, project 1's dedup.py):
+# source -> (community column, created column, text expression)
+CLUSTER_SOURCES = {
+    'chan_posts': ('board', 'created_at', 'text'),
+    'reddit_posts': ('subreddit', 'created_utc', 'title'),
+    'reddit_politics_posts': ('subreddit', 'created_utc', 'title'),
+    'reddit_comments': ('subreddit', 'created_utc', "data->>'body'"),
+    'reddit_politics_comments': ('subreddit', 'created_utc', "data->>'body'"),
+}
+MAX_DUPLICATES = 100
+
+def near_duplicates(source, row_id, limit=MAX_DUPLICATES):
+    """Rows of any source in the same near-duplicate cluster as a row, newest first.
+
+    Returns None if the row does not exist, and no duplicates if it has no cluster.
+    Each source is read through its (cluster_id, created) index.
+    """
+    community, created, _ = CLUSTER_SOURCES[source]
+    row = fetch_data('duplicate_cluster', f"SELECT cluster_id FROM {source} WHERE id = :id", {"id": row_id})
+    if row.empty:
+        return None
+    cluster_id = row['cluster_id'].iloc[0]
+    if pd.isna(cluster_id):
+        return {"source": source, "id": row_id, "cluster_id": None, "members": 1, "duplicates": []}
+    union = " UNION ALL ".join(
+        f"(SELECT '{name}' AS source, id, {columns[0]} AS community, {columns[1]} AS created, {columns[2]} AS text "
+        f"FROM {name} WHERE cluster_id = :cluster_id ORDER BY {columns[1]} DESC LIMIT :limit)"
+        for name, columns in CLUSTER_SOURCES.items()
+    )
+    data = fetch_data('near_duplicates', f"""
+        SELECT source, id, community, created, text FROM ({union}) AS rows
+        WHERE NOT (source = :source AND id = :id)
+        ORDER BY created DESC
+        LIMIT :limit
+    """, {"cluster_id": int(cluster_id), "source": source, "id": row_id, "limit": limit})
+    members = fetch_data('cluster_members', "SELECT members FROM text_clusters WHERE id = :cluster_id",
+                         {"cluster_id": int(cluster_id)})
+    return {
+        "source": source,
+        "id": row_id,
+        "cluster_id": int(cluster_id),
+        "members": int(members['members'].iloc[0]) if not members.empty else None,
+        "duplicates": [
+            {"source": name, "id": int(id_), "community": group, "created": pd.Timestamp(when).isoformat(), "text": body}
+            for name, id_, group, when, body in data.itertuples(index=False)
+        ],
+    }
+
+# Full-text search over the GIN-indexed search columns (project 1 migrations):
+# source -> (community column, created column, displayed text)
+SEARCH_SOURCES = dict(
+    CLUSTER_SOURCES,
+    reddit_posts=('subreddit', 'created_utc', "concat_ws(' ', title, content)"),
+    reddit_politics_posts=('subreddit', 'created_utc', "concat_ws(' ', title, content)"),
+)
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+SEARCH_ORDERS = ['recent', 'rank']
+
+def highlight(snippet):
+    """Escape a ts_headline snippet for HTML, keeping its <mark> tags."""
+    return html.escape(snippet).replace('&lt;mark&gt;', '<mark>').replace('&lt;/mark&gt;', '</mark>')
+
+def search_posts(query, start_date, end_date, sources=tuple(SEARCH_SOURCES), community=None,
+                 order='recent', page=1, per_page=SEARCH_PAGE_SIZE):
+    """One page of posts and comments matching a web-search style query, with highlighted snippets.
+
+    query takes websearch_to_tsquery syntax ("quoted phrases", or, -excluded). Each source
+    finds its matches through its GIN index and returns at most the rows up to the end of
+    the page; those are merged newest first (or by ts_rank), and only the rows of the page
+    get a ts_headline snippet. Snippets are HTML-escaped text with matches in <mark>.
     """
-    data = fetch_data(query)
-    data['toxicity'] = data['content'].str.len() / 100  
-    data['engagement'] = data['num_comments']  
-    return data
-
-# Function to plot Toxicity vs Engagement
-def plot_toxicity_vs_engagement(data):
-    """Plot Toxicity vs Engagement."""
-    plt.scatter(data['toxicity'], data['engagement'])
-    plt.title('Toxicity vs Engagement')
-    plt.xlabel('Toxicity')
-    plt.ylabel('Engagement')
-    plt.grid(True)
-    filename = 'toxicity_vs_engagement.png'  
-    plt.savefig(f'static/{filename}')        
-    plt.close()
-    return filename  
-
-# Function to plot Sentiment Trends Over Time
-def plot_sentiment_over_time(data, date_column='created_utc'):
-    """Plot Sentiment Over Time."""
-    data[date_column] = pd.to_datetime(data[date_column], errors='coerce')
-    time_series = data.set_index(date_column).resample('D').size()
-    time_series.plot(kind='line')
-    plt.title('Sentiment Over Time')
-    plt.xlabel('Date')
-    plt.ylabel('Count')
-    plt.grid(True)
-    filename = 'sentiment_over_time.png'  
-    plt.savefig(f'static/{filename}')     
-    plt.close()
-    return filename  
-
-# Function to plot Toxicity Distribution
-def plot_toxicity_distribution(data):
-    """Plot Toxicity Distribution."""
-    plt.hist(data['toxicity'].dropna(), bins=20, alpha=0.7)
-    plt.title('Toxicity Distribution')
-    plt.xlabel('Toxicity')
-    plt.ylabel('Count')
-    plt.grid(True)
-    filename = 'toxicity_distribution.png'  
-    plt.savefig(f'static/{filename}')       
-    plt.close()
-    return filename  
+    offset = (page - 1) * per_page
+    union = " UNION ALL ".join(
+        f"(SELECT '{name}' AS source, id, {columns[0]} AS community, {columns[1]} AS created, "
+        f"{columns[2]} AS text, ts_rank(search, tsquery) AS rank "
+        f"FROM {name}, websearch_to_tsquery('english', :query) AS tsquery "
+        f"WHERE search @@ tsquery "
+        f"AND {columns[1]} >= CAST(:start_date AS date) AND {columns[1]} < CAST(:end_date AS date) + 1 "
+        f"AND (CAST(:community AS text) IS NULL OR {columns[0]} = :community) "
+        f"ORDER BY {'rank DESC' if order == 'rank' else columns[1] + ' DESC'} LIMIT :fetch)"
+        for name, columns in SEARCH_SOURCES.items() if name in sources
+    )
+    # One row past the page tells whether there is a next one
+    data = fetch_data(f'search_{order}', f"""
+        SELECT source, id, community, created, rank,
+               ts_headline('english', text, websearch_to_tsquery('english', :query),
+                           'StartSel=<mark>, StopSel=</mark>, MaxFragments=2') AS snippet
+        FROM ({union}) AS matches
+        ORDER BY {'rank DESC, created DESC' if order == 'rank' else 'created DESC'}
+        OFFSET :offset LIMIT :limit
+    """, {"query": query, "start_date": start_date, "end_date": end_date, "community": community,
+          "fetch": offset + per_page + 1, "offset": offset, "limit": per_page + 1})
+    return {
+        "query": query,
+        "page": page,
+        "per_page": per_page,
+        "has_more": len(data) > per_page,
+        "results": [
+            {"source": name, "id": int(id_), "community": group, "created": pd.Timestamp(when).isoformat(),
+             "rank": float(rank), "snippet": highlight(snippet)}
+            for name, id_, group, when, rank, snippet in data.head(per_page).itertuples(index=False)
+        ],
+    }
+
+ANALYSIS_TYPES = ['reddit_toxicity_over_time', 'toxicity_vs_engagement', 'sentiment_over_time', 'toxicity_distribution']
+
+# Query the data and render the plot for an analysis
+def generate_plot(analysis_type, start_date, end_date, min_comments, max_comments, scatter_mode='sample'):
+    """Render the plot for an analysis and return it as PNG bytes (None if there is no data)."""
+    if analysis_type == 'reddit_toxicity_over_time':
+        data = generate_reddit_toxicity_over_time(start_date, end_date, min_comments, max_comments)
+        plot = plot_reddit_toxicity_over_time
+    elif analysis_type == 'toxicity_vs_engagement':
+        data = engagement_scatter(start_date, end_date, scatter_mode)
+        plot = plot_toxicity_vs_engagement
+    elif analysis_type == 'sentiment_over_time':
+        data = generate_sentiment_over_time(start_date, end_date)
+        plot = plot_sentiment_over_time
+    elif analysis_type == 'toxicity_distribution':
+        data = generate_analysis(start_date, end_date)
+        plot = plot_toxicity_distribution
+
+    return plot(data)
+
+# Cached plot lookup
+def get_plot(cache_key):
+    """Return the PNG for a cache key, rendering it on a miss.
+
+    A fresh render is only cached when the key's watermark is still current, so a
+    request carrying an old version cannot replace the image for newer data.
+    """
+    image = plot_cache.get(cache_key)
+    if image is None:
+        analysis_type, start_date, end_date, min_comments, max_comments, scatter_mode, version = cache_key
+        image = generate_plot(analysis_type, start_date, end_date, min_comments, max_comments, scatter_mode)
+        if image is not None and version == data_watermark(start_date, end_date):
+            plot_cache.put(cache_key, image)
+    return image
+
+# Background job body; runs in a pool process, so it takes only picklable arguments
+def render_job(cache_key):
+    """Render the plot for a cache key without touching the cache (which lives in the web process).
+
+    Returns (PNG bytes or None, data watermark after rendering), so the web process can
+    decide whether to cache the image without a query of its own.
+    """
+    analysis_type, start_date, end_date, min_comments, max_comments, scatter_mode, version = cache_key
+    image = generate_plot(analysis_type, start_date, end_date, min_comments, max_comments, scatter_mode)
+    return image, data_watermark(start_date, end_date)
+
+def submit_plot_job(cache_key, plot_url):
+    """Queue a background render; the job result is the plot URL (None if there is no data)."""
+    def store(result):
+        # Runs on the executor's callback thread: only in-memory work here
+        image, watermark = result
+        if image is None:
+            return {"plot_url": None}
+        if cache_key[-1] == watermark:
+            plot_cache.put(cache_key, image)
+        return {"plot_url": plot_url}
+    return analysis_jobs.submit(render_job, cache_key, on_done=store)
+
+def is_expensive(start_date, end_date):
+    """Whether an analysis window is long enough to be rendered as a background job."""
+    return (pd.Timestamp(end_date) - pd.Timestamp(start_date)).days >= ASYNC_MIN_DAYS
+
+def plot_etag(cache_key):
+    """Content address of a plot: hash of the analysis parameters and data version."""
+    return hashlib.sha256(repr(cache_key).encode()).hexdigest()
 
 # Route for the home page
 @app.route('/')
@@ -133,24 +470,29 @@ def analysis(analysis_type):
         end_date = request.form['end_date']
         min_comments = int(request.form.get('min_comments', 0))
         max_comments = int(request.form.get('max_comments', 1000))
+        scatter_mode = request.form.get('scatter_mode', 'sample')
 
-        # Generate data for the analysis
-        if analysis_type == 'reddit_toxicity_over_time':
-            data = generate_reddit_toxicity_over_time(start_date, end_date, min_comments, max_comments)
-            plot_url = plot_reddit_toxicity_over_time(data)
-        elif analysis_type == 'toxicity_vs_engagement':
-            data = generate_analysis(start_date, end_date)
-            plot_url = plot_toxicity_vs_engagement(data)
-        elif analysis_type == 'sentiment_over_time':
-            data = generate_analysis(start_date, end_date)
-            plot_url = plot_sentiment_over_time(data)
-        elif analysis_type == 'toxicity_distribution':
-            data = generate_analysis(start_date, end_date)
-            plot_url = plot_toxicity_distribution(data)
-        else:
+        if analysis_type not in ANALYSIS_TYPES:
             return f"Analysis type '{analysis_type}' is not recognized.", 400
+        if scatter_mode not in SCATTER_MODES:
+            return f"Scatter mode '{scatter_mode}' is not recognized.", 400
+
+        # Render (or reuse) the plot now so an empty result shows no image; the page then
+        # links to it by parameters and data version, so any worker can serve it
+        version = data_watermark(start_date, end_date)
+        cache_key = (analysis_type, start_date, end_date, min_comments, max_comments, scatter_mode, version)
+        plot_url = url_for('plot_image', analysis_type=analysis_type, start_date=start_date, end_date=end_date,
+                           min_comments=min_comments, max_comments=max_comments, scatter_mode=scatter_mode,
+                           version=version)
+        job_id = None
+        if plot_cache.get(cache_key) is None and is_expensive(start_date, end_date):
+            # Long windows render in the background; the page waits for the job's events
+            job_id = submit_plot_job(cache_key, plot_url)
+            plot_url = None
+        elif get_plot(cache_key) is None:
+            plot_url = None
 
-        # Pass the filename to the template
+        # Pass the image URL to the template
         return render_template(
             'analysis.html',
             analysis_type=analysis_type,
@@ -159,9 +501,178 @@ def analysis(analysis_type):
             end_date=end_date,
             min_comments=min_comments,
             max_comments=max_comments,
+            scatter_mode=scatter_mode,
+            job_id=job_id,
         )
 
     return render_template('analysis.html', analysis_type=analysis_type)
 
+# JSON data API
+@app.route('/api/analysis/<analysis_type>')
+def analysis_data(analysis_type):
+    start_date = request.args['start_date']
+    end_date = request.args['end_date']
+    min_comments = int(request.args.get('min_comments', 0))
+    max_comments = int(request.args.get('max_comments', 1000))
+    scatter_mode = request.args.get('scatter_mode', 'sample')
+    if scatter_mode not in SCATTER_MODES:
+        return jsonify(error=f"Scatter mode '{scatter_mode}' is not recognized."), 400
+
+    if analysis_type == 'reddit_toxicity_over_time':
+        series = reddit_toxicity_series(start_date, end_date, min_comments, max_comments)
+    elif analysis_type == 'toxicity_vs_engagement':
+        series = engagement_scatter(start_date, end_date, scatter_mode)
+    elif analysis_type == 'sentiment_over_time':
+        series = sentiment_series(start_date, end_date)
+    elif analysis_type == 'toxicity_distribution':
+        series = toxicity_histogram(start_date, end_date)
+    else:
+        return jsonify(error=f"Analysis type '{analysis_type}' is not recognized."), 400
+    return jsonify(series)
+
+# Approximate quantiles and distinct authors from the ingest sketches
+@app.route('/api/sketches/<source>')
+def sketch_data(source):
+    if source not in SKETCH_SOURCES:
+        return jsonify(error=f"Source '{source}' has no sketches."), 400
+    return jsonify(sketch_summary(source, request.args['start_date'], request.args['end_date'], request.args.get('community')))
+
+# Top terms for a window, optionally limited to some sources and one board/subreddit
+@app.route('/api/terms')
+def terms_data():
+    sources = request.args.get('source', ','.join(TERM_SOURCES)).split(',')
+    unknown = [source for source in sources if source not in TERM_SOURCES]
+    if unknown:
+        return jsonify(error=f"Source '{unknown[0]}' has no term counts."), 400
+    terms = top_terms(request.args['start_date'], request.args['end_date'], sources,
+                      request.args.get('community'), int(request.args.get('k', TOP_TERMS)))
+    return jsonify(terms=[{"term": term, "count": count} for term, count in terms])
+
+# Near-duplicates (reposts, copypasta) of a post or comment, across all sources
+@app.route('/api/duplicates/<source>/<int:row_id>')
+def duplicates_data(source, row_id):
+    if source not in CLUSTER_SOURCES:
+        return jsonify(error=f"Source '{source}' has no near-duplicate clusters."), 400
+    result = near_duplicates(source, row_id, min(int(request.args.get('limit', MAX_DUPLICATES)), MAX_DUPLICATES))
+    if result is None:
+        return jsonify(error=f"No row {row_id} in {source}."), 404
+    return jsonify(result)
+
+# Keyword search over posts and comments, paginated, optionally limited to some sources and one board/subreddit
+@app.route('/api/search')
+def search_data():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify(error="Missing search query 'q'."), 400
+    sources = request.args.get('source', ','.join(SEARCH_SOURCES)).split(',')
+    unknown = [source for source in sources if source not in SEARCH_SOURCES]
+    if unknown:
+        return jsonify(error=f"Source '{unknown[0]}' is not searchable."), 400
+    order = request.args.get('order', 'recent')
+    if order not in SEARCH_ORDERS:
+        return jsonify(error=f"Order '{order}' is not one of {', '.join(SEARCH_ORDERS)}."), 400
+    page = max(int(request.args.get('page', 1)), 1)
+    per_page = min(max(int(request.args.get('per_page', SEARCH_PAGE_SIZE)), 1), MAX_SEARCH_PAGE_SIZE)
+    return jsonify(search_posts(query, request.args['start_date'], request.args['end_date'], sources,
+                                request.args.get('community'), order, page, per_page))
+
+# Route for rendered plots
+@app.route('/plot/<analysis_type>.png')
+def plot_image(analysis_type):
+    if analysis_type not in ANALYSIS_TYPES:
+        abort(404)
+    cache_key = (
+        analysis_type,
+        request.args['start_date'],
+        request.args['end_date'],
+        int(request.args.get('min_comments', 0)),
+        int(request.args.get('max_comments', 1000)),
+        request.args.get('scatter_mode', 'sample'),
+        int(request.args['version']),
+    )
+    if cache_key[5] not in SCATTER_MODES:
+        abort(404)
+
+    # The URL pins the data version, so the image behind it never changes
+    etag = plot_etag(cache_key)
+    if etag in request.if_none_match:
+        response = make_response('', 304)
+    else:
+        image = get_plot(cache_key)
+        if image is None:
+            abort(404)
+        response = make_response(image)
+        response.content_type = 'image/png'
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response
+
+# Route for submitting a background analysis
+@app.route('/api/jobs/<analysis_type>', methods=['POST'])
+def submit_job(analysis_type):
+    values = request.values
+    start_date = values['start_date']
+    end_date = values['end_date']
+    min_comments = int(values.get('min_comments', 0))
+    max_comments = int(values.get('max_comments', 1000))
+    scatter_mode = values.get('scatter_mode', 'sample')
+    if analysis_type not in ANALYSIS_TYPES:
+        return jsonify(error=f"Analysis type '{analysis_type}' is not recognized."), 400
+    if scatter_mode not in SCATTER_MODES:
+        return jsonify(error=f"Scatter mode '{scatter_mode}' is not recognized."), 400
+
+    version = data_watermark(start_date, end_date)
+    cache_key = (analysis_type, start_date, end_date, min_comments, max_comments, scatter_mode, version)
+    plot_url = url_for('plot_image', analysis_type=analysis_type, start_date=start_date, end_date=end_date,
+                       min_comments=min_comments, max_comments=max_comments, scatter_mode=scatter_mode,
+                       version=version)
+    job_id = submit_plot_job(cache_key, plot_url)
+    return jsonify(
+        id=job_id,
+        status_url=url_for('job_status', job_id=job_id),
+        events_url=url_for('job_events', job_id=job_id),
+    ), 202
+
+# Route for polling a background analysis
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    status = analysis_jobs.status(job_id)
+    if status is None:
+        return jsonify(error=f"Job '{job_id}' is not known to this worker."), 404
+    return jsonify(status)
+
+# Route for following a background analysis as server-sent events
+@app.route('/api/jobs/<job_id>/events')
+def job_events(job_id):
+    if analysis_jobs.status(job_id) is None:
+        return jsonify(error=f"Job '{job_id}' is not known to this worker."), 404
+
+    def events():
+        # One event per heartbeat while the job runs, then a final done/failed event
+        while True:
+            status = analysis_jobs.wait(job_id, timeout=JOB_EVENTS_HEARTBEAT)
+            if status is None:
+                return
+            yield f"event: {status['status']}\ndata: {json.dumps(status)}\n\n"
+            if status['status'] in ('done', 'failed'):
+                return
+
+    response = Response(events(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # let nginx pass events through unbuffered
+    return response
+
+# Route for render timings per plot type
+@app.route('/stats/rendering')
+def rendering_stats():
+    return render_stats_snapshot()
+
+# Route for query timings per query
+@app.route('/stats/queries')
+def query_stats():
+    return query_stats_snapshot()
+
 if __name__ == '__main__':
     app.run(host="127.0.0.1", port=5000)
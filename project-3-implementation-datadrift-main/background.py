@@ -1,11 +1,22 @@
+import argparse
+import datetime
 from wordcloud import WordCloud
 import matplotlib.pyplot as plt
+from app import TERM_SOURCES, top_terms
 
-# Words to include in the word cloud (subreddits which we used in our project)
-words = """
-politics PoliticalDiscussion uspolitics democrats AskTrumpSupporters congress fitness bodyweightfitness HealthyFood 
-nutrition exercise loseit gainit running yoga crossfit flexibility strength_training xxfitness
-"""
+# Words to include in the word cloud: the most frequent terms of the crawled posts and
+# comments in the window, read from the term index the crawlers maintain
+today = datetime.date.today()
+parser = argparse.ArgumentParser(description="Generate the dashboard's background word cloud from the term index.")
+parser.add_argument("--start-date", default=(today - datetime.timedelta(days=30)).isoformat())
+parser.add_argument("--end-date", default=today.isoformat())
+parser.add_argument("--source", default=",".join(TERM_SOURCES), help="comma separated sources (default: all)")
+parser.add_argument("--words", type=int, default=200, help="number of terms in the cloud")
+args = parser.parse_args()
+
+frequencies = dict(top_terms(args.start_date, args.end_date, args.source.split(","), k=args.words))
+if not frequencies:
+    raise SystemExit(f"No terms indexed between {args.start_date} and {args.end_date}")
 
 # Create a WordCloud instance
 wordcloud = WordCloud(
@@ -13,10 +24,10 @@ wordcloud = WordCloud(
     height=400,
     background_color="white",
     colormap="viridis"
-).generate(words)
+).generate_from_frequencies(frequencies)
 
 # Save the word cloud image
-output_path = "static/wordcloud.png"  
+output_path = "static/wordcloud.png"
 wordcloud.to_file(output_path)
 print(f"Word cloud saved at {output_path}")
 
@@ -0,0 +1,73 @@
+"""
+Latency benchmark for the dashboard's POST /analysis/<analysis_type> path.
+
+Runs each analysis through Flask's test client, first with a fresh engine
+per query (how fetch_data used to work) and then with the shared pooled
+engine from get_engine(), and prints median/p95 latency for both. The plot
+cache is disabled and every window renders in the request (no background job),
+so each request runs its queries and the table compares connection handling
+rather than cache hits.
+
+Usage: python3 bench_dashboard.py [--requests 50] [--start-date 2024-11-01] [--end-date 2024-11-14]
+"""
+import argparse
+import statistics
+import time
+from unittest import mock
+import matplotlib
+matplotlib.use("Agg")
+from sqlalchemy import create_engine
+import app as dashboard
+from plot_cache import PlotCache
+
+ANALYSIS_TYPES = ["reddit_toxicity_over_time", "toxicity_vs_engagement", "sentiment_over_time", "toxicity_distribution"]
+
+
+def time_requests(client, analysis_type, form, count):
+    """POST the analysis form `count` times and return the latencies in ms."""
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = client.post(f"/analysis/{analysis_type}", data=form)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f"{analysis_type} returned HTTP {response.status_code}")
+    return latencies
+
+
+def summarize(latencies):
+    """Return (median, p95) of a list of latencies."""
+    ordered = sorted(latencies)
+    return statistics.median(ordered), ordered[int(0.95 * (len(ordered) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50, help="requests per analysis type and mode")
+    parser.add_argument("--start-date", default="2024-11-01")
+    parser.add_argument("--end-date", default="2024-11-14")
+    args = parser.parse_args()
+
+    form = {"start_date": args.start_date, "end_date": args.end_date, "min_comments": 0, "max_comments": 1000}
+    client = dashboard.app.test_client()
+
+    results = {}
+    # A zero-byte cache stores nothing, so no request is served from an earlier render
+    with mock.patch.object(dashboard, "plot_cache", PlotCache(max_bytes=0)), \
+            mock.patch.object(dashboard, "is_expensive", lambda start_date, end_date: False):
+        with mock.patch.object(dashboard, "get_engine", lambda: create_engine(dashboard.DATABASE_URL)):
+            for analysis_type in ANALYSIS_TYPES:
+                results[(analysis_type, "engine per query")] = time_requests(client, analysis_type, form, args.requests)
+        for analysis_type in ANALYSIS_TYPES:
+            # one warm-up request so the pool is filled before timing
+            time_requests(client, analysis_type, form, 1)
+            results[(analysis_type, "shared engine")] = time_requests(client, analysis_type, form, args.requests)
+
+    print(f"{'analysis':<28} {'mode':<18} {'median ms':>10} {'p95 ms':>8}")
+    for (analysis_type, mode), latencies in results.items():
+        median, p95 = summarize(latencies)
+        print(f"{analysis_type:<28} {mode:<18} {median:>10.1f} {p95:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
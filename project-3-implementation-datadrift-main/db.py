@@ -0,0 +1,25 @@
+# Connection pool settings shared by the dashboard and the project 2 analysis scripts,
+# tuned with DB_POOL_SIZE, DB_MAX_OVERFLOW and DB_POOL_RECYCLE in .env. Each project
+# ships its own copy of this file so it deploys on its own; keep the two identical
+# (project 3's tests/test_shared_modules.py checks).
+
+import os
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+
+load_dotenv()
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))  # seconds
+
+
+def pooled_engine(url):
+    """Create an engine for url with the shared connection pool settings."""
+    return create_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_pre_ping=True,  # drop connections the server closed while they sat in the pool
+        pool_recycle=DB_POOL_RECYCLE,
+    )
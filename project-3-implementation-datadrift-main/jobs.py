@@ -0,0 +1,82 @@
+import multiprocessing
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, wait
+
+
+class JobQueue:
+    """Runs expensive analyses in a local process pool and tracks them by job id.
+
+    Jobs are kept in memory by the process that accepted them, so status requests must
+    reach the same process. Finished jobs are forgotten ttl seconds after completion.
+    """
+
+    def __init__(self, max_workers, ttl):
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self.executor = None
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, fn, *args, on_done=None):
+        """Queue fn(*args) and return its job id; on_done(result) runs in this process on success.
+
+        on_done runs on the executor's result thread, which serves every job, so it
+        should be quick and not block (no queries); do such work in fn instead.
+        """
+        with self.lock:
+            self._expire()
+            if self.executor is None:
+                # spawn, so workers never inherit the parent's pooled database connections
+                self.executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+            job_id = uuid.uuid4().hex
+            job = {"future": self.executor.submit(fn, *args), "submitted": time.time(), "finished": None, "result": None, "error": None}
+            self.jobs[job_id] = job
+        job["future"].add_done_callback(lambda future: self._finish(job, future, on_done))
+        return job_id
+
+    def _finish(self, job, future, on_done):
+        try:
+            if future.exception() is not None:
+                job["error"] = str(future.exception())
+            elif on_done is not None:
+                job["result"] = on_done(future.result())
+            else:
+                job["result"] = future.result()
+        except Exception as e:
+            job["error"] = str(e)
+        finally:
+            job["finished"] = time.time()
+
+    def _expire(self):
+        now = time.time()
+        for job_id in [j for j, job in self.jobs.items() if job["finished"] and now - job["finished"] > self.ttl]:
+            del self.jobs[job_id]
+
+    def status(self, job_id):
+        """Return the job's status dict, or None for an unknown (or expired) job id."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        future = job["future"]
+        if job["finished"] is None:
+            state = "running" if future.running() else "pending"
+            return {"id": job_id, "status": state, "elapsed": time.time() - job["submitted"]}
+        status = {"id": job_id, "elapsed": job["finished"] - job["submitted"]}
+        if job["error"] is not None:
+            return dict(status, status="failed", error=job["error"])
+        return dict(status, status="done", result=job["result"])
+
+    def wait(self, job_id, timeout):
+        """Block until the job finishes or timeout seconds pass, then return its status."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is not None:
+            wait([job["future"]], timeout=timeout)
+            # the done callback may still be storing the result
+            deadline = time.time() + 1
+            while job["finished"] is None and job["future"].done() and time.time() < deadline:
+                time.sleep(0.01)
+        return self.status(job_id)
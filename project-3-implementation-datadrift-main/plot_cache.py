@@ -0,0 +1,43 @@
+from collections import OrderedDict
+import threading
+
+
+class PlotCache:
+    """Size-bounded LRU cache of rendered plot images.
+
+    Keys are (analysis_type, start_date, end_date, min_comments, max_comments, scatter_mode,
+    watermark) tuples, as app.py builds them; only the last element is the watermark. The watermark changes when new data lands in the requested window, so storing
+    an image under a new watermark also drops the stale images for the same parameters.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached image bytes for key, or None."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, image):
+        """Cache a rendered image, evicting least recently used entries to stay under max_bytes."""
+        if len(image) > self.max_bytes:
+            return
+        with self.lock:
+            # Same parameters with an older watermark: the data changed, so those images are stale
+            for stale in [k for k in self.entries if k[:-1] == key[:-1] and k != key]:
+                self._remove(stale)
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = image
+            self.size += len(image)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+
+    def _remove(self, key):
+        self.size -= len(self.entries.pop(key))
@@ -0,0 +1,116 @@
+# Query layer for the dashboard. Every query is written with :name bound parameters
+# and run as a server-side prepared statement (PREPARE once per pooled connection,
+# then EXECUTE), so Postgres parses it once and can reuse its plan across requests.
+
+import hashlib
+import logging
+import re
+import threading
+import time
+import pandas as pd
+from sqlalchemy import text
+
+# Logger setup
+logger = logging.getLogger("queries")
+logger.setLevel(logging.INFO)
+sh = logging.StreamHandler()
+formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+sh.setFormatter(formatter)
+logger.addHandler(sh)
+
+# :name placeholders (but not ::type casts)
+PLACEHOLDER = re.compile(r"(?<!:):([A-Za-z_]\w*)")
+
+# Query timings per query name: {name: {"count", "prepares", "prepare_ms", "execute_ms", "fetch_ms", "max_ms"}}
+query_stats = {}
+query_stats_lock = threading.Lock()
+
+
+def to_positional(query):
+    """Rewrite :name placeholders to $1, $2, ... and return (sql, parameter names in order)."""
+    names = []
+
+    def replace(match):
+        if match.group(1) not in names:
+            names.append(match.group(1))
+        return f"${names.index(match.group(1)) + 1}"
+
+    return PLACEHOLDER.sub(replace, query), names
+
+
+def record(name, prepare_ms, execute_ms, fetch_ms, prepared):
+    """Add one run of a query to query_stats and log it."""
+    total_ms = prepare_ms + execute_ms + fetch_ms
+    with query_stats_lock:
+        stats = query_stats.setdefault(name, {"count": 0, "prepares": 0, "prepare_ms": 0.0,
+                                              "execute_ms": 0.0, "fetch_ms": 0.0, "max_ms": 0.0})
+        stats["count"] += 1
+        stats["prepares"] += 1 if prepared else 0
+        stats["prepare_ms"] += prepare_ms
+        stats["execute_ms"] += execute_ms
+        stats["fetch_ms"] += fetch_ms
+        stats["max_ms"] = max(stats["max_ms"], total_ms)
+    logger.info(f"Query {name}: prepare {prepare_ms:.1f} ms, execute {execute_ms:.1f} ms, fetch {fetch_ms:.1f} ms")
+
+
+def run_prepared(connection, name, query, params):
+    """Run a query as a prepared statement on this connection and return a DataFrame.
+
+    The statement is named after a hash of its text and prepared the first time this
+    pooled connection sees it; connection.info lives as long as the DBAPI connection.
+    """
+    sql, names = to_positional(query)
+    statement = "q_" + hashlib.sha1(sql.encode()).hexdigest()[:16]
+    prepared = connection.info.setdefault("prepared_statements", set())
+
+    prepare_ms = 0.0
+    needs_prepare = statement not in prepared
+    if needs_prepare:
+        start = time.perf_counter()
+        connection.exec_driver_sql(f"PREPARE {statement} AS {sql}")
+        prepare_ms = (time.perf_counter() - start) * 1000
+        prepared.add(statement)
+
+    start = time.perf_counter()
+    if names:
+        arguments = ", ".join(f"%({n})s" for n in names)
+        result = connection.exec_driver_sql(f"EXECUTE {statement}({arguments})", {n: params[n] for n in names})
+    else:
+        result = connection.exec_driver_sql(f"EXECUTE {statement}")
+    execute_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    data = pd.DataFrame.from_records(result.fetchall(), columns=list(result.keys()), coerce_float=True)
+    fetch_ms = (time.perf_counter() - start) * 1000
+
+    record(name, prepare_ms, execute_ms, fetch_ms, needs_prepare)
+    return data
+
+
+def stream_query(connection, name, query, params, chunksize):
+    """Yield the result of a query as DataFrames of at most chunksize rows.
+
+    Runs through a named server-side cursor instead of a prepared statement (Postgres
+    cannot DECLARE a cursor over EXECUTE), so only one chunk is held in memory at a time.
+    Time to the first chunk is recorded as execute time, the rest as fetch time.
+    """
+    start = time.perf_counter()
+    execute_ms = None
+    connection = connection.execution_options(stream_results=True, max_row_buffer=chunksize)
+    for chunk in pd.read_sql(text(query), connection, params=params, chunksize=chunksize):
+        if execute_ms is None:
+            execute_ms = (time.perf_counter() - start) * 1000
+        yield chunk
+    total_ms = (time.perf_counter() - start) * 1000
+    record(name, 0.0, execute_ms if execute_ms is not None else total_ms,
+           total_ms - execute_ms if execute_ms is not None else 0.0, False)
+
+
+def query_stats_snapshot():
+    """Return a copy of the query timings with per-run means added."""
+    with query_stats_lock:
+        return {
+            name: dict(stats, mean_execute_ms=stats["execute_ms"] / stats["count"],
+                       mean_prepare_ms=stats["prepare_ms"] / stats["prepares"] if stats["prepares"] else 0.0)
+            for name, stats in query_stats.items()
+        }
@@ -0,0 +1,148 @@
+# Plot rendering for the dashboard, built on matplotlib's object-oriented API.
+# Every plot gets its own Figure and Agg canvas and nothing touches pyplot's global
+# state, so plots can be rendered concurrently from request threads or a thread pool.
+
+import functools
+import io
+import logging
+import threading
+import time
+import numpy as np
+import pandas as pd
+import matplotlib.dates as mdates
+from matplotlib.colors import LogNorm
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# Logger setup
+logger = logging.getLogger("rendering")
+logger.setLevel(logging.INFO)
+sh = logging.StreamHandler()
+formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+sh.setFormatter(formatter)
+logger.addHandler(sh)
+
+# Render timings per plot type: {plot_type: {"count", "total_ms", "max_ms"}}
+render_stats = {}
+render_stats_lock = threading.Lock()
+
+
+def timed_render(plot_type):
+    """Decorator that records how long each render of plot_type takes."""
+    def decorator(render):
+        @functools.wraps(render)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            image = render(*args, **kwargs)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with render_stats_lock:
+                stats = render_stats.setdefault(plot_type, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+                stats["count"] += 1
+                stats["total_ms"] += elapsed_ms
+                stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            logger.info(f"Rendered {plot_type} in {elapsed_ms:.1f} ms")
+            return image
+        return wrapper
+    return decorator
+
+
+def render_stats_snapshot():
+    """Return a copy of the render timings with the mean added."""
+    with render_stats_lock:
+        return {
+            plot_type: dict(stats, mean_ms=stats["total_ms"] / stats["count"])
+            for plot_type, stats in render_stats.items()
+        }
+
+
+def new_figure(figsize=(6.4, 4.8)):
+    """Create a standalone Figure on an Agg canvas and return (figure, axes)."""
+    figure = Figure(figsize=figsize)
+    FigureCanvasAgg(figure)
+    return figure, figure.add_subplot()
+
+
+def figure_png(figure):
+    """Render a Figure to PNG bytes."""
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+
+@timed_render('reddit_toxicity_over_time')
+def plot_reddit_toxicity_over_time(data):
+    """Plot Reddit toxicity trends over time with proper date formatting."""
+    if data.empty:
+        return None
+
+    data.set_index('created_utc', inplace=True)
+    time_series = data.resample('D')['toxicity'].mean()
+
+    figure, ax = new_figure(figsize=(10, 6))
+    ax.plot(time_series.index, time_series.values, color='blue', marker='o')
+    ax.set_title('Reddit Toxicity Over Time')
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Average Toxicity')
+    ax.grid(True)
+
+    # Format the x-axis to show dates clearly
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d %b %Y'))
+    ax.xaxis.set_major_locator(mdates.DayLocator())
+    ax.tick_params(axis='x', labelrotation=45)
+
+    # Adjust layout to prevent cutoff
+    figure.tight_layout(pad=2.0)
+    return figure_png(figure)
+
+
+@timed_render('toxicity_vs_engagement')
+def plot_toxicity_vs_engagement(series):
+    """Plot Toxicity vs Engagement from a reduced scatter (sampled points or density cells)."""
+    figure, ax = new_figure()
+    if series['kind'] == 'density':
+        counts = np.zeros((len(series['y_edges']) - 1, len(series['x_edges']) - 1))
+        for cell in series['cells']:
+            counts[cell['y'], cell['x']] = cell['count']
+        mesh = ax.pcolormesh(series['x_edges'], series['y_edges'], np.ma.masked_equal(counts, 0),
+                             norm=LogNorm(), cmap='viridis')
+        figure.colorbar(mesh, ax=ax, label='Posts')
+    else:
+        ax.scatter([p['x'] for p in series['points']], [p['y'] for p in series['points']], s=8, alpha=0.6)
+        if series['total'] > len(series['points']):
+            ax.text(0.99, 0.99, f"{len(series['points'])} of {series['total']} posts", transform=ax.transAxes,
+                    ha='right', va='top', fontsize=8)
+    ax.set_title('Toxicity vs Engagement')
+    ax.set_xlabel('Toxicity')
+    ax.set_ylabel('Engagement')
+    ax.grid(True)
+    return figure_png(figure)
+
+
+@timed_render('sentiment_over_time')
+def plot_sentiment_over_time(data, date_column='created_utc', count_column='post_count'):
+    """Plot Sentiment Over Time from daily post counts."""
+    data[date_column] = pd.to_datetime(data[date_column], errors='coerce')
+    time_series = data.set_index(date_column)[count_column].resample('D').sum()
+    figure, ax = new_figure()
+    ax.plot(time_series.index, time_series.values)
+    ax.set_title('Sentiment Over Time')
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Count')
+    ax.grid(True)
+    figure.autofmt_xdate()
+    return figure_png(figure)
+
+
+@timed_render('toxicity_distribution')
+def plot_toxicity_distribution(histogram):
+    """Plot Toxicity Distribution from a Histogram's bin counts."""
+    if histogram is None:
+        return None
+
+    figure, ax = new_figure()
+    histogram.plot(ax, alpha=0.7)
+    ax.set_title('Toxicity Distribution')
+    ax.set_xlabel('Toxicity')
+    ax.set_ylabel('Count')
+    ax.grid(True)
+    return figure_png(figure)
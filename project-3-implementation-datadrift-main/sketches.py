@@ -0,0 +1,59 @@
+# Reading the post_sketches rows the crawlers keep per source, board/subreddit and day
+# (project 1's sketches.py writes them). Sketches of any set of days merge into one:
+# a HyperLogLog by taking the register-wise max, a KLL sketch by pooling its weighted
+# items. So quantiles and distinct authors for a date range come from a handful of
+# small rows instead of a scan of the posts.
+
+import math
+import numpy as np
+
+
+def merge_registers(registers):
+    """Register-wise max of several HyperLogLog register arrays (bytes-like, equal length)."""
+    return np.max(np.stack([np.frombuffer(r, dtype=np.uint8) for r in registers]), axis=0)
+
+
+def distinct_count(registers):
+    """HyperLogLog estimate from merged registers, with linear counting for small counts."""
+    m = len(registers)
+    estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.exp2(-registers.astype("float64")))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * math.log(m / zeros)
+    return round(estimate)
+
+
+def quantiles(sketches, qs):
+    """Quantiles qs of the values summarized by several KLL sketches ({"levels": ...} dicts).
+
+    Items of level h stand for 2 ** h values, so pooling the items of all sketches and
+    reading their weighted cumulative distribution gives the merged sketch's answer.
+    Returns None for each q if the sketches hold no values.
+    """
+    values, weights = [], []
+    for sketch in sketches:
+        for level, items in enumerate(sketch["levels"]):
+            values.extend(items)
+            weights.extend([1 << level] * len(items))
+    if not values:
+        return [None] * len(qs)
+    order = np.argsort(values, kind="stable")
+    values = np.asarray(values, dtype="float64")[order]
+    cumulative = np.cumsum(np.asarray(weights, dtype="float64")[order])
+    positions = np.searchsorted(cumulative, [q * cumulative[-1] for q in qs])
+    return [float(values[min(p, len(values) - 1)]) for p in positions]
+
+
+def summarize(rows, qs=(0.5, 0.95)):
+    """Rows, toxicity quantiles and distinct authors over post_sketches rows (a DataFrame).
+
+    distinct_authors is None when no author was added to any of the sketches, as on
+    4chan boards without poster IDs, where authors are not tracked at all.
+    """
+    toxicity = quantiles(rows["toxicity"], qs)
+    registers = merge_registers(rows["authors"])
+    return {
+        "rows": int(rows["rows"].sum()),
+        **{f"p{round(q * 100)}": value for q, value in zip(qs, toxicity)},
+        "distinct_authors": distinct_count(registers) if registers.any() else None,
+    }
@@ -0,0 +1,103 @@
+// Draws the analysis charts in the browser from the JSON API, so the server only
+// runs an aggregate query instead of rendering a PNG. If Chart.js failed to load,
+// the form falls back to the server-rendered image (normal POST).
+
+let currentChart = null;
+
+function chartConfig(series) {
+    const axes = {
+        x: { title: { display: true, text: series.x_label } },
+        y: { title: { display: true, text: series.y_label } },
+    };
+    if (series.kind === 'line') {
+        return {
+            type: 'line',
+            data: {
+                labels: series.points.map(p => p.x),
+                datasets: [{ label: series.y_label, data: series.points.map(p => p.y), borderColor: 'blue', pointRadius: 3 }],
+            },
+            options: { scales: axes },
+        };
+    }
+    if (series.kind === 'histogram') {
+        return {
+            type: 'bar',
+            data: {
+                labels: series.bins.map(b => b.start.toFixed(2)),
+                datasets: [{ label: series.y_label, data: series.bins.map(b => b.count), categoryPercentage: 1.0, barPercentage: 1.0 }],
+            },
+            options: { scales: axes },
+        };
+    }
+    if (series.kind === 'density') {
+        // Density cells are drawn as bubbles at the cell centres, sized by post count
+        const maxCount = Math.max(1, ...series.cells.map(c => c.count));
+        const centre = (edges, i) => (edges[i] + edges[i + 1]) / 2;
+        return {
+            type: 'bubble',
+            data: {
+                datasets: [{
+                    label: 'Posts per cell',
+                    data: series.cells.map(c => ({
+                        x: centre(series.x_edges, c.x),
+                        y: centre(series.y_edges, c.y),
+                        r: 2 + 10 * Math.sqrt(c.count / maxCount),
+                        count: c.count,
+                    })),
+                }],
+            },
+            options: {
+                scales: axes,
+                plugins: { tooltip: { callbacks: { label: ctx => `${ctx.raw.count} posts` } } },
+            },
+        };
+    }
+    return {
+        type: 'scatter',
+        data: { datasets: [{ label: series.title, data: series.points, pointRadius: 2 }] },
+        options: { scales: axes },
+    };
+}
+
+function showChart(series) {
+    document.getElementById('chartTitle').textContent = series.title;
+    const note = document.getElementById('chartNote');
+    if (series.kind === 'scatter' && series.total > series.points.length) {
+        note.textContent = `Showing ${series.points.length} of ${series.total} posts`;
+    } else if (series.kind === 'density') {
+        note.textContent = `${series.total} posts in ${series.cells.length} cells`;
+    } else {
+        note.textContent = '';
+    }
+    if (currentChart) {
+        currentChart.destroy();
+    }
+    currentChart = new Chart(document.getElementById('chart'), chartConfig(series));
+    document.getElementById('chartModal').style.display = 'flex';
+}
+
+function closeChart() {
+    document.getElementById('chartModal').style.display = 'none';
+}
+
+function initClientCharts(apiUrl) {
+    const form = document.getElementById('analysisForm');
+    form.addEventListener('submit', async event => {
+        if (typeof Chart === 'undefined') {
+            return;
+        }
+        event.preventDefault();
+        const params = new URLSearchParams(new FormData(form));
+        const response = await fetch(`${apiUrl}?${params}`);
+        if (!response.ok) {
+            alert(`Analysis failed (HTTP ${response.status})`);
+            return;
+        }
+        showChart(await response.json());
+    });
+    window.addEventListener('click', event => {
+        if (event.target === document.getElementById('chartModal')) {
+            closeChart();
+        }
+    });
+}
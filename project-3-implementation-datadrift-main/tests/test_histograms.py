@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+from matplotlib.figure import Figure
+from histograms import Histogram
+
+
+def bucket_rows(values, bins):
+    """The rows width_bucket_query returns for values, computed as Postgres would."""
+    values = values[~np.isnan(values)]
+    low, high = values.min(), values.max()
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    buckets = np.minimum(np.floor((values - low) / (high - low) * bins).astype(int) + 1, bins)
+    found, counts = np.unique(buckets, return_counts=True)
+    return pd.DataFrame({"bin": found, "count": counts, "low": low, "high": high})
+
+
+def test_chunks_add_up_to_one_histogram_over_all_values():
+    values = np.random.default_rng(0).exponential(2, 10000)
+    histogram = Histogram.uniform(values.min(), values.max(), 30)
+    for chunk in np.array_split(values, 7):
+        histogram.add(chunk)
+    expected, edges = np.histogram(values, bins=30)
+    np.testing.assert_allclose(histogram.edges, edges)
+    np.testing.assert_array_equal(histogram.counts, expected)
+    assert histogram.total == len(values)
+
+
+def test_add_skips_nan_and_applies_weights():
+    histogram = Histogram.uniform(0, 4, 4).add([0.5, np.nan, 1.5, 4.0], weights=[2, 100, 3, 5])
+    np.testing.assert_array_equal(histogram.counts, [2, 3, 0, 5])
+
+
+def test_uniform_widens_a_single_value_like_numpy():
+    histogram = Histogram.uniform(3, 3, 10).add([3, 3])
+    np.testing.assert_allclose(histogram.edges, np.histogram([3, 3], bins=10)[1])
+    assert histogram.total == 2
+
+
+def test_merge_adds_counts_and_requires_the_same_edges():
+    a = Histogram.uniform(0, 1, 5).add([0.1, 0.9])
+    b = Histogram.uniform(0, 1, 5).add([0.1])
+    np.testing.assert_array_equal((a + b).counts, [2, 0, 0, 0, 1])
+    with pytest.raises(ValueError):
+        a.merge(Histogram.uniform(0, 2, 5))
+
+
+def test_bucket_rows_match_np_histogram():
+    values = np.round(np.random.default_rng(1).gamma(2, 1.5, 5000), 2)
+    values[::50] = np.nan
+    histogram = Histogram.from_bucket_rows(bucket_rows(values, 25), 25)
+    expected, edges = np.histogram(values[~np.isnan(values)], bins=25)
+    np.testing.assert_allclose(histogram.edges, edges)
+    np.testing.assert_array_equal(histogram.counts, expected)
+    assert Histogram.from_bucket_rows(bucket_rows(values, 25).iloc[0:0], 25) is None
+
+
+def test_bins_and_plot_show_the_counts():
+    values = np.random.default_rng(2).normal(size=1000)
+    histogram = Histogram.uniform(values.min(), values.max(), 12).add(values)
+    assert [b["count"] for b in histogram.bins()] == histogram.counts.astype(int).tolist()
+    assert histogram.bins()[-1]["end"] == pytest.approx(values.max())
+    counts, edges, _ = histogram.plot(Figure().subplots())
+    np.testing.assert_array_equal(counts, np.histogram(values, bins=12)[0])
@@ -0,0 +1,43 @@
+import time
+from jobs import JobQueue
+
+
+# Module level, so the spawned workers can import them
+def square(value):
+    return value * value
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+def test_jobs_report_results_and_errors():
+    queue = JobQueue(max_workers=1, ttl=60)
+    try:
+        done = queue.submit(square, 7)
+        stored = []
+        with_callback = queue.submit(square, 3, on_done=lambda result: stored.append(result) or "stored")
+        failed = queue.submit(fail, "no data")
+
+        assert queue.wait(done, timeout=60)["result"] == 49
+        status = queue.wait(with_callback, timeout=60)
+        assert (status["status"], status["result"], stored) == ("done", "stored", [9])
+        status = queue.wait(failed, timeout=60)
+        assert (status["status"], status["error"]) == ("failed", "no data")
+        assert queue.status("unknown") is None
+    finally:
+        queue.executor.shutdown()
+
+
+def test_finished_jobs_expire_after_ttl():
+    queue = JobQueue(max_workers=1, ttl=0.1)
+    try:
+        first = queue.submit(square, 2)
+        assert queue.wait(first, timeout=60)["status"] == "done"
+        time.sleep(0.2)
+        # Expired jobs are dropped the next time a job is submitted
+        second = queue.submit(square, 3)
+        assert queue.status(first) is None
+        assert queue.wait(second, timeout=60)["result"] == 9
+    finally:
+        queue.executor.shutdown()
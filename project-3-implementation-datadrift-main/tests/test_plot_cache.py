@@ -0,0 +1,52 @@
+from plot_cache import PlotCache
+
+
+def key(analysis_type="toxicity", scatter_mode="binned", watermark=1):
+    """A cache key shaped like the ones app.py builds."""
+    return (analysis_type, "2024-01-01", "2024-01-31", 0, 1000, scatter_mode, watermark)
+
+
+def test_evicts_least_recently_used_to_stay_under_max_bytes():
+    cache = PlotCache(max_bytes=30)
+    cache.put(key("a"), b"x" * 10)
+    cache.put(key("b"), b"x" * 10)
+    cache.put(key("c"), b"x" * 10)
+    # Reading a moves it to the back, so b is now the oldest
+    assert cache.get(key("a")) == b"x" * 10
+    cache.put(key("d"), b"x" * 10)
+
+    assert cache.get(key("b")) is None
+    assert all(cache.get(key(name)) is not None for name in "acd")
+    assert cache.size == 30
+
+
+def test_images_larger_than_the_cache_are_not_stored():
+    cache = PlotCache(max_bytes=10)
+    cache.put(key("a"), b"x" * 5)
+    cache.put(key("b"), b"x" * 11)
+
+    assert cache.get(key("b")) is None
+    assert cache.get(key("a")) == b"x" * 5
+    assert cache.size == 5
+
+
+def test_new_watermark_drops_stale_images_for_the_same_parameters():
+    cache = PlotCache(max_bytes=100)
+    cache.put(key(watermark=1), b"old")
+    cache.put(key(scatter_mode="raw", watermark=1), b"raw")
+    cache.put(key(watermark=2), b"new")
+
+    assert cache.get(key(watermark=1)) is None
+    assert cache.get(key(watermark=2)) == b"new"
+    # scatter_mode is part of the parameters, not the watermark
+    assert cache.get(key(scatter_mode="raw", watermark=1)) == b"raw"
+    assert cache.size == len(b"new") + len(b"raw")
+
+
+def test_storing_the_same_key_again_replaces_the_image():
+    cache = PlotCache(max_bytes=100)
+    cache.put(key(), b"first")
+    cache.put(key(), b"second!")
+
+    assert cache.get(key()) == b"second!"
+    assert cache.size == len(b"second!")
@@ -0,0 +1,19 @@
+from queries import to_positional
+
+
+def test_to_positional_numbers_placeholders_in_order_of_first_use():
+    sql, names = to_positional("SELECT * FROM posts WHERE created_at >= :start AND created_at < :end AND board = :board")
+    assert sql == "SELECT * FROM posts WHERE created_at >= $1 AND created_at < $2 AND board = $3"
+    assert names == ["start", "end", "board"]
+
+
+def test_to_positional_reuses_the_number_of_a_repeated_name():
+    sql, names = to_positional("SELECT :day, count(*) FROM posts WHERE created_at::date = :day AND score > :min_score")
+    assert sql == "SELECT $1, count(*) FROM posts WHERE created_at::date = $1 AND score > $2"
+    assert names == ["day", "min_score"]
+
+
+def test_to_positional_leaves_casts_alone():
+    sql, names = to_positional("SELECT '1 day'::interval, now()::date")
+    assert sql == "SELECT '1 day'::interval, now()::date"
+    assert names == []